@@ -0,0 +1,190 @@
+"""
+Contrôle d'admission des classeurs Excel déposés.
+
+Un classeur .xlsx est une archive zip : avant toute analyse par openpyxl,
+inspecter_classeur examine son répertoire (taille décompressée, taux de
+compression, nombre d'entrées) et les dimensions déclarées de chaque feuille
+(balise <dimension>, lue dans les premiers octets décompressés). Une bombe de
+décompression ou une feuille de millions de lignes vides mises en forme est
+ainsi refusée sans être chargée.
+
+Les classeurs admis mais lourds passent par un nombre limité de créneaux
+(creneau) : les transferts suivants attendent leur tour au lieu de se
+disputer la mémoire du serveur. Une durée maximale de traitement est vérifiée
+aux étapes du transfert (echeance).
+
+Les limites sont modifiables par variables d'environnement.
+"""
+import os
+import re
+import threading
+import time
+import zipfile
+import zlib
+from contextlib import contextmanager
+
+import metriques
+
+MO = 1024 * 1024
+
+# Limites de refus
+DECOMPRESSE_MAX = int(float(os.environ.get('AMC_XLSX_DECOMPRESSE_MAX_MO', '256')) * MO)
+LIGNES_MAX = int(os.environ.get('AMC_XLSX_LIGNES_MAX', '100000'))
+COLONNES_MAX = int(os.environ.get('AMC_XLSX_COLONNES_MAX', '512'))
+ENTREES_MAX = 2000     # fichiers contenus dans l'archive
+RATIO_MAX = 200        # taux de compression maximal d'une entrée de plus d'1 Mo
+DUREE_MAX = float(os.environ.get('AMC_DUREE_TRAITEMENT_MAX', '300'))  # en secondes
+LIGNES_ENTRE_VERIFICATIONS = 1000  # lignes lues entre deux vérifications de la durée
+
+# Au-delà de ces seuils, un classeur admis est lourd et attend un créneau
+SEUIL_LOURD = int(float(os.environ.get('AMC_XLSX_LOURD_MO', '16')) * MO)
+CELLULES_LOURD = 500_000
+CRENEAUX_LOURDS = int(os.environ.get('AMC_TRANSFERTS_LOURDS_SIMULTANES', '2'))
+
+# Octets décompressés lus au début de chaque feuille pour trouver <dimension>
+TAILLE_ENTETE_FEUILLE = 4096
+
+_DIMENSION = re.compile(rb'<(?:\w+:)?dimension\s+ref="(?:[A-Z]+\d+:)?([A-Z]+)(\d+)"')
+
+
+class ClasseurRefuse(ValueError):
+    """Classeur refusé avant analyse ; `motif` sert d'étiquette aux métriques."""
+
+    def __init__(self, message: str, motif: str):
+        super().__init__(message)
+        self.motif = motif
+
+
+class Inspection:
+    """Résultat de inspecter_classeur : taille décompressée et dimensions des feuilles."""
+
+    def __init__(self, decompresse: int, feuilles: dict):
+        self.decompresse = decompresse
+        self.feuilles = feuilles  # entrée zip -> (lignes, colonnes), None si non déclarées
+
+    @property
+    def cellules(self) -> int:
+        return sum(lignes * colonnes for lignes, colonnes in filter(None, self.feuilles.values()))
+
+    @property
+    def lourd(self) -> bool:
+        return self.decompresse > SEUIL_LOURD or self.cellules > CELLULES_LOURD
+
+
+def _numero_colonne(lettres: bytes) -> int:
+    numero = 0
+    for lettre in lettres:
+        numero = numero * 26 + lettre - ord('A') + 1
+    return numero
+
+
+def _refuser(message: str, motif: str):
+    metriques.incrementer('amc_admission_refus_total', motif=motif)
+    raise ClasseurRefuse(message, motif)
+
+
+def inspecter_classeur(flux) -> Inspection:
+    """
+    Inspecte un classeur .xlsx (flux binaire positionnable, remis au début
+    ensuite) sans l'analyser. Lève ClasseurRefuse si une limite est dépassée
+    ou si le fichier n'est pas une archive zip (ancien format .xls, fichier
+    renommé…).
+    """
+    try:
+        if not zipfile.is_zipfile(flux):
+            _refuser("Classeur refusé : le fichier n'est pas un classeur Excel .xlsx.", 'archive')
+        flux.seek(0)
+        with zipfile.ZipFile(flux) as archive:
+            entrees = archive.infolist()
+            if len(entrees) > ENTREES_MAX:
+                _refuser(f"Classeur refusé : l'archive contient {len(entrees)} fichiers "
+                         f"(maximum {ENTREES_MAX}).", 'entrees')
+
+            decompresse = sum(entree.file_size for entree in entrees)
+            if decompresse > DECOMPRESSE_MAX:
+                _refuser(f"Classeur refusé : {decompresse / MO:.0f} Mo une fois décompressé "
+                         f"(maximum {DECOMPRESSE_MAX / MO:.0f} Mo).", 'taille')
+            for entree in entrees:
+                if entree.file_size > MO and entree.file_size > RATIO_MAX * max(entree.compress_size, 1):
+                    _refuser(f"Classeur refusé : taux de compression anormal pour « {entree.filename} ».",
+                             'compression')
+
+            feuilles = {}
+            for entree in entrees:
+                if not (entree.filename.startswith('xl/worksheets/') and entree.filename.endswith('.xml')):
+                    continue
+                with archive.open(entree) as feuille:
+                    trouve = _DIMENSION.search(feuille.read(TAILLE_ENTETE_FEUILLE))
+                if trouve is None:
+                    feuilles[entree.filename] = None  # dimension non déclarée : bornée par la taille décompressée
+                    continue
+                colonnes, lignes = _numero_colonne(trouve.group(1)), int(trouve.group(2))
+                if lignes > LIGNES_MAX or colonnes > COLONNES_MAX:
+                    _refuser(f"Classeur refusé : une feuille s'étend sur {lignes} lignes et {colonnes} "
+                             f"colonnes (maximum {LIGNES_MAX} lignes, {COLONNES_MAX} colonnes).", 'dimensions')
+                feuilles[entree.filename] = (lignes, colonnes)
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, EOFError, NotImplementedError, zlib.error) as e:
+        _refuser(f"Classeur illisible : {e}", 'archive')
+    finally:
+        flux.seek(0)
+    return Inspection(decompresse, feuilles)
+
+
+# =============================================================================
+# FILE D'ATTENTE ET DURÉE DES TRAITEMENTS LOURDS
+# =============================================================================
+
+_creneaux = threading.BoundedSemaphore(CRENEAUX_LOURDS)
+
+
+@contextmanager
+def creneau(inspection: Inspection, verifier=None, attente=None):
+    """
+    Réserve un créneau de traitement lourd si `inspection` l'exige. Pendant
+    l'attente, `verifier()` est appelée régulièrement (elle lève une
+    exception pour abandonner) ; `attente(True)` puis `attente(False)`
+    signalent l'entrée et la sortie de la file.
+    """
+    if not inspection.lourd:
+        yield
+        return
+    if not _creneaux.acquire(blocking=False):
+        if attente is not None:
+            attente(True)
+        metriques.incrementer('amc_transferts_en_file')
+        try:
+            while not _creneaux.acquire(timeout=0.2):
+                if verifier is not None:
+                    verifier()
+        finally:
+            metriques.incrementer('amc_transferts_en_file', -1)
+        if attente is not None:
+            attente(False)
+    try:
+        yield
+    finally:
+        _creneaux.release()
+
+
+def echeance(duree: float = None):
+    """
+    Retourne une fonction qui lève ValueError une fois la durée maximale de
+    traitement écoulée, à appeler aux étapes du traitement et toutes les
+    LIGNES_ENTRE_VERIFICATIONS lignes des lectures de classeur.
+    """
+    duree = DUREE_MAX if duree is None else duree
+    limite = time.monotonic() + duree
+
+    def verifier():
+        if time.monotonic() > limite:
+            metriques.incrementer('amc_admission_refus_total', motif='duree')
+            raise ValueError(f"Durée maximale de traitement dépassée ({duree:.0f} s).")
+    return verifier
+
+
+def parcourir(lignes, delai):
+    """Itère sur `lignes` (iter_rows d'une feuille) en appelant `delai()` toutes les LIGNES_ENTRE_VERIFICATIONS lignes."""
+    for numero, ligne in enumerate(lignes):
+        if numero % LIGNES_ENTRE_VERIFICATIONS == 0:
+            delai()
+        yield ligne
@@ -0,0 +1,97 @@
+"""
+Neutralisation et repondération des questions d'un examen AMC.
+
+À partir des scores par question de l'export AMC, le barème (points maximum
+et coefficient de chaque question) peut être modifié et les questions
+défectueuses neutralisées, soit en les retirant du barème, soit en accordant
+leurs points à tous. Les notes sont recalculées pour toutes les copies par un
+seul produit matrice-vecteur, puis réécrites au format CSV d'AMC pour être
+analysées ou transférées comme un export ordinaire.
+"""
+import numpy as np
+import pandas as pd
+
+from fichiers import FichierDepose
+from statistiques import colonnes_parties, colonnes_questions
+
+# Traitement d'une question neutralisée
+NEUTRALISATIONS = ('retirer', 'accorder')
+
+# Note maximale des notes recalculées
+NOTE_MAX = 20.0
+
+
+def bareme_questions(df_notes: pd.DataFrame) -> pd.DataFrame:
+    """
+    Barème initial d'un export : une ligne par question (Question, Points max,
+    Coefficient, Neutralisée). Les points maximum sont estimés par le meilleur
+    score observé, à corriger si aucune copie n'a obtenu tous les points.
+    """
+    if colonnes_parties(df_notes):
+        raise ValueError("Export fusionné : pas de scores par question, seulement des notes par partie.")
+    questions = colonnes_questions(df_notes)
+    if not questions:
+        raise ValueError("L'export AMC ne contient pas de scores par question.")
+    return pd.DataFrame({
+        'Question': questions,
+        'Points max': df_notes[questions].max().clip(lower=0).fillna(0).astype(float).to_numpy(),
+        'Coefficient': 1.0,
+        'Neutralisée': False,
+    })
+
+
+def recalculer_notes(df_notes: pd.DataFrame, bareme: pd.DataFrame, neutralisation: str = 'retirer',
+                     note_max: float = NOTE_MAX) -> pd.Series:
+    """
+    Notes sur `note_max` recalculées selon le barème : (scores × coefficients)
+    / (points max × coefficients). Une question neutralisée est retirée du
+    barème ('retirer') ou rapporte ses points maximum à toutes les copies
+    ('accorder'). Les scores manquants comptent 0.
+    """
+    if neutralisation not in NEUTRALISATIONS:
+        raise ValueError(f"Neutralisation inconnue : {neutralisation}")
+    manquantes = [q for q in bareme['Question'] if q not in df_notes.columns]
+    if manquantes:
+        raise ValueError(f"Questions absentes de l'export : {', '.join(map(str, manquantes))}")
+
+    scores = df_notes[list(bareme['Question'])].to_numpy(dtype=float)
+    scores = np.nan_to_num(scores, nan=0.0)
+    points_max = bareme['Points max'].to_numpy(dtype=float)
+    coefficients = bareme['Coefficient'].to_numpy(dtype=float)
+    neutralisees = bareme['Neutralisée'].to_numpy(dtype=bool)
+    if (coefficients < 0).any() or (points_max < 0).any():
+        raise ValueError("Les points maximum et les coefficients doivent être positifs.")
+
+    if neutralisation == 'accorder':
+        scores = np.where(neutralisees, points_max, scores)
+    else:
+        coefficients = np.where(neutralisees, 0.0, coefficients)
+
+    total_max = points_max @ coefficients
+    if total_max <= 0:
+        raise ValueError("Le barème ne comporte plus aucun point : rétablissez au moins une question.")
+    notes = scores @ coefficients / total_max * note_max
+    return pd.Series(np.clip(notes, 0, note_max).round(2), index=df_notes.index, name='Note')
+
+
+def ecart_reproduction(df_notes: pd.DataFrame, bareme: pd.DataFrame, note_max: float = NOTE_MAX) -> float:
+    """
+    Plus grand écart entre la note AMC et la note recalculée avec les points
+    maximum du barème mais sans coefficient ni neutralisation : un écart
+    important signale des points maximum mal estimés ou un calcul AMC différent.
+    """
+    reference = bareme.assign(Coefficient=1.0, **{'Neutralisée': False})
+    recalculees = recalculer_notes(df_notes, reference, note_max=note_max)
+    return float((recalculees - df_notes['Note']).abs().max())
+
+
+def exporter_notes_recalculees(df_notes: pd.DataFrame, anomalies: pd.DataFrame, notes: pd.Series,
+                               nom: str = 'notes') -> FichierDepose:
+    """
+    Export AMC identique à l'original, colonne Note remplacée par les notes
+    recalculées ; les copies mal identifiées (A:Code = NONE) sont conservées.
+    """
+    table = df_notes.assign(Note=notes)
+    if anomalies is not None and len(anomalies):
+        table = pd.concat([table, anomalies], ignore_index=True)
+    return FichierDepose(table.to_csv(index=False).encode('utf-8'), nom=f"{nom}_rebareme.csv")
@@ -0,0 +1,239 @@
+"""
+Test de charge de l'application Streamlit (unique.py).
+
+Lancement :
+    python charge.py --sessions 1,2,4,8 --etudiants 300 [--fichiers-partages] [--csv resultats.csv]
+
+Pour chaque palier, N sessions simulées sont pilotées en parallèle, sans
+navigateur, par l'API de test de Streamlit (streamlit.testing.v1.AppTest).
+Chaque session suit un parcours réaliste sur des fichiers synthétiques :
+génération de la liste étudiants, simulation d'ajout de points (trois positions
+du curseur), puis transfert des notes jusqu'à son terme.
+
+Le rapport donne par palier les latences de rerun (médiane et 95e centile),
+le débit en reruns par seconde et la mémoire résidente du processus. Les
+sessions partagent les caches du processus comme sur un vrai serveur ; par
+défaut chacune dépose ses propres fichiers, --fichiers-partages leur fait
+déposer les mêmes.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import resource
+import statistics
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pandas as pd
+from openpyxl import Workbook
+from streamlit import config
+from streamlit.runtime import Runtime
+from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+from streamlit.runtime.media_file_manager import MediaFileManager
+from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+from streamlit.testing.v1 import AppTest, app_test
+
+CHEMIN_APPLICATION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'unique.py')
+
+# Délai maximal d'un rerun, et du transfert complet, pour une session
+DELAI_RERUN = 120
+DELAI_TRANSFERT = 300
+
+# Script piloté : unique.py, avec des dépôts de fichiers lus dans la session
+# (l'API de test ne sait pas simuler st.file_uploader).
+SCRIPT_PILOTE = f"""
+import io
+import streamlit as st
+
+class _Depot(io.BytesIO):
+    def __init__(self, nom, contenu):
+        super().__init__(contenu)
+        self.name = nom
+        self.file_id = nom + '-' + str(hash(contenu))
+        self.size = len(contenu)
+
+def _file_uploader(label, type=None, accept_multiple_files=False, key=None, **kwargs):
+    depot = st.session_state.get('_charge_fichiers', {{}}).get(key)
+    if depot is None:
+        return [] if accept_multiple_files else None
+    return [_Depot(*depot)] if accept_multiple_files else _Depot(*depot)
+
+st.file_uploader = _file_uploader
+__file__ = {CHEMIN_APPLICATION!r}
+exec(compile(open(__file__, encoding='utf-8').read(), __file__, 'exec'))
+"""
+
+RUBRIQUES = {
+    'liste': "👨‍🎓 Liste étudiants",
+    'statistiques': "📊 Statistiques des notes",
+    'transfert': "✍️ Transfert des notes",
+}
+
+
+# =============================================================================
+# FICHIERS SYNTHÉTIQUES
+# =============================================================================
+
+def generer_fichiers(nb_etudiants: int, graine: int = 0) -> tuple:
+    """Classeur administratif (.xlsx) et export AMC (.csv) synthétiques, en octets."""
+    aleatoire = random.Random(graine)
+    base = 20240000 + graine * 100000
+
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Université"])
+    ws.append(["Module : examen simulé"])
+    ws.append([])
+    ws.append(["Code", "Nom", "Prénom", "Groupe", "Note"])
+    for i in range(nb_etudiants):
+        ws.append([base + i, f"NOM{i}", f"Prenom{i}", f"G{i % 4 + 1}", None])
+    classeur = io.BytesIO()
+    wb.save(classeur)
+
+    presents = int(nb_etudiants * 0.9)
+    notes = pd.DataFrame({
+        'Exam': range(1, presents + 1),
+        'Name': [f"NOM{i}" for i in range(presents)],
+        'A:Code': [str(base + i) for i in range(presents)],
+        'Mark': [aleatoire.randrange(0, 41) / 2 for _ in range(presents)],
+    })
+    notes.loc[len(notes)] = [presents + 1, "X", "NONE", 7.5]
+    return classeur.getvalue(), notes.to_csv(index=False).encode('utf-8')
+
+
+# =============================================================================
+# SESSIONS SIMULÉES
+# =============================================================================
+
+def memoire_residente() -> float:
+    """Mémoire résidente du processus en Mo (pic si /proc est indisponible)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def partager_runtime():
+    """
+    AppTest installe un Runtime factice le temps de chaque rerun puis le
+    retire : deux sessions simultanées se le retireraient mutuellement. Un
+    Runtime factice unique est donc installé pour tout le test, partagé par
+    les sessions comme sur un vrai serveur (caches compris).
+    """
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage('/mock/media'))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime.instance = classmethod(lambda cls: runtime)
+    Runtime.exists = classmethod(lambda cls: True)
+    config.set_option('global.appTest', True)
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+
+
+def parcours(classeur: bytes, notes: bytes, latences: list, erreurs: list):
+    """Parcours d'un enseignant ; la durée de chaque rerun est ajoutée à `latences`."""
+    def rerun(action):
+        debut = time.perf_counter()
+        action.run(timeout=DELAI_RERUN)
+        latences.append(time.perf_counter() - debut)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    at = AppTest.from_string(SCRIPT_PILOTE, default_timeout=DELAI_RERUN)
+    at.session_state['_charge_fichiers'] = {
+        'excel_etudiants': ('admin.xlsx', classeur),
+        'csv_stats': ('notes.csv', notes),
+        'xls_notes': ('admin.xlsx', classeur),
+        'csv_notes': ('notes.csv', notes),
+    }
+    try:
+        rerun(at)
+        rerun(at.sidebar.radio[0].set_value(RUBRIQUES['liste']))
+
+        rerun(at.sidebar.radio[0].set_value(RUBRIQUES['statistiques']))
+        for ajout in (0.5, 1.0, 1.5):
+            rerun(at.slider[0].set_value(ajout))
+
+        rerun(at.sidebar.radio[0].set_value(RUBRIQUES['transfert']))
+        rerun(at.button[0].click())
+        echeance = time.monotonic() + DELAI_TRANSFERT
+        while not at.success and time.monotonic() < echeance:
+            time.sleep(0.1)
+            rerun(at)
+        if not at.success:
+            raise RuntimeError("transfert non terminé dans le délai imparti")
+    except Exception as e:
+        erreurs.append(str(e))
+
+
+def palier(nb_sessions: int, nb_etudiants: int, partages: bool) -> tuple:
+    """Exécute `nb_sessions` parcours simultanés ; retourne (mesures du palier, erreurs)."""
+    fichiers = [generer_fichiers(nb_etudiants, 0 if partages else i) for i in range(nb_sessions)]
+    latences, erreurs = [], []
+    memoire_avant = memoire_residente()
+    memoire_pic = [memoire_avant]
+
+    def surveiller(fin: threading.Event):
+        while not fin.wait(0.2):
+            memoire_pic.append(memoire_residente())
+
+    fin = threading.Event()
+    sonde = threading.Thread(target=surveiller, args=(fin,), daemon=True)
+    sessions = [
+        threading.Thread(target=parcours, args=(classeur, notes, latences, erreurs), daemon=True)
+        for classeur, notes in fichiers
+    ]
+    debut = time.perf_counter()
+    sonde.start()
+    for session in sessions:
+        session.start()
+    for session in sessions:
+        session.join()
+    duree = time.perf_counter() - debut
+    fin.set()
+
+    centiles = statistics.quantiles(latences, n=20, method='inclusive') if len(latences) > 1 else latences * 19
+    return {
+        'Sessions': nb_sessions,
+        'Reruns': len(latences),
+        'Erreurs': len(erreurs),
+        'Latence p50 (ms)': round(statistics.median(latences) * 1000) if latences else None,
+        'Latence p95 (ms)': round(centiles[18] * 1000) if latences else None,
+        'Débit (reruns/s)': round(len(latences) / duree, 2),
+        'Durée (s)': round(duree, 1),
+        'Mémoire avant (Mo)': round(memoire_avant),
+        'Mémoire pic (Mo)': round(max(memoire_pic + [memoire_residente()])),
+    }, erreurs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de l'application Streamlit des Outils AMC.")
+    parser.add_argument('--sessions', default='1,2,4,8', help="paliers de sessions simultanées (ex. 1,2,4,8)")
+    parser.add_argument('--etudiants', type=int, default=300, help="nombre d'étudiants des fichiers synthétiques")
+    parser.add_argument('--fichiers-partages', action='store_true', help="toutes les sessions déposent les mêmes fichiers")
+    parser.add_argument('--csv', help="enregistre le rapport dans ce fichier CSV")
+    args = parser.parse_args()
+
+    partager_runtime()
+    resultats = []
+    for nb_sessions in (int(n) for n in args.sessions.split(',')):
+        mesures, erreurs = palier(nb_sessions, args.etudiants, args.fichiers_partages)
+        resultats.append(mesures)
+        print(f"{nb_sessions} session(s) : p50 {mesures['Latence p50 (ms)']} ms, "
+              f"p95 {mesures['Latence p95 (ms)']} ms, {mesures['Débit (reruns/s)']} reruns/s, "
+              f"{mesures['Mémoire pic (Mo)']} Mo", flush=True)
+        for erreur in sorted(set(erreurs)):
+            print(f"  ❌ {erreur}")
+
+    rapport = pd.DataFrame(resultats)
+    print()
+    print(rapport.to_string(index=False))
+    if args.csv:
+        rapport.to_csv(args.csv, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Type canonique des codes étudiants.
+
+Les codes arrivent sous des formes variées : entiers Excel, flottants pandas
+(123.0), texte entouré d'espaces… canoniser_codes les ramène tous, en une
+seule opération vectorisée sur la Series, vers un type unique : int64 quand
+tous les codes sont numériques, chaîne Arrow sinon (tampons contigus plutôt
+qu'objets Python). Liste étudiants, statistiques et transfert joignent ainsi
+des clés de même type.
+"""
+import pandas as pd
+
+# Politique des zéros initiaux :
+# - 'conserver' : 0123 et 123 sont deux codes distincts (les codes restent textuels) ;
+# - 'ignorer'   : 0123 et 123 désignent le même étudiant (les codes peuvent devenir entiers).
+POLITIQUE_ZEROS = 'conserver'
+
+# Type des textes (codes non numériques, noms, groupes) : chaînes stockées par Arrow
+TYPE_TEXTE = pd.StringDtype('pyarrow')
+
+
+def canoniser_codes(valeurs, zeros: str = POLITIQUE_ZEROS) -> pd.Series:
+    """
+    Canonise une série de codes étudiants : suppression des espaces et du
+    suffixe '.0', application de la politique des zéros initiaux, puis
+    conversion en int64 (Int64 si des codes manquent) lorsque tous les codes
+    sont numériques, en chaîne sinon. Les codes vides deviennent manquants.
+    """
+    serie = valeurs if isinstance(valeurs, pd.Series) else pd.Series(valeurs, dtype=object)
+
+    if pd.api.types.is_integer_dtype(serie.dtype):
+        return serie.astype('Int64' if serie.isna().any() else 'int64')
+
+    textes = serie.astype(TYPE_TEXTE).str.strip().str.replace(r'\.0$', '', regex=True)
+    textes = textes.mask(textes == '')
+    if zeros == 'ignorer':
+        textes = textes.str.lstrip('0').replace('', '0')
+
+    presents = textes.dropna()
+    numeriques = presents.str.fullmatch(r'\d{1,18}').all()
+    if numeriques and zeros == 'conserver':
+        numeriques = not presents.str.match(r'0\d').any()
+    if numeriques and not presents.empty:
+        return textes.astype('Int64' if len(presents) < len(textes) else 'int64')
+    return textes
+
+
+def _sans_zeros_initiaux(textes: pd.Series) -> pd.Series:
+    numeriques = textes.str.fullmatch(r'\d+').fillna(False).astype(bool)
+    return textes.mask(numeriques, textes.str.lstrip('0').replace('', '0'))
+
+
+def aligner_codes(gauche: pd.Series, droite: pd.Series) -> tuple:
+    """
+    Ramène deux séries de codes canonisées au même type avant une jointure :
+    si l'une est entière et l'autre textuelle, la série entière passe en texte
+    et les codes numériques de la série textuelle perdent leurs zéros
+    initiaux. Le code 0123 d'un côté désigne alors l'entier 123 de l'autre,
+    dont les zéros ont été perdus (cellule Excel numérique).
+    """
+    gauche_entiere = pd.api.types.is_integer_dtype(gauche.dtype)
+    droite_entiere = pd.api.types.is_integer_dtype(droite.dtype)
+    if gauche_entiere and not droite_entiere:
+        gauche, droite = gauche.astype(TYPE_TEXTE), _sans_zeros_initiaux(droite)
+    elif droite_entiere and not gauche_entiere:
+        gauche, droite = _sans_zeros_initiaux(gauche), droite.astype(TYPE_TEXTE)
+    return gauche, droite
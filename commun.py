@@ -0,0 +1,167 @@
+"""
+Fonctions communes aux rubriques des Outils AMC.
+
+Seules les pages (unique.py…) et interface.py importent Streamlit : ce module
+et les autres modules de traitement sont partagés par l'interface, le service
+HTTP, la surveillance de dossier et les traitements exécutés en arrière-plan.
+"""
+import csv
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import metriques
+from codes import TYPE_TEXTE
+
+
+def detect_delimiter(file_content: bytes) -> str:
+    """Détecte automatiquement le séparateur du fichier CSV."""
+    sample = file_content.decode('utf-8', errors='ignore')
+    try:
+        dialect = csv.Sniffer().sniff(sample)
+        return dialect.delimiter
+    except csv.Error:
+        return ','
+
+
+@contextmanager
+def connexion_sqlite(chemin: str, schema: str):
+    """
+    Connexion à une base SQLite locale (créée au besoin, avec son `schema`),
+    dans une transaction validée à la sortie.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(chemin)), exist_ok=True)
+    connexion = sqlite3.connect(chemin, timeout=10)
+    try:
+        with connexion:
+            connexion.execute(schema)
+            yield connexion
+    finally:
+        connexion.close()
+
+
+def compacter(table: pd.DataFrame, exclure=()) -> pd.DataFrame:
+    """
+    Types compacts pour une table lue d'un fichier : chaînes Arrow pour les
+    colonnes de texte, plus petit type entier suffisant pour les colonnes
+    entières. Les colonnes mêlant nombres et textes, les flottants et les
+    colonnes `exclure` (clés de jointure) sont laissés tels quels.
+    """
+    conversions = {}
+    for col, dtype in table.dtypes.items():
+        if col in exclure:
+            continue
+        if dtype == object and pd.api.types.infer_dtype(table[col], skipna=True) in ('string', 'empty'):
+            conversions[col] = table[col].astype(TYPE_TEXTE)
+        elif pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+            conversions[col] = pd.to_numeric(table[col], downcast='integer')
+    return table.assign(**conversions) if conversions else table
+
+
+class IndexPrefixes:
+    """
+    Index trié des mots (en minuscules) de quelques colonnes d'une table, pour
+    retrouver par préfixe — code, nom ou prénom — les lignes correspondantes
+    par recherche dichotomique, sans parcourir la table.
+    """
+
+    def __init__(self, table: pd.DataFrame, colonnes):
+        cles, positions = [], []
+        for col in colonnes:
+            mots = table[col].astype(str).str.lower().str.split().explode().dropna()
+            cles.append(mots.to_numpy(dtype=object))
+            positions.append(table.index.get_indexer(mots.index))
+        cles = np.concatenate(cles) if cles else np.array([], dtype=object)
+        positions = np.concatenate(positions) if positions else np.array([], dtype=np.intp)
+        ordre = np.argsort(cles, kind='stable')
+        self._cles = cles[ordre]
+        self._positions = positions[ordre]
+        self._taille = len(table)
+        self.taille_memoire = int(self._positions.nbytes + pd.Series(self._cles).memory_usage(deep=True))
+
+    def _prefixe(self, mot: str) -> np.ndarray:
+        debut = np.searchsorted(self._cles, mot, side='left')
+        fin = np.searchsorted(self._cles, mot + '\U0010ffff', side='left')
+        return np.unique(self._positions[debut:fin])
+
+    def rechercher(self, texte: str) -> np.ndarray:
+        """
+        Positions (triées) des lignes dont un mot commence par chacun des mots
+        de `texte`. Un texte vide retourne toutes les lignes.
+        """
+        mots = texte.lower().split()
+        if not mots:
+            return np.arange(self._taille)
+        resultat = self._prefixe(mots[0])
+        for mot in mots[1:]:
+            resultat = np.intersect1d(resultat, self._prefixe(mot), assume_unique=True)
+        return resultat
+
+
+class CacheLRU:
+    """
+    Dictionnaire borné, sûr entre threads : au-delà de `taille_max` entrées,
+    les moins récemment utilisées sont évincées. Nommé, il publie ses accès,
+    défauts et taille dans les métriques.
+    """
+
+    def __init__(self, taille_max: int, nom: str = None):
+        self.taille_max = taille_max
+        self.nom = nom
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        if nom:
+            metriques.sonde_taille(nom, self)
+
+    def get(self, cle, defaut=None):
+        if self.nom:
+            metriques.incrementer('amc_cache_acces_total', cache=self.nom)
+        with self._verrou:
+            if cle not in self._entrees:
+                if self.nom:
+                    metriques.incrementer('amc_cache_calculs_total', cache=self.nom)
+                return defaut
+            self._entrees.move_to_end(cle)
+            return self._entrees[cle]
+
+    def __setitem__(self, cle, valeur):
+        with self._verrou:
+            self._entrees[cle] = valeur
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille_max:
+                self._entrees.popitem(last=False)
+
+    def total(self, taille) -> int:
+        """Somme des tailles des entrées, mesurées par la fonction `taille`."""
+        with self._verrou:
+            valeurs = list(self._entrees.values())
+        return sum(taille(valeur) for valeur in valeurs)
+
+    def evincer(self, octets: int, taille) -> list:
+        """
+        Évince, les moins récemment utilisées d'abord, des entrées non vides
+        jusqu'à libérer `octets` (mesurés par `taille`). Retourne les tailles
+        des entrées évincées.
+        """
+        liberees = []
+        with self._verrou:
+            for cle in list(self._entrees):
+                if sum(liberees) >= octets:
+                    break
+                taille_entree = taille(self._entrees[cle])
+                if taille_entree > 0:
+                    del self._entrees[cle]
+                    liberees.append(taille_entree)
+        return liberees
+
+    def __contains__(self, cle) -> bool:
+        with self._verrou:
+            return cle in self._entrees
+
+    def __len__(self) -> int:
+        return len(self._entrees)
@@ -0,0 +1,73 @@
+"""
+Listes de référence des cours.
+
+La liste AMC (Code, Name) de chaque cours est conservée dans une base SQLite
+locale lorsqu'elle est validée. Quand l'administration envoie une liste mise
+à jour, la nouvelle liste est comparée à celle de référence (liste.comparer_listes) :
+seules les copies des étudiants ajoutés sont à imprimer.
+"""
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from codes import TYPE_TEXTE, canoniser_codes
+from commun import connexion_sqlite
+
+# Emplacement de la base, modifiable par la variable d'environnement AMC_COURS
+CHEMIN_COURS = os.environ.get(
+    'AMC_COURS', os.path.join(os.path.expanduser('~'), '.outils_amc', 'cours.sqlite3')
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS listes (
+    cours TEXT PRIMARY KEY,
+    empreinte TEXT NOT NULL,
+    enregistre_le TEXT NOT NULL,
+    etudiants INTEGER NOT NULL,
+    codes TEXT NOT NULL,
+    noms TEXT NOT NULL
+)
+"""
+
+
+def enregistrer_liste(cours: str, liste: pd.DataFrame, empreinte: str, chemin: str = None):
+    """Enregistre (ou remplace) la liste AMC de référence du cours."""
+    with connexion_sqlite(chemin or CHEMIN_COURS, _SCHEMA) as connexion:
+        connexion.execute(
+            "INSERT OR REPLACE INTO listes (cours, empreinte, enregistre_le, etudiants, codes, noms) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                cours, empreinte, datetime.now().isoformat(timespec='seconds'), len(liste),
+                json.dumps(liste['Code'].tolist(), ensure_ascii=False),
+                json.dumps(liste['Name'].tolist(), ensure_ascii=False),
+            )
+        )
+
+
+def charger_liste(cours: str, chemin: str = None) -> tuple:
+    """
+    Retourne (liste, empreinte, enregistre_le) de la liste de référence du
+    cours, ou (None, None, None) si aucune n'est enregistrée.
+    """
+    with connexion_sqlite(chemin or CHEMIN_COURS, _SCHEMA) as connexion:
+        ligne = connexion.execute(
+            "SELECT codes, noms, empreinte, enregistre_le FROM listes WHERE cours = ?", (cours,)
+        ).fetchone()
+    if ligne is None:
+        return None, None, None
+    codes, noms, empreinte, enregistre_le = ligne
+    liste = pd.DataFrame({
+        'Code': canoniser_codes(json.loads(codes)),
+        'Name': pd.Series(json.loads(noms), dtype=TYPE_TEXTE),
+    })
+    return liste, empreinte, enregistre_le
+
+
+def lister_cours(chemin: str = None) -> pd.DataFrame:
+    """Cours ayant une liste de référence, du plus récemment mis à jour au plus ancien."""
+    with connexion_sqlite(chemin or CHEMIN_COURS, _SCHEMA) as connexion:
+        return pd.read_sql_query(
+            "SELECT cours, etudiants, enregistre_le FROM listes ORDER BY enregistre_le DESC", connexion
+        )
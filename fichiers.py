@@ -0,0 +1,171 @@
+"""
+Gestion des fichiers déposés par les utilisateurs.
+
+Au-delà d'un seuil configurable (variable d'environnement AMC_SEUIL_DISQUE_MO),
+le contenu déposé est déversé dans un fichier temporaire puis projeté en
+mémoire (mmap) : les lecteurs CSV et Excel travaillent sur une vue sans copie,
+au lieu de multiplier les copies BytesIO / bytes / str de chaque fichier.
+
+Un flux que l'appelant conserve (UploadedFile de Streamlit, BytesIO) n'est
+jamais déversé : ses octets restent en mémoire tant que le flux existe, le
+déverser ne ferait qu'en ajouter une copie sur disque. Le FichierDepose en
+est alors une simple vue.
+"""
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+import weakref
+
+import metriques
+
+# Taille (en octets) au-delà de laquelle un fichier déposé est déversé sur disque
+SEUIL_DISQUE = int(float(os.environ.get('AMC_SEUIL_DISQUE_MO', '16')) * 1024 * 1024)
+
+# Taille des blocs écrits sur disque lors du déversement
+TAILLE_BLOC = 1024 * 1024
+
+# Taille de l'échantillon utilisé pour détecter le séparateur CSV
+TAILLE_ECHANTILLON = 64 * 1024
+
+
+class _LecteurVue(io.RawIOBase):
+    """Flux binaire en lecture seule sur une memoryview, sans copie du contenu."""
+
+    def __init__(self, vue: memoryview):
+        super().__init__()
+        self._vue = vue
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(min(len(b), len(self._vue) - self._pos), 0)
+        b[:n] = self._vue[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._vue)
+        self._pos = max(offset, 0)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+def _tampon(source) -> memoryview:
+    """Retourne une vue sur le contenu de `source` en évitant toute copie."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return memoryview(source)
+    if hasattr(source, 'getvalue'):
+        # BytesIO.getvalue() renvoie l'objet bytes partagé sans le copier,
+        # contrairement à getbuffer() qui force une copie privée du tampon.
+        return memoryview(source.getvalue())
+    source.seek(0)
+    return memoryview(source.read())
+
+
+def _liberer(carte, chemin):
+    """Ferme la projection mémoire et supprime le fichier temporaire."""
+    if carte is not None:
+        try:
+            carte.close()
+        except BufferError:
+            pass  # une vue est encore exportée : la projection sera fermée par le ramasse-miettes
+    if chemin is not None:
+        try:
+            os.remove(chemin)
+        except OSError:
+            pass
+
+
+class FichierDepose:
+    """
+    Contenu d'un fichier déposé, conservé en mémoire ou déversé sur disque.
+
+    `flux()` fournit un flux binaire indépendant à chaque appel (utilisable
+    par pandas et openpyxl, y compris depuis un thread), `vue()` une
+    memoryview sans copie, `echantillon()` le début du fichier et
+    `empreinte()` un condensé du contenu servant de clé de cache.
+    """
+
+    def __init__(self, source, nom: str = '', seuil: int = None):
+        self.nom = nom or getattr(source, 'name', '')
+        seuil = SEUIL_DISQUE if seuil is None else seuil
+        tampon = _tampon(source)
+        self.taille = len(tampon)
+        # Vue sur le tampon d'un flux que l'appelant conserve : jamais déversée
+        self.emprunte = hasattr(source, 'getvalue')
+        self.chemin = None
+        self._carte = None
+        self._empreinte = None
+
+        if self.taille > seuil and not self.emprunte:
+            fd, self.chemin = tempfile.mkstemp(prefix='amc_', suffix=os.path.splitext(self.nom)[1])
+            with os.fdopen(fd, 'wb') as f:
+                for debut in range(0, self.taille, TAILLE_BLOC):
+                    f.write(tampon[debut:debut + TAILLE_BLOC])
+            tampon.release()
+            with open(self.chemin, 'rb') as f:
+                self._carte = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._vue = memoryview(self._carte)
+        else:
+            self._vue = tampon
+
+        self._finaliseur = weakref.finalize(self, _liberer, self._carte, self.chemin)
+        if self.chemin is not None:
+            metriques.incrementer('amc_fichiers_sur_disque_total')
+
+    @property
+    def sur_disque(self) -> bool:
+        return self.chemin is not None
+
+    @property
+    def taille_memoire(self) -> int:
+        """
+        Octets de mémoire vive libérés avec l'objet : aucun pour un fichier
+        déversé (projeté depuis le disque) ou emprunté au flux de l'appelant.
+        """
+        return 0 if self.sur_disque or self.emprunte else self.taille
+
+    def vue(self) -> memoryview:
+        return self._vue
+
+    def flux(self) -> io.BufferedReader:
+        return io.BufferedReader(_LecteurVue(self._vue))
+
+    def empreinte(self) -> str:
+        """Empreinte du contenu, calculée une seule fois, pour indexer les caches."""
+        if self._empreinte is None:
+            self._empreinte = hashlib.blake2b(self._vue, digest_size=16).hexdigest()
+        return self._empreinte
+
+    def echantillon(self, taille: int = TAILLE_ECHANTILLON) -> bytes:
+        """Début du fichier, tronqué à la dernière fin de ligne complète."""
+        debut = bytes(self._vue[:taille])
+        if len(debut) < self.taille and b'\n' in debut:
+            debut = debut[:debut.rindex(b'\n') + 1]
+        return debut
+
+    def compter_depot(self) -> 'FichierDepose':
+        """
+        Compte ce fichier dans les métriques des dépôts. À appeler là où un
+        fichier envoyé par un utilisateur entre dans l'application, et non
+        pour les fichiers produits (fusion, barème) ou relus.
+        """
+        metriques.incrementer('amc_fichiers_deposes_total')
+        metriques.incrementer('amc_octets_deposes_total', self.taille)
+        return self
+
+    def fermer(self):
+        self._vue.release()
+        self._finaliseur()
@@ -0,0 +1,145 @@
+"""
+Fusion de plusieurs exports AMC en une note finale.
+
+Un examen peut être réparti sur plusieurs projets AMC (parties corrigées
+séparément, session principale et rattrapage). Chaque export est lu puis
+ramené sur 20 selon son barème ; les notes sont jointes en une seule opération
+sur le code canonique, puis combinées par moyenne pondérée.
+
+Le résultat est réécrit au format d'un export AMC (colonnes A:Code et Note) :
+statistiques, aperçu et transfert le traitent comme un CSV ordinaire, et son
+empreinte sert de clé à leurs caches.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from codes import TYPE_TEXTE
+from fichiers import FichierDepose
+from statistiques import PREFIXE_PARTIE
+from transfert import lire_notes_csv
+
+ROLES = ('partie', 'rattrapage')
+
+# Politique pour une partie manquante :
+# - 'zero'    : la partie compte pour 0 ;
+# - 'ignorer' : la moyenne est calculée sur les seules parties présentes ;
+# - 'exclure' : l'étudiant n'a pas de note finale.
+ABSENCES = ('zero', 'ignorer', 'exclure')
+
+# Politique du rattrapage, quand l'étudiant y a une note :
+# - 'remplacer' : la note de rattrapage remplace la note combinée ;
+# - 'meilleure' : la meilleure des deux est retenue.
+RATTRAPAGES = ('remplacer', 'meilleure')
+
+
+class PartieExamen:
+    """Un export AMC à fusionner, avec son poids, son barème et son rôle."""
+
+    def __init__(self, fichier: FichierDepose, poids: float = 1.0, bareme: float = 20.0,
+                 role: str = 'partie', nom: str = None):
+        if role not in ROLES:
+            raise ValueError(f"Rôle inconnu : {role}")
+        if bareme <= 0:
+            raise ValueError(f"Le barème de {fichier.nom} doit être strictement positif.")
+        if poids < 0:
+            raise ValueError(f"Le poids de {fichier.nom} ne peut pas être négatif.")
+        self.fichier = fichier
+        self.poids = float(poids)
+        self.bareme = float(bareme)
+        self.role = role
+        self.nom = nom or os.path.splitext(fichier.nom)[0] or 'export'
+
+
+def _notes_sur_20(partie: PartieExamen) -> tuple:
+    """Notes numériques de l'export ramenées sur 20, indexées par code (la dernière l'emporte)."""
+    notes, nb_anomalies = lire_notes_csv(partie.fichier)
+    notes = notes.drop_duplicates('Code', keep='last')
+    valeurs = pd.to_numeric(notes['Note'], errors='coerce').to_numpy(dtype=float) / partie.bareme * 20
+    return pd.Series(valeurs, index=pd.Index(notes['Code'])), nb_anomalies
+
+
+def fusionner_exports(parties: list, absence: str = 'zero', rattrapage: str = 'remplacer') -> tuple:
+    """
+    Combine les exports en une note finale sur 20 : moyenne pondérée des
+    parties (selon la politique `absence`), puis application du rattrapage.
+    Les notes non numériques (ABS, …) comptent comme des parties manquantes.
+
+    Retourne (table, nb_anomalies) : table avec A:Code, une colonne « Note <partie> »
+    par export (sur 20) et la Note finale, sans les étudiants sans note finale.
+    """
+    if absence not in ABSENCES or rattrapage not in RATTRAPAGES:
+        raise ValueError("Politique de fusion inconnue.")
+    composantes = [p for p in parties if p.role == 'partie']
+    if not composantes:
+        raise ValueError("Au moins un export doit avoir le rôle « partie ».")
+    if sum(p.poids for p in composantes) <= 0:
+        raise ValueError("La somme des poids des parties doit être strictement positive.")
+
+    series, nb_anomalies = [], 0
+    for partie in parties:
+        serie, nb = _notes_sur_20(partie)
+        series.append(serie)
+        nb_anomalies += nb
+
+    # Jointure sur un même type de code : texte dès qu'un export a des codes textuels
+    if not all(pd.api.types.is_integer_dtype(s.index.dtype) for s in series):
+        series = [s.set_axis(s.index.astype(TYPE_TEXTE)) for s in series]
+
+    colonnes, vues = [], set()
+    for partie in parties:
+        colonne = f"{PREFIXE_PARTIE}{partie.nom}"
+        while colonne in vues:
+            colonne += "'"
+        vues.add(colonne)
+        colonnes.append(colonne)
+    table = pd.concat(dict(zip(colonnes, series)), axis=1, join='outer', sort=True)
+
+    # Moyenne pondérée des parties
+    cols_parties = [c for c, p in zip(colonnes, parties) if p.role == 'partie']
+    poids = np.array([p.poids for p in composantes])
+    notes = table[cols_parties].to_numpy(dtype=float)
+    presentes = ~np.isnan(notes)
+    if absence == 'ignorer':
+        poids_presents = presentes @ poids
+        with np.errstate(invalid='ignore', divide='ignore'):
+            finale = np.where(presentes, notes, 0.0) @ poids / poids_presents
+        finale[poids_presents == 0] = np.nan
+    elif absence == 'zero':
+        finale = np.where(presentes, notes, 0.0) @ poids / poids.sum()
+        finale[~presentes.any(axis=1)] = np.nan
+    else:  # 'exclure' : une partie manquante rend la note finale manquante
+        finale = notes @ poids / poids.sum()
+
+    # Rattrapage : la dernière note de rattrapage disponible est retenue
+    cols_rattrapage = [c for c, p in zip(colonnes, parties) if p.role == 'rattrapage']
+    if cols_rattrapage:
+        note_rattrapage = table[cols_rattrapage].ffill(axis=1).iloc[:, -1].to_numpy(dtype=float)
+        if rattrapage == 'remplacer':
+            finale = np.where(np.isnan(note_rattrapage), finale, note_rattrapage)
+        else:
+            finale = np.fmax(finale, note_rattrapage)
+
+    table['Note'] = finale
+    table = table[table['Note'].notna()].round(2)
+    if table.empty:
+        raise ValueError("Aucun étudiant n'a de note finale après fusion.")
+    return table.rename_axis('A:Code').reset_index(), nb_anomalies
+
+
+def exporter_fusion(table: pd.DataFrame, nb_anomalies: int = 0) -> bytes:
+    """
+    Écrit la table fusionnée au format CSV d'AMC. Les copies mal identifiées
+    sont conservées sous forme de lignes A:Code = NONE, pour rester comptées.
+    """
+    anomalies = pd.DataFrame({'A:Code': ['NONE'] * nb_anomalies})
+    colonnes = ['A:Code', 'Note'] + [c for c in table.columns if c not in ('A:Code', 'Note')]
+    return pd.concat([table[colonnes], anomalies], ignore_index=True).to_csv(index=False).encode('utf-8')
+
+
+def fusionner_en_fichier(parties: list, absence: str = 'zero', rattrapage: str = 'remplacer') -> tuple:
+    """Fusionne les exports et retourne (table, FichierDepose du CSV fusionné)."""
+    table, nb_anomalies = fusionner_exports(parties, absence, rattrapage)
+    nom = f"{parties[0].nom}_fusion.csv"
+    return table, FichierDepose(exporter_fusion(table, nb_anomalies), nom=nom)
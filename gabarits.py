@@ -0,0 +1,98 @@
+"""
+Registre des gabarits de classeurs administratifs.
+
+L'administration réutilise quelques modèles de classeurs. La disposition d'un
+classeur est identifiée par son empreinte (noms des feuilles, numéro et contenu
+de la ligne d'en-tête) ; la ligne d'en-tête et les colonnes trouvées une
+première fois sont conservées dans une base SQLite locale. Aux dépôts suivants
+du même modèle, seule la ligne mémorisée est relue pour confirmer le gabarit,
+sans nouvelle recherche des en-têtes.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+from commun import connexion_sqlite
+
+# Emplacement du registre, modifiable par la variable d'environnement AMC_GABARITS
+CHEMIN_GABARITS = os.environ.get(
+    'AMC_GABARITS', os.path.join(os.path.expanduser('~'), '.outils_amc', 'gabarits.sqlite3')
+)
+
+# Nombre maximal de gabarits examinés pour un même jeu de feuilles
+CANDIDATS_MAX = 8
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS gabarits (
+    empreinte TEXT PRIMARY KEY,
+    usage TEXT NOT NULL,
+    feuilles TEXT NOT NULL,
+    ligne INTEGER NOT NULL,
+    entete TEXT NOT NULL,
+    colonnes TEXT NOT NULL,
+    utilisations INTEGER NOT NULL DEFAULT 1,
+    utilise_le TEXT NOT NULL
+)
+"""
+
+
+def _normaliser(valeurs) -> list:
+    """Contenu d'une ligne comparable d'un dépôt à l'autre : textes nettoyés, cellules vides finales retirées."""
+    cellules = ['' if v is None or v != v else str(v).strip() for v in valeurs]  # v != v : NaN
+    while cellules and not cellules[-1]:
+        cellules.pop()
+    return cellules
+
+
+def empreinte_gabarit(usage: str, feuilles: list, ligne: int, entete: list) -> str:
+    """Empreinte d'une disposition : usage, noms des feuilles, ligne et contenu de l'en-tête."""
+    contenu = json.dumps([usage, list(feuilles), ligne, _normaliser(entete)], ensure_ascii=False)
+    return hashlib.blake2b(contenu.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def resoudre_entete(usage: str, feuilles: list, lire_ligne, detecter, chemin: str = None) -> tuple:
+    """
+    Retourne (ligne, colonnes) de l'en-tête d'un classeur.
+
+    Les gabarits connus pour ces feuilles sont essayés du plus utilisé au
+    moins utilisé : `lire_ligne(ligne)` relit la seule ligne mémorisée, et le
+    gabarit est retenu si son contenu est identique. À défaut, `detecter()`
+    effectue la recherche complète et retourne (ligne, colonnes), qui sont
+    enregistrés. Un registre inaccessible n'empêche pas la détection.
+    """
+    cle_feuilles = json.dumps(list(feuilles), ensure_ascii=False)
+    try:
+        with connexion_sqlite(chemin or CHEMIN_GABARITS, _SCHEMA) as connexion:
+            candidats = connexion.execute(
+                "SELECT empreinte, ligne, entete, colonnes FROM gabarits WHERE usage = ? AND feuilles = ? "
+                "ORDER BY utilisations DESC, utilise_le DESC LIMIT ?",
+                (usage, cle_feuilles, CANDIDATS_MAX)
+            ).fetchall()
+            for empreinte, ligne, entete, colonnes in candidats:
+                if _normaliser(lire_ligne(ligne)) == json.loads(entete):
+                    connexion.execute(
+                        "UPDATE gabarits SET utilisations = utilisations + 1, utilise_le = ? WHERE empreinte = ?",
+                        (datetime.now().isoformat(timespec='seconds'), empreinte)
+                    )
+                    return ligne, json.loads(colonnes)
+    except (sqlite3.Error, OSError):
+        return detecter()
+
+    ligne, colonnes = detecter()
+    entete = _normaliser(lire_ligne(ligne))
+    try:
+        with connexion_sqlite(chemin or CHEMIN_GABARITS, _SCHEMA) as connexion:
+            connexion.execute(
+                "INSERT OR REPLACE INTO gabarits (empreinte, usage, feuilles, ligne, entete, colonnes, utilise_le) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    empreinte_gabarit(usage, feuilles, ligne, entete), usage, cle_feuilles, ligne,
+                    json.dumps(entete, ensure_ascii=False), json.dumps(colonnes),
+                    datetime.now().isoformat(timespec='seconds'),
+                )
+            )
+    except (sqlite3.Error, OSError):
+        pass
+    return ligne, colonnes
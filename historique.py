@@ -0,0 +1,123 @@
+"""
+Historique des examens analysés.
+
+Chaque examen est conservé sous forme de résumé compact (histogramme,
+quantiles, taux de réussite, bonus appliqué, effectifs) dans une base SQLite
+locale : la page de comparaison trace plusieurs examens à partir de ces
+agrégats, sans relire les anciens CSV.
+"""
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from commun import connexion_sqlite
+
+# Emplacement de la base, modifiable par la variable d'environnement AMC_HISTORIQUE
+CHEMIN_HISTORIQUE = os.environ.get(
+    'AMC_HISTORIQUE', os.path.join(os.path.expanduser('~'), '.outils_amc', 'historique.sqlite3')
+)
+
+# Classes de l'histogramme : demi-points de 0 à 20 (la dernière classe inclut 20)
+BORNES_HISTOGRAMME = np.arange(0, 20.5, 0.5)
+
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS examens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nom TEXT NOT NULL,
+    empreinte TEXT NOT NULL,
+    bonus REAL NOT NULL,
+    enregistre_le TEXT NOT NULL,
+    presents INTEGER NOT NULL,
+    anomalies INTEGER NOT NULL,
+    valides INTEGER NOT NULL,
+    taux_reussite REAL NOT NULL,
+    moyenne REAL,
+    ecart_type REAL,
+    quantiles TEXT NOT NULL,
+    histogramme TEXT NOT NULL,
+    UNIQUE (empreinte, bonus)
+)
+"""
+
+
+def resumer_notes(notes: pd.Series, nb_anomalies: int = 0, bonus: float = 0.0) -> dict:
+    """Résumé compact d'une série de notes sur 20, bonus déjà appliqué."""
+    valeurs = pd.to_numeric(notes, errors='coerce').dropna().to_numpy(dtype=float)
+    presents = len(valeurs)
+    valides = int((valeurs >= 10).sum())
+    histogramme, _ = np.histogram(np.clip(valeurs, 0, 20), bins=BORNES_HISTOGRAMME)
+    quantiles = np.quantile(valeurs, QUANTILES) if presents else [None] * len(QUANTILES)
+    return {
+        'bonus': float(bonus),
+        'presents': presents,
+        'anomalies': int(nb_anomalies),
+        'valides': valides,
+        'taux_reussite': round(valides / presents * 100, 2) if presents else 0.0,
+        'moyenne': float(valeurs.mean()) if presents else None,
+        'ecart_type': float(valeurs.std()) if presents else None,
+        'quantiles': {str(q): (None if v is None else float(v)) for q, v in zip(QUANTILES, quantiles)},
+        'histogramme': histogramme.tolist(),
+    }
+
+
+def enregistrer_examen(nom: str, empreinte: str, resume: dict, chemin: str = None) -> int:
+    """
+    Enregistre (ou remplace, pour le même fichier et le même bonus) le résumé
+    d'un examen. Retourne son identifiant.
+    """
+    with connexion_sqlite(chemin or CHEMIN_HISTORIQUE, _SCHEMA) as connexion:
+        curseur = connexion.execute(
+            """
+            INSERT INTO examens (nom, empreinte, bonus, enregistre_le, presents, anomalies, valides,
+                                 taux_reussite, moyenne, ecart_type, quantiles, histogramme)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (empreinte, bonus) DO UPDATE SET
+                nom = excluded.nom, enregistre_le = excluded.enregistre_le
+            RETURNING id
+            """,
+            (
+                nom, empreinte, resume['bonus'], datetime.now().isoformat(timespec='seconds'),
+                resume['presents'], resume['anomalies'], resume['valides'], resume['taux_reussite'],
+                resume['moyenne'], resume['ecart_type'],
+                json.dumps(resume['quantiles']), json.dumps(resume['histogramme']),
+            )
+        )
+        return curseur.fetchone()[0]
+
+
+def lister_examens(chemin: str = None) -> pd.DataFrame:
+    """
+    Tous les examens enregistrés, du plus récent au plus ancien, avec
+    quantiles et histogramme décodés et un libellé unique pour les graphiques.
+    """
+    with connexion_sqlite(chemin or CHEMIN_HISTORIQUE, _SCHEMA) as connexion:
+        examens = pd.read_sql_query("SELECT * FROM examens ORDER BY enregistre_le DESC, id DESC", connexion)
+    examens['quantiles'] = examens['quantiles'].map(json.loads)
+    examens['histogramme'] = examens['histogramme'].map(json.loads)
+
+    libelles = examens['nom'].where(
+        examens['bonus'] == 0, examens['nom'] + ' (+' + examens['bonus'].astype(str) + ' pt)'
+    )
+    doublons = libelles.duplicated(keep=False)
+    examens['libelle'] = libelles.where(~doublons, libelles + ' #' + examens['id'].astype(str))
+    return examens
+
+
+def supprimer_examens(ids, chemin: str = None):
+    with connexion_sqlite(chemin or CHEMIN_HISTORIQUE, _SCHEMA) as connexion:
+        connexion.executemany("DELETE FROM examens WHERE id = ?", [(int(i),) for i in ids])
+
+
+def histogrammes_long(examens: pd.DataFrame) -> pd.DataFrame:
+    """Histogrammes des examens au format long (Examen, Note, Effectif), prêts pour plotly."""
+    classes = BORNES_HISTOGRAMME[:-1]  # borne inférieure de chaque classe
+    return pd.DataFrame({
+        'Examen': np.repeat(examens['libelle'].to_numpy(), len(classes)),
+        'Note': np.tile(classes, len(examens)),
+        'Effectif': np.concatenate([np.asarray(h) for h in examens['histogramme']]) if len(examens) else [],
+    })
@@ -0,0 +1,43 @@
+"""
+Fonctions partagées par les pages Streamlit (unique.py, unique3.py, virgule.py,
+point_virgule.py).
+"""
+import streamlit as st
+
+from fichiers import FichierDepose
+
+
+def fichier_depose(uploaded, cle: str) -> FichierDepose:
+    """
+    Retourne le FichierDepose associé au fichier chargé dans l'uploader `cle`,
+    en le conservant dans la session : il n'est construit, et son empreinte
+    calculée, qu'une fois par fichier et non à chaque rerun. C'est une vue
+    sur les octets que l'uploader conserve, libérée avec le fichier précédent
+    dès qu'il est remplacé.
+    """
+    file_id, fichier = st.session_state.get(f"fichier:{cle}", (None, None))
+    if file_id != uploaded.file_id:
+        fichier = FichierDepose(uploaded).compter_depot()
+        st.session_state[f"fichier:{cle}"] = (uploaded.file_id, fichier)
+    return fichier
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _transfert_memorise(page: str, xls_empreinte: str, csv_empreinte: str, add_notes: float,
+                        _traitement, _xls: FichierDepose, _csv: FichierDepose) -> tuple:
+    # Les paramètres préfixés par '_' ne sont pas hachés par Streamlit : la clé est l'empreinte du contenu
+    classeur, nb_none = _traitement(_xls.flux(), _csv, add_notes)
+    if classeur is None:
+        return None, nb_none
+    # Une seule sauvegarde : les octets produits sont servis tels quels au bouton de téléchargement
+    return classeur.getvalue(), nb_none
+
+
+def transfert_memorise(traitement, xls: FichierDepose, csv: FichierDepose, add_notes: float) -> tuple:
+    """
+    Classeur rempli (en octets) et nombre d'étudiants mal identifiés, produits
+    par `traitement(flux du classeur, csv, add_notes)` — le process_csv2excel
+    de la page. Recalculé uniquement si le classeur, le CSV ou le bonus changent.
+    """
+    page = traitement.__code__.co_filename
+    return _transfert_memorise(page, xls.empreinte(), csv.empreinte(), add_notes, traitement, xls, csv)
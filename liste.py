@@ -0,0 +1,171 @@
+"""
+Lecture du fichier Excel administratif et production des listes étudiants AMC.
+
+Les erreurs sont signalées par ValueError.
+"""
+import io
+import re
+import zipfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+import metriques
+from admission import creneau, echeance, inspecter_classeur, parcourir
+from codes import TYPE_TEXTE, aligner_codes, canoniser_codes
+from gabarits import resoudre_entete
+
+COLONNES_REQUISES = ['Code', 'Nom', 'Prénom']
+
+# Intitulés reconnus comme colonne de groupe dans les fichiers de l'administration
+COLONNES_GROUPE = ['Groupe', 'Section', 'Groupe TD', 'Groupe TP', 'Gr', 'TD', 'TP']
+
+
+def _texte(valeur):
+    """Valeur d'une cellule en texte, comme la lecture pandas avec dtype=str (1001.0 donne '1001')."""
+    if valeur is None:
+        return None
+    if isinstance(valeur, float) and valeur.is_integer():
+        valeur = int(valeur)
+    return str(valeur)
+
+
+def lire_fichier_admin(file) -> pd.DataFrame:
+    """
+    Lit le fichier Excel administratif et retourne ses lignes de données,
+    avec pour en-têtes la ligne contenant Code, Nom et Prénom. Le classeur est
+    lu en flux (lecture seule) : pour un modèle connu du registre des gabarits,
+    seule la ligne d'en-tête mémorisée est relue, puis les lignes suivantes
+    sur les seules colonnes nommées. Le classeur passe d'abord le contrôle
+    d'admission (ClasseurRefuse, sous-classe de ValueError) ; un classeur
+    lourd attend un créneau, et ValueError est levée au-delà de la durée
+    maximale de traitement.
+    """
+    inspection = inspecter_classeur(file)
+    with creneau(inspection):
+        delai = echeance()
+        with metriques.chronometre('amc_duree_lecture_secondes', fichier='excel'):
+            wb = load_workbook(file, read_only=True, data_only=True)
+            try:
+                ws = wb.worksheets[0]
+                parcourues = []  # lignes déjà lues par la recherche complète de l'en-tête
+
+                def lire_ligne(ligne):
+                    if ligne < len(parcourues):
+                        return [_texte(v) for v in parcourues[ligne]]
+                    valeurs = next(ws.iter_rows(min_row=ligne + 1, max_row=ligne + 1, values_only=True), ())
+                    return [_texte(v) for v in valeurs]
+
+                def detecter():
+                    # Localiser la ligne d'en-tête contenant Code, Nom, Prénom
+                    for ligne, valeurs in enumerate(parcourir(ws.iter_rows(values_only=True), delai)):
+                        parcourues.append(valeurs)
+                        textes = [_texte(v) for v in valeurs]
+                        if all(col in textes for col in COLONNES_REQUISES):
+                            return ligne, {}
+                    raise ValueError("Les colonnes 'Code', 'Nom', 'Prénom' sont introuvables dans le fichier.")
+
+                # Modèle déjà rencontré : la ligne d'en-tête mémorisée est seulement vérifiée
+                header_index, _ = resoudre_entete('liste', wb.sheetnames, lire_ligne, detecter)
+                entete = lire_ligne(header_index)
+                positions = [i for i, v in enumerate(entete) if v is not None and v.strip()]
+
+                # Lignes de données lues sur les seules colonnes nommées de l'en-tête
+                premiere = positions[0]
+                contenu = pd.DataFrame(
+                    parcourir(ws.iter_rows(
+                        min_row=header_index + 2, min_col=premiere + 1, max_col=positions[-1] + 1,
+                        values_only=True
+                    ), delai),
+                    dtype=object
+                )
+            finally:
+                wb.close()
+        delai()
+
+    contenu = contenu.reindex(columns=[p - premiere for p in positions]).dropna(how='all')
+    xls = contenu.map(_texte).astype(TYPE_TEXTE)
+    xls.columns = [entete[p] for p in positions]
+    xls = xls.reset_index(drop=True)
+
+    if xls.empty:
+        raise ValueError("Aucune donnée valide après traitement.")
+
+    missing = [c for c in COLONNES_REQUISES if c not in xls.columns]
+    if missing:
+        raise ValueError(f"Colonnes manquantes : {', '.join(missing)}")
+
+    return xls
+
+
+def colonnes_groupe(xls: pd.DataFrame) -> list:
+    """Colonnes candidates pour un découpage par groupe, les intitulés reconnus en premier."""
+    autres = [c for c in xls.columns if isinstance(c, str) and c not in COLONNES_REQUISES and c != 'Note']
+    connues = [c for c in autres if c.strip() in COLONNES_GROUPE]
+    return connues + [c for c in autres if c not in connues]
+
+
+def detecter_colonne_groupe(xls: pd.DataFrame):
+    """Retourne la première colonne dont l'intitulé désigne un groupe, ou None."""
+    return next((c for c in colonnes_groupe(xls) if c.strip() in COLONNES_GROUPE), None)
+
+
+def construire_liste(xls: pd.DataFrame, col_groupe: str = None) -> pd.DataFrame:
+    """
+    Produit la liste AMC (Code, Name), suivie de la colonne de groupe si demandée.
+    Name est construit par concaténation vectorisée de chaînes Arrow ; la
+    colonne de groupe, très répétitive, est stockée en catégorie.
+    """
+    colonnes = COLONNES_REQUISES + ([col_groupe] if col_groupe else [])
+    liste = xls.dropna(subset=COLONNES_REQUISES)[colonnes].copy()
+    liste['Code'] = canoniser_codes(liste['Code'])
+    liste = liste.dropna(subset=['Code'])
+    liste['Name'] = liste['Code'].astype(TYPE_TEXTE) + ' ' + liste['Nom'] + ' ' + liste['Prénom']
+    if col_groupe:
+        liste[col_groupe] = liste[col_groupe].fillna('Sans groupe').str.strip().astype('category')
+    return liste[['Code', 'Name'] + colonnes[3:]].drop_duplicates().reset_index(drop=True)
+
+
+def comparer_listes(ancienne: pd.DataFrame, nouvelle: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compare deux listes AMC (Code, Name) par code canonique, en une seule
+    jointure par hachage des codes. Retourne les changements (Code, Changement,
+    Ancien nom, Nouveau nom), Changement valant 'Ajouté', 'Retiré' ou 'Renommé'.
+    Un code présent plusieurs fois n'est considéré qu'à sa première occurrence.
+    """
+    codes_anciens, codes_nouveaux = aligner_codes(ancienne['Code'], nouvelle['Code'])
+    gauche = pd.DataFrame({'Code': codes_anciens, 'Ancien nom': ancienne['Name'].astype(TYPE_TEXTE)})
+    droite = pd.DataFrame({'Code': codes_nouveaux, 'Nouveau nom': nouvelle['Name'].astype(TYPE_TEXTE)})
+    comparaison = pd.merge(
+        gauche.drop_duplicates('Code'), droite.drop_duplicates('Code'),
+        on='Code', how='outer', indicator=True, sort=False
+    )
+    presents = comparaison['_merge'] == 'both'
+    identiques = presents & (comparaison['Ancien nom'] == comparaison['Nouveau nom']).fillna(False)
+    comparaison['Changement'] = comparaison['_merge'].cat.rename_categories(
+        {'left_only': 'Retiré', 'right_only': 'Ajouté', 'both': 'Renommé'}
+    )
+    comparaison = comparaison[~identiques]
+    return comparaison[['Code', 'Changement', 'Ancien nom', 'Nouveau nom']].reset_index(drop=True)
+
+
+def _nom_fichier_groupe(groupe) -> str:
+    return 'liste_' + (re.sub(r'[^\w-]+', '_', str(groupe)).strip('_') or 'groupe') + '.csv'
+
+
+def exporter_listes_groupes(liste: pd.DataFrame, col_groupe: str) -> bytes:
+    """
+    Produit une archive zip contenant la liste complète et une liste AMC par
+    groupe, en un seul parcours groupé. Chaque CSV est écrit directement dans
+    l'archive, sans chaîne intermédiaire.
+    """
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        with zf.open('liste_etudiants_amc.csv', 'w') as f, io.TextIOWrapper(f, encoding='utf-8', newline='') as texte:
+            liste.to_csv(texte, index=False)
+
+        for groupe, sous_liste in liste.groupby(col_groupe, observed=True, sort=True):
+            nom = f'groupes/{_nom_fichier_groupe(groupe)}'
+            with zf.open(nom, 'w') as f, io.TextIOWrapper(f, encoding='utf-8', newline='') as texte:
+                sous_liste[['Code', 'Name']].to_csv(texte, index=False)
+    return output.getvalue()
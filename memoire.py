@@ -0,0 +1,110 @@
+"""
+Comptabilité mémoire des caches partagés et budget global.
+
+Les résultats volumineux et recalculables (transferts terminés, fusions,
+barèmes, listes lues, index de recherche, aperçus, statistiques par groupe,
+similitudes, réponses du service HTTP) sont rangés dans des caches partagés
+entre sessions (cache_partage), qui en mesurent la taille. À la fin de chaque
+rerun (et après chaque requête du service), appliquer_budgets fait respecter
+le budget global (AMC_BUDGET_GLOBAL_MO) : les entrées les moins récemment
+utilisées sont évincées, en commençant par les caches les plus volumineux, et
+recalculées à la demande suivante.
+
+Seuls ces caches sont budgétés. Ce qu'une session conserve en propre ne le
+serait pas utilement : les fichiers déposés sont des vues sur les octets que
+l'uploader de Streamlit garde de toute façon, un transfert en cours ne peut
+être évincé sans être perdu, et les barèmes saisis ne se recalculent pas.
+"""
+import os
+import threading
+
+import pandas as pd
+
+import metriques
+from commun import CacheLRU
+
+MO = 1024 * 1024
+
+# Budget (en octets) des caches partagés, modifiable par variable d'environnement (en Mo)
+BUDGET_GLOBAL = int(float(os.environ.get('AMC_BUDGET_GLOBAL_MO', '2048')) * MO)
+
+
+def taille_objet(objet) -> int:
+    """Octets occupés en mémoire vive par une entrée de cache."""
+    if isinstance(objet, tuple):
+        return sum(taille_objet(element) for element in objet)
+    if isinstance(objet, (bytes, bytearray)):
+        return len(objet)
+    if isinstance(objet, memoryview):
+        return objet.nbytes
+    if isinstance(objet, pd.DataFrame):
+        return int(objet.memory_usage(deep=True).sum())
+    if isinstance(objet, pd.Series):
+        return int(objet.memory_usage(deep=True))
+    return int(getattr(objet, 'taille_memoire', 0) or 0)
+
+
+_caches = {}  # nom -> CacheLRU partagé entre sessions
+_evictions = 0
+_verrou = threading.Lock()
+
+
+def cache_partage(nom: str, taille_max: int) -> CacheLRU:
+    """
+    Cache partagé entre sessions, créé au premier appel et borné à
+    `taille_max` entrées. Ses entrées comptent dans le budget global.
+    """
+    with _verrou:
+        cache = _caches.get(nom)
+        if cache is None:
+            cache = _caches[nom] = CacheLRU(taille_max, nom=nom)
+        return cache
+
+
+def _caches_actuels() -> dict:
+    with _verrou:
+        return dict(_caches)
+
+
+def etat_global() -> dict:
+    """Octets de chaque cache partagé, leur total et le nombre d'entrées évincées."""
+    caches = {nom: cache.total(taille_objet) for nom, cache in _caches_actuels().items()}
+    return {'caches': caches, 'total': sum(caches.values()), 'evictions': _evictions}
+
+
+def inventaire() -> pd.DataFrame:
+    """Caches partagés : nom, entrées présentes et maximales, taille en Mo."""
+    caches = _caches_actuels()
+    tailles = etat_global()['caches']
+    return pd.DataFrame({
+        'Cache': list(caches),
+        'Entrées': [len(cache) for cache in caches.values()],
+        'Maximum': [cache.taille_max for cache in caches.values()],
+        'Taille (Mo)': [round(tailles.get(nom, 0) / MO, 2) for nom in caches],
+    })
+
+
+def appliquer_budgets() -> int:
+    """
+    Fait respecter le budget global : évince les entrées les moins récemment
+    utilisées, les caches les plus volumineux d'abord. Retourne le nombre
+    d'octets libérés.
+    """
+    global _evictions
+    caches = _caches_actuels()
+    tailles = etat_global()['caches']
+    exces = sum(tailles.values()) - BUDGET_GLOBAL
+    liberes = 0
+    for nom in sorted(tailles, key=tailles.get, reverse=True):
+        if exces <= 0:
+            break
+        liberees = caches[nom].evincer(exces, taille_objet)
+        with _verrou:
+            _evictions += len(liberees)
+        metriques.incrementer('amc_evictions_total', len(liberees))
+        exces -= sum(liberees)
+        liberes += sum(liberees)
+    return liberes
+
+
+metriques.sonde(lambda: [('amc_memoire_caches_octets', {}, etat_global()['total'])])
@@ -0,0 +1,194 @@
+"""
+Métriques d'exploitation du serveur, tenues en mémoire et exposées au format
+texte Prometheus.
+
+Compteurs, jauges et durées sont alimentés par les modules de traitement
+(fichiers déposés, lectures, transferts, caches) ; les valeurs calculées au
+moment de la lecture (sessions actives, taille des caches) sont fournies par
+des sondes. Si la variable d'environnement AMC_PORT_METRIQUES est définie,
+l'application Streamlit publie ces métriques sur http://127.0.0.1:<port>/metrics ;
+le service HTTP (service.py) les expose sur sa route GET /metriques.
+"""
+import functools
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Une session est considérée active si elle a été vue depuis moins de ce délai (en secondes)
+DUREE_SESSION_ACTIVE = 300
+
+# Nom, type et description de chaque métrique exposée
+DESCRIPTIONS = {
+    'amc_sessions_actives': ('gauge', f"Sessions vues depuis moins de {DUREE_SESSION_ACTIVE} secondes"),
+    'amc_fichiers_deposes_total': ('counter', "Fichiers déposés"),
+    'amc_octets_deposes_total': ('counter', "Octets déposés"),
+    'amc_fichiers_sur_disque_total': ('counter', "Fichiers déversés sur disque"),
+    'amc_duree_lecture_secondes': ('summary', "Durée de lecture des fichiers, par type"),
+    'amc_duree_enregistrement_secondes': ('summary', "Durée d'enregistrement des classeurs remplis"),
+    'amc_transferts_en_cours': ('gauge', "Transferts en cours d'exécution"),
+    'amc_transferts_total': ('counter', "Transferts achevés, par état final"),
+    'amc_transferts_en_file': ('gauge', "Transferts lourds en attente d'un créneau"),
+    'amc_admission_refus_total': ('counter', "Classeurs refusés par le contrôle d'admission, par motif"),
+    'amc_service_requetes': ('gauge', "Requêtes du service HTTP, par état"),
+    'amc_service_refus_total': ('counter', "Requêtes refusées par le service HTTP, par motif"),
+    'amc_cache_acces_total': ('counter', "Accès aux caches"),
+    'amc_cache_calculs_total': ('counter', "Accès aux caches ayant nécessité un calcul (défauts)"),
+    'amc_cache_entrees': ('gauge', "Entrées présentes dans les caches bornés"),
+    'amc_memoire_caches_octets': ('gauge', "Octets comptabilisés dans les caches partagés"),
+    'amc_evictions_total': ('counter', "Entrées de caches partagés évincées pour respecter le budget mémoire"),
+}
+
+_verrou = threading.Lock()
+_valeurs = {}     # (nom, étiquettes) -> valeur (compteurs et jauges)
+_durees = {}      # (nom, étiquettes) -> [nombre, somme]
+_sessions = {}    # identifiant -> instant de dernière activité
+_sondes = []      # fonctions retournant des (nom, étiquettes, valeur)
+
+
+def _cle(nom: str, etiquettes: dict) -> tuple:
+    return nom, tuple(sorted(etiquettes.items()))
+
+
+def incrementer(nom: str, valeur: float = 1, **etiquettes):
+    """Ajoute `valeur` à un compteur ou à une jauge (valeur négative pour une jauge)."""
+    cle = _cle(nom, etiquettes)
+    with _verrou:
+        _valeurs[cle] = _valeurs.get(cle, 0) + valeur
+
+
+def observer(nom: str, duree: float, **etiquettes):
+    cle = _cle(nom, etiquettes)
+    with _verrou:
+        nombre_somme = _durees.setdefault(cle, [0, 0.0])
+        nombre_somme[0] += 1
+        nombre_somme[1] += duree
+
+
+@contextmanager
+def chronometre(nom: str, **etiquettes):
+    """Mesure la durée du bloc et l'enregistre dans la métrique `nom`."""
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        observer(nom, time.perf_counter() - debut, **etiquettes)
+
+
+def session_active(identifiant: str):
+    with _verrou:
+        _sessions[identifiant] = time.monotonic()
+
+
+def sonde(fonction):
+    """Enregistre une fonction appelée à chaque lecture, retournant des (nom, étiquettes, valeur)."""
+    with _verrou:
+        _sondes.append(fonction)
+    return fonction
+
+
+def sonde_taille(nom_cache: str, objet):
+    """Sonde de taille d'un cache borné, sans le maintenir en vie."""
+    reference = weakref.ref(objet)
+
+    def taille():
+        cache = reference()
+        return [] if cache is None else [('amc_cache_entrees', {'cache': nom_cache}, len(cache))]
+
+    sonde(taille)
+
+
+def mesurer_cache(nom_cache: str, decorateur_cache):
+    """
+    Applique `decorateur_cache` (st.cache_data, st.cache_resource…) en comptant
+    les accès et les calculs : la fonction décorée ne s'exécute qu'en cas de
+    défaut, la différence donne les succès.
+    """
+    def decorer(fonction):
+        @functools.wraps(fonction)
+        def calcul(*args, **kwargs):
+            incrementer('amc_cache_calculs_total', cache=nom_cache)
+            return fonction(*args, **kwargs)
+
+        memorisee = decorateur_cache(calcul)
+
+        @functools.wraps(fonction)
+        def acces(*args, **kwargs):
+            incrementer('amc_cache_acces_total', cache=nom_cache)
+            return memorisee(*args, **kwargs)
+
+        acces.clear = getattr(memorisee, 'clear', None)
+        return acces
+    return decorer
+
+
+def _sessions_actives() -> list:
+    limite = time.monotonic() - DUREE_SESSION_ACTIVE
+    with _verrou:
+        for identifiant in [i for i, vu in _sessions.items() if vu < limite]:
+            del _sessions[identifiant]
+        return [('amc_sessions_actives', {}, len(_sessions))]
+
+
+sonde(_sessions_actives)
+
+
+def _format_etiquettes(etiquettes) -> str:
+    if not etiquettes:
+        return ''
+    paires = ','.join(
+        '{}="{}"'.format(cle, str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for cle, valeur in etiquettes
+    )
+    return '{' + paires + '}'
+
+
+def exposer() -> str:
+    """Toutes les métriques au format texte Prometheus (version 0.0.4)."""
+    with _verrou:
+        valeurs = dict(_valeurs)
+        durees = {cle: list(v) for cle, v in _durees.items()}
+        sondes = list(_sondes)
+    for fonction in sondes:
+        for nom, etiquettes, valeur in fonction():
+            valeurs[_cle(nom, etiquettes)] = valeur
+
+    lignes = []
+    for nom, (type_metrique, description) in DESCRIPTIONS.items():
+        lignes.append(f"# HELP {nom} {description}")
+        lignes.append(f"# TYPE {nom} {type_metrique}")
+        if type_metrique == 'summary':
+            for (n, etiquettes), (nombre, somme) in sorted(durees.items()):
+                if n == nom:
+                    lignes.append(f"{nom}_count{_format_etiquettes(etiquettes)} {nombre}")
+                    lignes.append(f"{nom}_sum{_format_etiquettes(etiquettes)} {somme:.6f}")
+        else:
+            for (n, etiquettes), valeur in sorted(valeurs.items()):
+                if n == nom:
+                    lignes.append(f"{nom}{_format_etiquettes(etiquettes)} {valeur:.15g}")
+    return '\n'.join(lignes) + '\n'
+
+
+class _GestionnaireMetriques(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ('/metrics', '/metriques'):
+            self.send_error(404)
+            return
+        corps = exposer().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, format, *args):
+        pass  # pas de journal par requête de collecte
+
+
+def servir(port: int, hote: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """Publie les métriques sur http://hote:port/metrics depuis un thread d'arrière-plan."""
+    serveur = ThreadingHTTPServer((hote, port), _GestionnaireMetriques)
+    serveur.daemon_threads = True
+    threading.Thread(target=serveur.serve_forever, name='amc-metriques', daemon=True).start()
+    return serveur
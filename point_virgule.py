@@ -2,6 +2,7 @@
 import streamlit as st
 import pandas as pd
 from openpyxl import load_workbook
+from interface import fichier_depose, transfert_memorise
 import plotly.express as px
 import io
 
@@ -54,7 +55,7 @@ def process_excel(file):
 def process_csv2excel(xls_file, csv_file, add_notes=0):
     try:
         # Charger le fichier CSV
-        csv = pd.read_csv(csv_file,  delimiter=';', encoding='utf-8')
+        csv = pd.read_csv(csv_file.flux(),  delimiter=';', encoding='utf-8')
 
         # Renommer la colonne 'Mark' en 'Note' si elle existe
         if 'Mark' in csv.columns:
@@ -348,29 +349,15 @@ elif section == "NOTES":
     )
     if xls_file is not None and csv_file is not None:
         with st.spinner("Traitement automatique du fichier Excel en cours..."):
-            # Lire le contenu du fichier CSV en mémoire
-            csv_content = io.BytesIO(csv_file.getvalue())
+            # Vues sans copie sur les fichiers déposés, conservées d'un rerun à l'autre
+            csv_content = fichier_depose(csv_file, "csv_uploader")
+            xls_content = fichier_depose(xls_file, "excel_uploader2")
 
-            # Lire le contenu du fichier Excel en mémoire
-            xls_content = io.BytesIO(xls_file.getvalue())
-
-            # Traitez les fichiers avec process_csv2excel
+            # Traitez les fichiers avec process_csv2excel (résultat mémorisé par empreinte des fichiers et bonus)
             add_notes = st.number_input("Combien voulez-vous ajouter de points à l'ensemble des étudiants?", step=0.5)
-            processed_xls, nb_none = process_csv2excel(xls_content, csv_content, add_notes)
-
-        if processed_xls is not None:
-            # Lire le fichier Excel traité
-            wb = load_workbook(processed_xls)
-            output = io.BytesIO()
-            wb.save(output)  # Sauvegardez le fichier dans un flux binaire
-            wb.close()
-
-            # Réinitialisez le curseur du flux binaire
-            output.seek(0)
-
-            # Encodez le contenu en base64 pour le téléchargement
-            file_data = output.getvalue()
+            file_data, nb_none = transfert_memorise(process_csv2excel, xls_content, csv_content, add_notes)
 
+        if file_data is not None:
             # Ajoutez un bouton de téléchargement
             st.success("✅ Félicitations ! Les notes ont été saisies avec succès.")
             file_name = st.text_input(
@@ -381,5 +368,5 @@ elif section == "NOTES":
                 file_name=file_name + ".xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
-        if nb_none > 0:
+        if nb_none:
             st.warning(f"Attention! {nb_none} étudiants ont été mal identifiés. Vérifiez leurs copies et saisissez leurs notes manuellement.")
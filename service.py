@@ -0,0 +1,273 @@
+"""
+Service HTTP local des Outils AMC, sans Streamlit, pour les scripts du département.
+
+Lancement :
+    python service.py --port 8502 --workers 4
+
+Routes (corps en multipart/form-data) :
+    POST /liste         excel=<xlsx> [groupe=<colonne>]             → CSV AMC (zip par groupe si `groupe`)
+    POST /statistiques  csv=<csv AMC> [bonus=<points>]               → JSON (résumé de la distribution)
+    POST /transfert     excel=<xlsx> csv=<csv AMC> [bonus=<points>]
+                        [sortie=xlsx|rapport|json]                   → classeur rempli, rapport CSV ou JSON
+                        [classement=rang,centile,mention]
+    GET  /sante                                                      → JSON
+    GET  /metriques                                                  → métriques (format Prometheus)
+
+Les traitements s'exécutent dans un pool de workers borné ; au-delà de la
+file d'attente autorisée, le service répond 503. Les réponses sont mémorisées
+par empreinte des fichiers et paramètres dans un cache partagé (memoire),
+compté dans le même budget mémoire global que les caches de l'interface.
+Un classeur refusé par le contrôle d'admission (admission.py) donne 413.
+"""
+import argparse
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import memoire
+import metriques
+from admission import ClasseurRefuse
+from fichiers import FichierDepose
+from historique import resumer_notes
+from liste import construire_liste, exporter_listes_groupes, lire_fichier_admin
+from statistiques import lire_notes_amc
+from transfert import CLASSEMENTS, transferer_notes
+
+# Taille maximale acceptée pour le corps d'une requête
+TAILLE_MAX_REQUETE = int(float(os.environ.get('AMC_TAILLE_MAX_MO', '100')) * 1024 * 1024)
+
+# Nombre de réponses mémorisées
+REPONSES_MEMORISEES_MAX = 32
+
+MIME_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class ErreurRequete(ValueError):
+    """Requête invalide : renvoyée au client avec le statut 400."""
+
+
+# =============================================================================
+# OPÉRATIONS
+# =============================================================================
+
+def _fichier(champs: dict, nom: str) -> FichierDepose:
+    fichier = champs.get(nom)
+    if not isinstance(fichier, FichierDepose):
+        raise ErreurRequete(f"Fichier '{nom}' manquant dans le formulaire.")
+    return fichier
+
+
+def _bonus(champs: dict) -> float:
+    try:
+        bonus = float(str(champs.get('bonus', '0')).replace(',', '.'))
+    except ValueError:
+        raise ErreurRequete("Le paramètre 'bonus' doit être un nombre.")
+    if not 0 <= bonus <= 20:
+        raise ErreurRequete("Le paramètre 'bonus' doit être compris entre 0 et 20.")
+    return bonus
+
+
+def _classement(champs: dict) -> dict:
+    """Indicateurs de classement demandés (séparés par des virgules), avec leur intitulé par défaut."""
+    demandes = [cle.strip() for cle in str(champs.get('classement', '')).split(',') if cle.strip()]
+    inconnus = [cle for cle in demandes if cle not in CLASSEMENTS]
+    if inconnus:
+        raise ErreurRequete(
+            f"Le paramètre 'classement' n'accepte que {', '.join(CLASSEMENTS)} (reçu : {', '.join(inconnus)})."
+        )
+    return {cle: CLASSEMENTS[cle] for cle in demandes}
+
+
+def operation_liste(champs: dict) -> tuple:
+    excel = _fichier(champs, 'excel')
+    groupe = champs.get('groupe') or None
+    xls = lire_fichier_admin(excel.flux())
+    if groupe and groupe not in xls.columns:
+        raise ErreurRequete(f"Colonne de groupe '{groupe}' absente du fichier.")
+    liste = construire_liste(xls, groupe)
+    if groupe:
+        return 200, 'application/zip', exporter_listes_groupes(liste, groupe), {}
+    return 200, 'text/csv; charset=utf-8', liste.to_csv(index=False).encode('utf-8'), {}
+
+
+def operation_statistiques(champs: dict) -> tuple:
+    bonus = _bonus(champs)
+    df_notes, anomalies = lire_notes_amc(_fichier(champs, 'csv'))
+    notes = (df_notes['Note'] + bonus).clip(upper=20) if bonus else df_notes['Note']
+    resume = resumer_notes(notes, len(anomalies), bonus)
+    return 200, 'application/json', json.dumps(resume).encode('utf-8'), {}
+
+
+def operation_transfert(champs: dict) -> tuple:
+    sortie = champs.get('sortie', 'xlsx')
+    if sortie not in ('xlsx', 'rapport', 'json'):
+        raise ErreurRequete("Le paramètre 'sortie' doit valoir xlsx, rapport ou json.")
+    output, nb_anomalies, nb_transferts, nb_dispo, rapprochement = transferer_notes(
+        _fichier(champs, 'excel'), _fichier(champs, 'csv'), _bonus(champs), classement=_classement(champs)
+    )
+    compteurs = {
+        'transferees': nb_transferts,
+        'disponibles': nb_dispo,
+        'mal_identifies': nb_anomalies,
+        'absents_classeur': len(rapprochement.absents_classeur),
+        'sans_note': len(rapprochement.sans_note),
+        'doublons_csv': len(rapprochement.doublons_csv),
+        'doublons_classeur': len(rapprochement.doublons_classeur),
+    }
+    entetes = {f"X-AMC-{cle.replace('_', '-').title()}": str(val) for cle, val in compteurs.items()}
+    if sortie == 'json':
+        return 200, 'application/json', json.dumps(compteurs).encode('utf-8'), {}
+    if sortie == 'rapport':
+        return 200, 'text/csv; charset=utf-8', rapprochement.rapport_csv(), entetes
+    return 200, MIME_XLSX, output.getvalue(), entetes
+
+
+def executer(operation, champs: dict) -> tuple:
+    """Exécute une opération dans un worker, en tenant à jour les jauges de requêtes."""
+    metriques.incrementer('amc_service_requetes', -1, etat='en_attente')
+    metriques.incrementer('amc_service_requetes', etat='en_cours')
+    try:
+        return operation(champs)
+    finally:
+        metriques.incrementer('amc_service_requetes', -1, etat='en_cours')
+
+
+OPERATIONS = {
+    '/liste': operation_liste,
+    '/statistiques': operation_statistiques,
+    '/transfert': operation_transfert,
+}
+
+
+def lire_formulaire(content_type: str, corps: bytes) -> dict:
+    """
+    Décode un corps multipart/form-data : les champs fichiers deviennent des
+    FichierDepose (déversés sur disque au-delà du seuil), les autres des chaînes.
+    """
+    if not content_type.startswith('multipart/form-data'):
+        raise ErreurRequete("Le corps de la requête doit être en multipart/form-data.")
+    message = BytesParser(policy=policy.HTTP).parsebytes(
+        b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + corps
+    )
+    champs = {}
+    for partie in message.iter_parts():
+        nom = partie.get_param('name', header='content-disposition')
+        contenu = partie.get_payload(decode=True) or b''
+        if partie.get_filename():
+            champs[nom] = FichierDepose(contenu, nom=partie.get_filename()).compter_depot()
+        else:
+            champs[nom] = contenu.decode('utf-8').strip()
+    return champs
+
+
+def cle_requete(chemin: str, champs: dict) -> tuple:
+    """Clé de mémorisation : route, empreinte des fichiers et valeurs des autres champs."""
+    return (chemin,) + tuple(sorted(
+        (nom, valeur.empreinte() if isinstance(valeur, FichierDepose) else valeur)
+        for nom, valeur in champs.items()
+    ))
+
+
+# =============================================================================
+# SERVEUR
+# =============================================================================
+
+class ServiceAMC(ThreadingHTTPServer):
+    """Serveur HTTP adossé à un pool de workers et à un cache de réponses."""
+
+    daemon_threads = True
+
+    def __init__(self, adresse: tuple, workers: int = 4, file_max: int = None):
+        super().__init__(adresse, GestionnaireAMC)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='amc-worker')
+        # Requêtes admises simultanément (en cours + en attente d'un worker)
+        self.places = threading.BoundedSemaphore(file_max or workers * 4)
+        self.reponses = memoire.cache_partage('service', REPONSES_MEMORISEES_MAX)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+class GestionnaireAMC(BaseHTTPRequestHandler):
+    server_version = 'OutilsAMC/1.0'
+
+    def _repondre(self, statut: int, type_contenu: str, corps: bytes, entetes: dict = None):
+        self.send_response(statut)
+        self.send_header('Content-Type', type_contenu)
+        self.send_header('Content-Length', str(len(corps)))
+        for nom, valeur in (entetes or {}).items():
+            self.send_header(nom, valeur)
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def _erreur(self, statut: int, message: str):
+        self._repondre(statut, 'application/json', json.dumps({'erreur': message}).encode('utf-8'))
+
+    def do_GET(self):
+        if self.path == '/sante':
+            self._repondre(200, 'application/json', json.dumps({'statut': 'ok'}).encode('utf-8'))
+        elif self.path == '/metriques':
+            self._repondre(200, 'text/plain; version=0.0.4; charset=utf-8', metriques.exposer().encode('utf-8'))
+        else:
+            self._erreur(404, f"Route inconnue : {self.path}")
+
+    def do_POST(self):
+        operation = OPERATIONS.get(self.path)
+        if operation is None:
+            self._erreur(404, f"Route inconnue : {self.path}")
+            return
+
+        taille = int(self.headers.get('Content-Length') or 0)
+        if taille > TAILLE_MAX_REQUETE:
+            metriques.incrementer('amc_service_refus_total', motif='taille')
+            self._erreur(413, "Requête trop volumineuse.")
+            return
+
+        if not self.server.places.acquire(blocking=False):
+            metriques.incrementer('amc_service_refus_total', motif='saturation')
+            self._erreur(503, "Service saturé, réessayez plus tard.")
+            return
+        try:
+            champs = lire_formulaire(self.headers.get('Content-Type', ''), self.rfile.read(taille))
+            cle = cle_requete(self.path, champs)
+            reponse = self.server.reponses.get(cle)
+            if reponse is None:
+                metriques.incrementer('amc_service_requetes', etat='en_attente')
+                reponse = self.server.pool.submit(executer, operation, champs).result()
+                self.server.reponses[cle] = reponse
+                memoire.appliquer_budgets()
+            self._repondre(*reponse)
+        except ClasseurRefuse as e:
+            self._erreur(413, str(e))
+        except ValueError as e:  # ErreurRequete et fichiers invalides
+            self._erreur(400, str(e))
+        except Exception as e:
+            self._erreur(500, f"Erreur technique : {e}")
+        finally:
+            self.server.places.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP local des Outils AMC.")
+    parser.add_argument('--hote', default='127.0.0.1', help="adresse d'écoute (défaut : 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--workers', type=int, default=4, help="nombre de traitements simultanés")
+    args = parser.parse_args()
+
+    serveur = ServiceAMC((args.hote, args.port), workers=args.workers)
+    print(f"Service AMC à l'écoute sur http://{args.hote}:{serveur.server_port}")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Détection des copies aux réponses anormalement similaires.
+
+L'export AMC contient le score de chaque copie à chaque question. Deux copies
+sont comparées sur les questions où elles ont obtenu le même score, chaque
+concordance étant pondérée par sa rareté (-log de la fréquence de ce score à
+cette question) : partager une erreur rare pèse bien plus que partager une
+bonne réponse. Les copies sont encodées une fois en matrice (copie × (question,
+score)) ; les similarités de toutes les paires s'obtiennent par produits
+matriciels, bloc de lignes par bloc de lignes, sans boucle sur les paires.
+Une paire est signalée lorsque sa similarité dépasse la moyenne de toutes les
+paires comparées de `seuil` écarts-types.
+"""
+import numpy as np
+import pandas as pd
+
+from codes import aligner_codes
+from statistiques import GROUPE_HORS_LISTE, colonnes_parties, colonnes_questions
+
+# Seuil de signalement par défaut (en écarts-types) et nombre maximal de paires retournées
+SEUIL_ECARTS_TYPES = 6.0
+PAIRES_MAX = 200
+
+COLONNES_PAIRES = ['Code 1', 'Code 2', 'Questions identiques', 'Similarité', 'Écarts-types', 'Note 1', 'Note 2']
+
+# Nombre de copies traitées par bloc de lignes (mémoire : TAILLE_BLOC × nombre de copies)
+TAILLE_BLOC = 512
+
+
+def groupes_des_copies(df_notes: pd.DataFrame, liste: pd.DataFrame, col_groupe: str) -> pd.Series:
+    """Groupe de chaque copie d'après la liste étudiants (« Hors liste » pour un code inconnu)."""
+    codes_liste, codes_notes = aligner_codes(liste['Code'], df_notes['A:Code'])
+    groupes = pd.Series(liste[col_groupe].to_numpy(), index=codes_liste.to_numpy())
+    groupes = groupes[~groupes.index.duplicated()]
+    return pd.Series(codes_notes.map(groupes).to_numpy(), index=df_notes.index).astype(object).fillna(
+        GROUPE_HORS_LISTE
+    )
+
+
+def _encoder(scores: np.ndarray) -> tuple:
+    """
+    Matrice indicatrice (copie × (question, score)) et poids de rareté de
+    chaque colonne. Les scores manquants ne concordent avec rien.
+    """
+    indicatrices, poids = [], []
+    for valeurs in scores.T:
+        presents = ~np.isnan(valeurs)
+        modalites, inverse = np.unique(valeurs[presents], return_inverse=True)
+        if len(modalites) == 0:
+            continue
+        indicatrice = np.zeros((len(valeurs), len(modalites)), dtype=np.float32)
+        indicatrice[np.flatnonzero(presents), inverse] = 1.0
+        frequences = indicatrice.sum(axis=0) / presents.sum()
+        indicatrices.append(indicatrice)
+        poids.append(-np.log(frequences))
+    return np.hstack(indicatrices), np.concatenate(poids).astype(np.float32)
+
+
+def _blocs(ponderee: np.ndarray, codes_groupes, taille_bloc: int):
+    """Pour chaque bloc de lignes : (indices des lignes, similarités, masque des paires i < j comparables)."""
+    n = len(ponderee)
+    colonnes = np.arange(n)
+    for debut in range(0, n, taille_bloc):
+        lignes = np.arange(debut, min(debut + taille_bloc, n))
+        similarites = ponderee[lignes] @ ponderee.T
+        masque = colonnes[None, :] > lignes[:, None]
+        if codes_groupes is not None:
+            masque &= codes_groupes[lignes][:, None] == codes_groupes[None, :]
+        yield lignes, similarites, masque
+
+
+def paires_similaires(df_notes: pd.DataFrame, groupes: pd.Series = None, seuil: float = SEUIL_ECARTS_TYPES,
+                      paires_max: int = PAIRES_MAX, taille_bloc: int = TAILLE_BLOC) -> tuple:
+    """
+    Signale les paires de copies dont la similarité pondérée des réponses
+    dépasse la moyenne des paires comparées de `seuil` écarts-types. Avec
+    `groupes` (un groupe par copie, aligné sur df_notes), seules les copies
+    d'un même groupe sont comparées.
+
+    Deux parcours par blocs : le premier établit moyenne et écart-type des
+    similarités, le second extrait les paires au-delà du seuil.
+
+    Retourne (paires, nb_paires_comparees) : paires triées de la plus
+    suspecte à la moins suspecte, au plus `paires_max`.
+    Lève ValueError si l'export ne contient pas de scores par question,
+    notamment pour un export fusionné (notes par partie seulement).
+    """
+    if colonnes_parties(df_notes):
+        raise ValueError("Export fusionné : pas de scores par question, seulement des notes par partie.")
+    questions = colonnes_questions(df_notes)
+    if len(questions) < 2:
+        raise ValueError("L'export AMC ne contient pas de scores par question.")
+
+    indicatrice, poids = _encoder(df_notes[questions].to_numpy(dtype=float))
+    ponderee = indicatrice * np.sqrt(poids)  # produit scalaire = somme des poids des concordances
+    codes_groupes = None if groupes is None else pd.factorize(groupes.to_numpy())[0]
+
+    nombre, somme, somme_carres = 0, 0.0, 0.0
+    for _, similarites, masque in _blocs(ponderee, codes_groupes, taille_bloc):
+        valeurs = similarites[masque].astype(np.float64)
+        nombre += len(valeurs)
+        somme += valeurs.sum()
+        somme_carres += np.square(valeurs).sum()
+    if nombre < 2:
+        return pd.DataFrame(columns=COLONNES_PAIRES), nombre
+    moyenne = somme / nombre
+    ecart_type = np.sqrt(max(somme_carres / nombre - moyenne ** 2, 0.0)) or 1.0
+
+    premieres, secondes, retenues = [], [], []
+    for lignes, similarites, masque in _blocs(ponderee, codes_groupes, taille_bloc):
+        i, j = np.nonzero(masque & (similarites >= moyenne + seuil * ecart_type))
+        premieres.append(lignes[i])
+        secondes.append(j)
+        retenues.append(similarites[i, j])
+    premieres, secondes = np.concatenate(premieres), np.concatenate(secondes)
+    retenues = np.concatenate(retenues).astype(np.float64)
+
+    ordre = np.argsort(-retenues, kind='stable')[:paires_max]
+    premieres, secondes, retenues = premieres[ordre], secondes[ordre], retenues[ordre]
+    identiques = (indicatrice[premieres] * indicatrice[secondes]).sum(axis=1).astype(int)
+    codes = df_notes['A:Code'].to_numpy()
+    notes = df_notes['Note'].to_numpy()
+    paires = pd.DataFrame({
+        'Code 1': codes[premieres],
+        'Code 2': codes[secondes],
+        'Questions identiques': [f"{k} / {len(questions)}" for k in identiques],
+        'Similarité': retenues.round(2),
+        'Écarts-types': ((retenues - moyenne) / ecart_type).round(1),
+        'Note 1': notes[premieres],
+        'Note 2': notes[secondes],
+    }, columns=COLONNES_PAIRES)
+    if groupes is not None:
+        paires.insert(2, 'Groupe', groupes.to_numpy()[premieres])
+    return paires, nombre
@@ -0,0 +1,168 @@
+"""
+Lecture des notes AMC et calculs statistiques.
+
+Les erreurs sont signalées par ValueError.
+"""
+import numpy as np
+import pandas as pd
+
+from codes import aligner_codes, canoniser_codes
+from commun import compacter, detect_delimiter
+import metriques
+from fichiers import FichierDepose
+
+# Groupe attribué aux notes dont le code est absent de la liste étudiants
+GROUPE_HORS_LISTE = 'Hors liste'
+
+# Colonnes de l'export AMC qui ne sont pas des scores par question
+COLONNES_HORS_QUESTIONS = ('Exam', 'A:Code', 'Name', 'Note', 'Mark')
+
+# Préfixe des colonnes « Note <partie> » d'un export fusionné (fusion.fusionner_exports)
+PREFIXE_PARTIE = 'Note '
+
+# Intervalles de confiance bootstrap : nombre de rééchantillonnages, niveau et graine
+TIRAGES_BOOTSTRAP = 2000
+NIVEAU_CONFIANCE = 0.95
+GRAINE_BOOTSTRAP = 0
+
+
+def lire_notes_amc(csv_file: FichierDepose) -> tuple:
+    """
+    Lit le fichier CSV d'AMC et retourne un DataFrame propre des notes
+    (codes canonisés, notes en float) ainsi que les lignes anomalies (Code = NONE).
+    """
+    with metriques.chronometre('amc_duree_lecture_secondes', fichier='csv'):
+        delimiter = detect_delimiter(csv_file.echantillon())
+        # A:Code lu en texte : les zéros initiaux restent soumis à la politique de canoniser_codes
+        df = pd.read_csv(csv_file.flux(), delimiter=delimiter, encoding='utf-8', dtype={'A:Code': str})
+
+    if 'Mark' in df.columns:
+        df = df.rename(columns={'Mark': 'Note'})
+
+    if 'A:Code' not in df.columns or 'Note' not in df.columns:
+        raise ValueError("Colonnes requises 'A:Code' et/ou 'Note' absentes du fichier CSV.")
+
+    anomalies = df[df['A:Code'] == 'NONE'].copy()
+    df_clean = df[df['A:Code'] != 'NONE'].copy()
+
+    df_clean['A:Code'] = canoniser_codes(df_clean['A:Code'])
+    df_clean['Note'] = (
+        df_clean['Note'].astype(str)
+        .str.replace(',', '.', regex=False)
+        .astype(float)
+    )
+
+    if df_clean.empty:
+        raise ValueError("Aucune donnée valide après nettoyage.")
+
+    return compacter(df_clean, exclure=('A:Code', 'Note')), anomalies
+
+
+def colonnes_parties(df_notes: pd.DataFrame) -> list:
+    """Colonnes « Note <partie> » d'un export fusionné ; liste vide pour un export AMC ordinaire."""
+    return [col for col in df_notes.columns if str(col).startswith(PREFIXE_PARTIE)]
+
+
+def colonnes_questions(df_notes: pd.DataFrame) -> list:
+    """
+    Colonnes numériques de l'export AMC correspondant aux scores par question.
+    Un export fusionné n'a que des notes par partie : aucune colonne n'est
+    alors retenue.
+    """
+    if colonnes_parties(df_notes):
+        return []
+    return [
+        col for col in df_notes.columns
+        if col not in COLONNES_HORS_QUESTIONS and not str(col).startswith('A:')
+        and pd.api.types.is_numeric_dtype(df_notes[col])
+    ]
+
+
+def intervalles_bootstrap(notes, tirages: int = TIRAGES_BOOTSTRAP, niveau: float = NIVEAU_CONFIANCE,
+                          graine: int = GRAINE_BOOTSTRAP) -> pd.DataFrame:
+    """
+    Intervalles de confiance (percentiles bootstrap) du taux de réussite (en %),
+    de la moyenne et de la médiane des notes.
+
+    Rééchantillonner n notes avec remise revient à tirer les effectifs de
+    chaque valeur distincte selon une loi multinomiale : tous les
+    rééchantillonnages sont tirés en une seule opération, sous forme d'une
+    matrice (tirages × valeurs distinctes), d'où se déduisent moyennes, taux
+    et médianes (par effectifs cumulés) sans boucle. Les notes sont arrondies
+    au centième. Avec la même graine, le résultat est reproductible.
+
+    Retourne un DataFrame indexé par indicateur (colonnes Bas, Haut), vide
+    s'il n'y a aucune note.
+    """
+    valeurs = pd.to_numeric(pd.Series(notes), errors='coerce').dropna().round(2).to_numpy(dtype=float)
+    n = len(valeurs)
+    if n == 0:
+        return pd.DataFrame(columns=['Bas', 'Haut'], dtype=float)
+
+    classes, effectifs = np.unique(valeurs, return_counts=True)
+    tirages_effectifs = np.random.default_rng(graine).multinomial(n, effectifs / n, size=tirages)
+
+    moyennes = tirages_effectifs @ classes / n
+    taux = tirages_effectifs[:, classes >= 10].sum(axis=1) / n * 100
+    # Médiane : valeurs de rangs (n - 1) // 2 et n // 2 dans chaque rééchantillon trié
+    cumuls = tirages_effectifs.cumsum(axis=1)
+    rang_bas = (cumuls <= (n - 1) // 2).sum(axis=1)
+    rang_haut = (cumuls <= n // 2).sum(axis=1)
+    medianes = (classes[rang_bas] + classes[rang_haut]) / 2
+
+    alpha = (1 - niveau) / 2
+    bornes = np.quantile(np.stack([taux, moyennes, medianes], axis=1), [alpha, 1 - alpha], axis=0)
+    return pd.DataFrame(bornes.T, index=['Taux de réussite', 'Moyenne', 'Médiane'], columns=['Bas', 'Haut'])
+
+
+def statistiques_par_groupe(df_notes: pd.DataFrame, liste: pd.DataFrame, col_groupe: str) -> tuple:
+    """
+    Joint les notes à la liste étudiants (code canonique) puis calcule, par
+    agrégations groupées, les indicateurs de chaque groupe et leurs
+    histogrammes (classes d'un point). Les notes dont le code est absent de la
+    liste sont rassemblées dans le groupe « Hors liste ».
+
+    Retourne (resume, histogrammes) : resume indexé par groupe (Présents,
+    Validés, Taux de réussite, Moyenne, Médiane, puis leurs intervalles de
+    confiance bootstrap en texte « bas – haut »), histogrammes au format long
+    (groupe, Note, Effectif).
+    """
+    codes_liste, codes_notes = aligner_codes(liste['Code'], df_notes['A:Code'])
+    groupes = pd.DataFrame({'Code': codes_liste, col_groupe: liste[col_groupe]}).drop_duplicates('Code')
+    table = pd.DataFrame({'Code': codes_notes, 'Note': df_notes['Note'].to_numpy()}).merge(
+        groupes, on='Code', how='left'
+    )
+    groupe = table[col_groupe].astype('category')
+    if groupe.isna().any():
+        groupe = groupe.cat.add_categories([GROUPE_HORS_LISTE]).fillna(GROUPE_HORS_LISTE)
+    table[col_groupe] = groupe
+    table['Validé'] = table['Note'] >= 10
+    table['Classe'] = np.floor(table['Note'].clip(0, 20))
+
+    resume = table.groupby(col_groupe, observed=True).agg(
+        **{
+            'Présents': ('Note', 'size'),
+            'Validés': ('Validé', 'sum'),
+            'Moyenne': ('Note', 'mean'),
+            'Médiane': ('Note', 'median'),
+        }
+    )
+    resume.insert(2, 'Taux de réussite', (resume['Validés'] / resume['Présents'] * 100).round(2))
+    resume[['Moyenne', 'Médiane']] = resume[['Moyenne', 'Médiane']].round(2)
+
+    # Intervalles de confiance : un bootstrap vectorisé par groupe
+    intervalles = {
+        groupe: intervalles_bootstrap(notes)
+        for groupe, notes in table.groupby(col_groupe, observed=True)['Note']
+    }
+    for indicateur in ('Taux de réussite', 'Moyenne', 'Médiane'):
+        resume[f'IC {indicateur.lower()}'] = [
+            f"{intervalles[g].at[indicateur, 'Bas']:.2f} – {intervalles[g].at[indicateur, 'Haut']:.2f}"
+            for g in resume.index
+        ]
+
+    histogrammes = (
+        table.groupby([col_groupe, 'Classe'], observed=True).size()
+        .rename('Effectif').reset_index().rename(columns={'Classe': 'Note'})
+    )
+    return resume, histogrammes
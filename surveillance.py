@@ -0,0 +1,198 @@
+"""
+Surveillance d'un dossier d'exports AMC et transfert automatique des notes.
+
+Lancement :
+    python surveillance.py DOSSIER --sortie DOSSIER_SORTIE [--classeur admin.xlsx]
+                           [--bonus 0] [--intervalle 2] [--delai 2]
+
+Chaque export CSV d'AMC déposé (ou réécrit) dans DOSSIER est reporté dans le
+classeur administratif — celui indiqué par --classeur, ou à défaut l'unique
+.xlsx du dossier. Le classeur rempli et le rapport de rapprochement sont écrits
+dans DOSSIER_SORTIE sous le nom de l'export (<export>.xlsx, <export>_rapport.csv).
+
+Un fichier n'est traité qu'une fois stable (ni taille ni date modifiées depuis
+`delai` secondes), ce qui absorbe les écritures successives d'AMC. Le transfert
+n'est relancé que si l'empreinte de l'export, du classeur ou le bonus ont
+changé : l'état est conservé dans DOSSIER_SORTIE/.surveillance.json et survit
+aux redémarrages.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+from fichiers import FichierDepose
+from transfert import transferer_notes
+
+FICHIER_ETAT = '.surveillance.json'
+
+journal = logging.getLogger('amc.surveillance')
+
+
+def _signature(chemin: str) -> tuple:
+    etat = os.stat(chemin)
+    return etat.st_mtime_ns, etat.st_size
+
+
+def _ecrire(chemin: str, contenu: bytes):
+    """Écriture atomique : le fichier de sortie n'est jamais lu à moitié écrit."""
+    provisoire = chemin + '.tmp'
+    with open(provisoire, 'wb') as f:
+        f.write(contenu)
+    os.replace(provisoire, chemin)
+
+
+class Surveillance:
+    """
+    Parcours périodique d'un dossier d'exports AMC. `parcourir()` effectue un
+    passage et retourne les exports transférés ; `executer()` boucle.
+    """
+
+    def __init__(self, dossier: str, sortie: str, classeur: str = None, bonus: float = 0.0, delai: float = 2.0):
+        self.dossier = os.path.abspath(dossier)
+        self.sortie = os.path.abspath(sortie)
+        self.classeur = os.path.abspath(classeur) if classeur else None
+        self.bonus = bonus
+        self.delai = delai
+        if self.sortie == self.dossier:
+            raise ValueError("Le dossier de sortie doit être distinct du dossier surveillé.")
+        os.makedirs(self.sortie, exist_ok=True)
+
+        # chemin -> (signature, instant depuis lequel elle n'a pas changé)
+        self._stabilite = {}
+        # chemin -> (signature, empreinte) : évite de relire un fichier inchangé
+        self._empreintes = {}
+        self._chemin_etat = os.path.join(self.sortie, FICHIER_ETAT)
+        self.etat = self._charger_etat()
+
+    def _charger_etat(self) -> dict:
+        try:
+            with open(self._chemin_etat, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _enregistrer_etat(self):
+        _ecrire(self._chemin_etat, json.dumps(self.etat, indent=2).encode('utf-8'))
+
+    def _stable(self, chemin: str, maintenant: float) -> bool:
+        """Vrai si le fichier n'a pas changé depuis au moins `delai` secondes."""
+        signature = _signature(chemin)
+        precedente, depuis = self._stabilite.get(chemin, (None, maintenant))
+        if signature != precedente:
+            self._stabilite[chemin] = (signature, maintenant)
+            return self.delai <= 0
+        return maintenant - depuis >= self.delai
+
+    def _empreinte(self, chemin: str) -> str:
+        signature = _signature(chemin)
+        connue = self._empreintes.get(chemin)
+        if connue and connue[0] == signature:
+            return connue[1]
+        # Même condensé que FichierDepose.empreinte, calculé par blocs sans charger le fichier
+        with open(chemin, 'rb') as f:
+            empreinte = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+        self._empreintes[chemin] = (signature, empreinte)
+        return empreinte
+
+    def _trouver_classeur(self):
+        if self.classeur:
+            return self.classeur if os.path.isfile(self.classeur) else None
+        classeurs = [
+            os.path.join(self.dossier, nom) for nom in os.listdir(self.dossier)
+            if nom.lower().endswith('.xlsx') and not nom.startswith('~$')
+        ]
+        if len(classeurs) > 1:
+            journal.warning("Plusieurs classeurs dans %s : précisez --classeur.", self.dossier)
+            return None
+        return classeurs[0] if classeurs else None
+
+    def _exports(self) -> list:
+        return sorted(
+            os.path.join(self.dossier, nom) for nom in os.listdir(self.dossier)
+            if nom.lower().endswith('.csv') and os.path.isfile(os.path.join(self.dossier, nom))
+        )
+
+    def transferer(self, csv_chemin: str, xls_chemin: str) -> dict:
+        """Transfère un export dans le classeur et écrit le résultat dans le dossier de sortie."""
+        with open(xls_chemin, 'rb') as f:
+            xls = FichierDepose(f, nom=os.path.basename(xls_chemin))
+        with open(csv_chemin, 'rb') as f:
+            csv = FichierDepose(f, nom=os.path.basename(csv_chemin))
+        try:
+            output, nb_anomalies, nb_transferts, nb_dispo, rapprochement = transferer_notes(xls, csv, self.bonus)
+        finally:
+            xls.fermer()
+            csv.fermer()
+
+        base = os.path.join(self.sortie, os.path.splitext(os.path.basename(csv_chemin))[0])
+        _ecrire(base + '.xlsx', output.getvalue())
+        _ecrire(base + '_rapport.csv', rapprochement.rapport_csv())
+        return {'transferees': nb_transferts, 'disponibles': nb_dispo, 'mal_identifies': nb_anomalies}
+
+    def parcourir(self, maintenant: float = None) -> list:
+        """Un passage sur le dossier ; retourne les noms des exports transférés."""
+        maintenant = time.monotonic() if maintenant is None else maintenant
+        xls_chemin = self._trouver_classeur()
+        if xls_chemin is None or not self._stable(xls_chemin, maintenant):
+            return []
+        xls_empreinte = self._empreinte(xls_chemin)
+
+        transferes = []
+        for csv_chemin in self._exports():
+            try:
+                if not self._stable(csv_chemin, maintenant):
+                    continue
+                nom = os.path.basename(csv_chemin)
+                cle = {'excel': xls_empreinte, 'csv': self._empreinte(csv_chemin), 'bonus': self.bonus}
+                if self.etat.get(nom, {}).get('cle') == cle:
+                    continue
+
+                try:
+                    compteurs = self.transferer(csv_chemin, xls_chemin)
+                    journal.info("%s : %d note(s) transférée(s) sur %d.", nom,
+                                 compteurs['transferees'], compteurs['disponibles'])
+                    transferes.append(nom)
+                except Exception as e:  # fichier invalide : la surveillance continue
+                    # Mémorisé comme traité : réessayé seulement si le contenu change
+                    compteurs = {'erreur': str(e)}
+                    journal.error("%s : %s", nom, e)
+                self.etat[nom] = {'cle': cle, **compteurs}
+                self._enregistrer_etat()
+            except FileNotFoundError:
+                # Fichier supprimé ou renommé pendant le passage
+                self._stabilite.pop(csv_chemin, None)
+        return transferes
+
+    def executer(self, intervalle: float = 2.0):
+        journal.info("Surveillance de %s → %s", self.dossier, self.sortie)
+        while True:
+            try:
+                self.parcourir()
+            except OSError as e:
+                journal.error("Erreur de lecture du dossier : %s", e)
+            time.sleep(intervalle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transfert automatique des exports AMC déposés dans un dossier.")
+    parser.add_argument('dossier', help="dossier où AMC écrit ses exports CSV")
+    parser.add_argument('--sortie', required=True, help="dossier des classeurs remplis et des rapports")
+    parser.add_argument('--classeur', help="classeur administratif (défaut : l'unique .xlsx du dossier)")
+    parser.add_argument('--bonus', type=float, default=0.0, help="points ajoutés à chaque note (plafonnée à 20)")
+    parser.add_argument('--intervalle', type=float, default=2.0, help="secondes entre deux passages")
+    parser.add_argument('--delai', type=float, default=2.0, help="secondes de stabilité avant traitement")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s', datefmt='%H:%M:%S')
+    surveillance = Surveillance(args.dossier, args.sortie, args.classeur, args.bonus, args.delai)
+    try:
+        surveillance.executer(args.intervalle)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
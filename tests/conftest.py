@@ -0,0 +1,20 @@
+"""
+Configuration des tests : modules de l'application importables depuis tests/,
+bases SQLite locales (gabarits, historique, cours) dans un répertoire temporaire.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def bases_temporaires(tmp_path, monkeypatch):
+    import cours
+    import gabarits
+    import historique
+    monkeypatch.setattr(gabarits, 'CHEMIN_GABARITS', str(tmp_path / 'gabarits.sqlite3'))
+    monkeypatch.setattr(historique, 'CHEMIN_HISTORIQUE', str(tmp_path / 'historique.sqlite3'))
+    monkeypatch.setattr(cours, 'CHEMIN_COURS', str(tmp_path / 'cours.sqlite3'))
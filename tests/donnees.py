@@ -0,0 +1,35 @@
+"""
+Fichiers d'essai construits en mémoire : exports CSV d'AMC et classeurs administratifs.
+"""
+import io
+
+from openpyxl import Workbook
+
+from fichiers import FichierDepose
+
+
+def csv_amc(texte: str, nom: str = 'notes.csv') -> FichierDepose:
+    return FichierDepose(texte.encode('utf-8'), nom=nom)
+
+
+def octets_classeur(codes: list, notes: dict = None, entete=("Code", "Nom", "Prénom", "Note"),
+                    autres: dict = None) -> bytes:
+    """
+    Classeur administratif : deux lignes de titre, l'en-tête (ligne 3), puis
+    une ligne par code. `notes` et `autres` associent à la position d'un code
+    sa note et ses valeurs des colonnes suivantes.
+    """
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Université"])
+    ws.append([])
+    ws.append(list(entete))
+    for i, code in enumerate(codes):
+        ws.append([code, f"NOM{i}", f"Prenom{i}", (notes or {}).get(i), *(autres or {}).get(i, ())])
+    flux = io.BytesIO()
+    wb.save(flux)
+    return flux.getvalue()
+
+
+def classeur(codes: list, notes: dict = None, **options) -> FichierDepose:
+    return FichierDepose(octets_classeur(codes, notes, **options), nom='admin.xlsx')
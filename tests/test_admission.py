@@ -0,0 +1,56 @@
+"""
+Contrôle d'admission des classeurs : refus avant analyse et durée maximale de traitement.
+"""
+import io
+import zipfile
+
+import pytest
+
+import admission
+from admission import ClasseurRefuse, echeance, inspecter_classeur, parcourir
+from donnees import octets_classeur
+from liste import lire_fichier_admin
+
+
+def refus(contenu: bytes) -> str:
+    with pytest.raises(ClasseurRefuse) as erreur:
+        inspecter_classeur(io.BytesIO(contenu))
+    return erreur.value.motif
+
+
+def test_classeur_admis():
+    flux = io.BytesIO(octets_classeur([1001, 1002]))
+    inspection = inspecter_classeur(flux)
+    assert flux.tell() == 0
+    assert not inspection.lourd
+    assert list(inspection.feuilles.values()) == [(5, 4)]
+
+
+def test_fichier_non_zip_refuse():
+    assert refus(b'Code;Nom\n1001;A\n') == 'archive'
+    with pytest.raises(ClasseurRefuse):
+        lire_fichier_admin(io.BytesIO(b'\xd0\xcf\x11\xe0 ancien format .xls'))
+
+
+def test_bombe_de_decompression_refusee():
+    flux = io.BytesIO()
+    with zipfile.ZipFile(flux, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('xl/worksheets/sheet1.xml', b'\0' * (4 * admission.MO))
+    assert refus(flux.getvalue()) == 'compression'
+
+
+def test_dimensions_refusees(monkeypatch):
+    monkeypatch.setattr(admission, 'LIGNES_MAX', 3)
+    assert refus(octets_classeur([1001, 1002])) == 'dimensions'
+
+
+def test_duree_maximale_verifiee_pendant_la_lecture():
+    with pytest.raises(ValueError, match='Durée maximale'):
+        echeance(-1)()
+
+    appels = []
+    lignes = list(parcourir(range(2500), lambda: appels.append(1)))
+    assert len(lignes) == 2500 and len(appels) == 3
+
+    with pytest.raises(ValueError, match='Durée maximale'):
+        list(parcourir(range(10), echeance(-1)))
@@ -0,0 +1,167 @@
+"""
+Appariement des codes étudiants : canonisation des codes, rapprochement
+CSV / classeur, aperçu, transfert et classement.
+"""
+import pandas as pd
+from openpyxl import load_workbook
+
+from codes import TYPE_TEXTE, aligner_codes, canoniser_codes
+from donnees import classeur, csv_amc
+from transfert import apercu_modifications, classer_notes, lire_notes_csv, rapprocher, transferer_notes
+
+
+# =============================================================================
+# CODES CANONIQUES
+# =============================================================================
+
+def test_codes_numeriques_en_int64():
+    codes = canoniser_codes(['123', ' 456 ', '789.0', 1011, 1213.0])
+    assert codes.dtype == 'int64'
+    assert codes.tolist() == [123, 456, 789, 1011, 1213]
+
+
+def test_codes_manquants_en_Int64():
+    codes = canoniser_codes(['123', None, '  '])
+    assert codes.dtype == 'Int64'
+    assert codes.isna().tolist() == [False, True, True]
+
+
+def test_serie_entiere_conservee():
+    assert canoniser_codes(pd.Series([1, 2])).dtype == 'int64'
+    assert canoniser_codes(pd.Series([1, None], dtype='Int64')).dtype == 'Int64'
+
+
+def test_zeros_initiaux_conserves():
+    codes = canoniser_codes(['0123', '123'])
+    assert codes.dtype == TYPE_TEXTE
+    assert codes.tolist() == ['0123', '123']
+
+
+def test_zeros_initiaux_ignores():
+    codes = canoniser_codes(['0123', '123', '000'], zeros='ignorer')
+    assert codes.dtype == 'int64'
+    assert codes.tolist() == [123, 123, 0]
+
+
+def test_codes_alphanumeriques_en_texte():
+    codes = canoniser_codes(['A12', 123])
+    assert codes.dtype == TYPE_TEXTE
+    assert codes.tolist() == ['A12', '123']
+
+
+def test_alignement_entier_texte():
+    entiers, textes = aligner_codes(canoniser_codes([123, 456]), canoniser_codes(['A1', '123']))
+    assert entiers.dtype == textes.dtype == TYPE_TEXTE
+    assert entiers.tolist() == ['123', '456']
+
+    entiers, autres = aligner_codes(canoniser_codes([123]), canoniser_codes(['456']))
+    assert entiers.dtype == autres.dtype == 'int64'
+
+    textes, entiers = aligner_codes(canoniser_codes(['0123', '0A1', '000']), canoniser_codes([123]))
+    assert textes.tolist() == ['123', '0A1', '0']
+
+
+# =============================================================================
+# LECTURE DU CSV ET RAPPROCHEMENT
+# =============================================================================
+
+CSV_NOTES = (
+    "Exam,A:Code,Name,Mark\n"
+    "1,1001,a,12.5\n"
+    "2,1002,b,ABS\n"
+    "3,NONE,c,7\n"
+    "4,1003,d,9\n"
+    "5,9999,e,15\n"
+    "6,1003,dd,\"10,5\"\n"
+    "7,1004,f,\n"
+)
+
+
+def test_lecture_du_csv():
+    notes, nb_anomalies = lire_notes_csv(csv_amc(CSV_NOTES), add_notes=1.0)
+    assert nb_anomalies == 1
+    assert notes['Code'].dtype == 'int64'
+    assert notes['Code'].tolist() == [1001, 1002, 1003, 9999, 1003]  # note vide ignorée, doublons conservés
+    assert notes['Note'].tolist() == [13.5, 'ABS', 10.0, 16.0, 11.5]  # bonus sur les seules notes numériques
+    assert notes['Ligne CSV'].tolist() == [2, 3, 5, 6, 7]
+
+
+def test_rapprochement():
+    notes, _ = lire_notes_csv(csv_amc(CSV_NOTES))
+    codes_excel = canoniser_codes([1001, 1002, '1003', 1004.0, None, 1005, 1002])
+    rapprochement = rapprocher(codes_excel, notes, premiere_ligne=4)
+
+    reportees = rapprochement.reportees.set_index('Ligne Excel')
+    assert reportees['Note'].to_dict() == {4: 12.5, 5: 'ABS', 6: 10.5, 10: 'ABS'}  # 1003 : la dernière note
+    assert reportees.loc[6, 'Ligne CSV'] == 7
+    assert rapprochement.absents_classeur['Code'].tolist() == [9999]
+    assert rapprochement.sans_note['Code'].tolist() == [1004, 1005]
+    assert rapprochement.doublons_csv['Code'].tolist() == [1003, 1003]
+    assert rapprochement.doublons_classeur['Ligne Excel'].tolist() == [5, 10]
+
+
+def test_rapprochement_codes_textuels_et_numeriques():
+    notes, _ = lire_notes_csv(csv_amc("A:Code,Mark\n123,11\n456,12\n"))
+    rapprochement = rapprocher(canoniser_codes(['X7', '123', ' 456 ']), notes)
+    assert rapprochement.reportees['Note'].tolist() == [11.0, 12.0]
+    assert rapprochement.sans_note['Code'].tolist() == ['X7']
+
+
+def test_rapprochement_zeros_initiaux():
+    # Codes numériques dans le classeur : les zéros du CSV, perdus par Excel, sont ignorés
+    notes, _ = lire_notes_csv(csv_amc("A:Code,Mark\n0123,11\n01234567,12\n"))
+    rapprochement = rapprocher(canoniser_codes([123, 1234567]), notes)
+    assert rapprochement.reportees['Note'].tolist() == [11.0, 12.0]
+    assert rapprochement.absents_classeur.empty
+
+    # Codes textuels des deux côtés : 0123 et 123 restent distincts
+    rapprochement = rapprocher(canoniser_codes(['123', '0123']), notes)
+    assert rapprochement.reportees['Ligne Excel'].tolist() == [2]
+
+
+def test_transfert():
+    xls = classeur([1001, 1002, '1003', 1004.0, None, 1005, 1002], notes={0: 5})
+    sortie, nb_anomalies, nb_transferts, nb_notes, _ = transferer_notes(xls, csv_amc(CSV_NOTES), 1.0)
+    assert (nb_anomalies, nb_transferts, nb_notes) == (1, 4, 4)  # codes distincts du CSV
+
+    ws = load_workbook(sortie).active
+    colonne_note = [ws.cell(row=ligne, column=4).value for ligne in range(4, 11)]
+    assert colonne_note == [13.5, 'ABS', 11.5, None, None, None, 'ABS']
+
+
+def test_apercu_des_modifications():
+    xls = classeur([1001, 1002, '1003', 1004.0, None, 1005, 1002], notes={0: 13.5, 1: 7})
+    apercu = apercu_modifications(xls, csv_amc(CSV_NOTES), 1.0)
+    assert apercu['Ligne Excel'].tolist() == [5, 6, 10]  # ligne 4 : note déjà identique
+    assert apercu['Ancienne note'].tolist() == ['7', '', '']
+    assert apercu['Nouvelle note'].tolist() == ['ABS', '11.5', 'ABS']
+    assert apercu['Écrasée'].tolist() == [True, False, False]
+
+    assert apercu_modifications(classeur([]), csv_amc(CSV_NOTES)).empty
+
+
+# =============================================================================
+# CLASSEMENT
+# =============================================================================
+
+def test_classement_des_notes():
+    indicateurs = classer_notes(pd.Series([12.0, 15.0, 'ABS', 12.0, 8.0]))
+    assert indicateurs['rang'].tolist()[:2] == [2, 1] and indicateurs['rang'].tolist()[3:] == [2, 4]
+    assert indicateurs['centile'].tolist()[:2] == [75.0, 100.0]
+    assert indicateurs.iloc[2].isna().all()  # ABS : pas d'indicateurs
+
+
+def test_classement_sans_doublons_du_classeur():
+    # Le code 1 figure deux fois dans le classeur : sa note ne compte qu'une fois
+    indicateurs = classer_notes(pd.Series([12.0, 15.0, 12.0, 8.0]), codes=pd.Series([1, 2, 1, 4]))
+    assert indicateurs['rang'].tolist() == [2, 1, 2, 3]
+    assert indicateurs['centile'].tolist() == [66.7, 100.0, 66.7, 33.3]
+
+
+def test_transfert_avec_classement():
+    xls = classeur([1001, 1002, 1003, 1001])
+    csv = csv_amc("A:Code,Mark\n1001,12\n1002,15\n1003,8\n")
+    sortie, *_ = transferer_notes(xls, csv, classement={'rang': 'Rang'})
+    ws = load_workbook(sortie).active
+    assert ws.cell(row=3, column=5).value == 'Rang'
+    assert [ws.cell(row=ligne, column=5).value for ligne in range(4, 8)] == [2, 1, 3, 2]
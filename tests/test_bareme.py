@@ -0,0 +1,46 @@
+"""
+Barème par question : barème initial, neutralisation et coefficients.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from bareme import bareme_questions, ecart_reproduction, recalculer_notes
+from donnees import csv_amc
+from statistiques import lire_notes_amc
+
+EXPORT_QUESTIONS = "A:Code,Mark,Q1,Q2,Q3\n1,20,2,1,1\n2,10,1,0,1\n3,5,1,0,0\n4,0,0,0,0\n"
+
+
+def notes_questions() -> pd.DataFrame:
+    df_notes, _ = lire_notes_amc(csv_amc(EXPORT_QUESTIONS))
+    return df_notes
+
+
+def test_bareme_initial():
+    bareme = bareme_questions(notes_questions())
+    assert bareme['Question'].tolist() == ['Q1', 'Q2', 'Q3']
+    assert bareme['Points max'].tolist() == [2.0, 1.0, 1.0]
+    assert ecart_reproduction(notes_questions(), bareme) == 0.0
+
+
+def test_neutralisation():
+    df_notes = notes_questions()
+    bareme = bareme_questions(df_notes).assign(**{'Neutralisée': [False, True, False]})
+    retiree = recalculer_notes(df_notes, bareme, 'retirer')
+    accordee = recalculer_notes(df_notes, bareme, 'accorder')
+    np.testing.assert_allclose(retiree, [20.0, 13.33, 6.67, 0.0])
+    np.testing.assert_allclose(accordee, [20.0, 15.0, 10.0, 5.0])
+
+
+def test_coefficients():
+    df_notes = notes_questions()
+    bareme = bareme_questions(df_notes).assign(Coefficient=[1.0, 0.0, 2.0])
+    np.testing.assert_allclose(recalculer_notes(df_notes, bareme), [20.0, 15.0, 5.0, 0.0])
+
+
+def test_bareme_vide_refuse():
+    df_notes = notes_questions()
+    bareme = bareme_questions(df_notes).assign(**{'Neutralisée': True})
+    with pytest.raises(ValueError):
+        recalculer_notes(df_notes, bareme)
@@ -0,0 +1,43 @@
+"""
+Fichiers déposés : vues sans copie, déversement sur disque et empreinte.
+"""
+import hashlib
+import io
+import os
+
+from fichiers import FichierDepose
+
+CONTENU = b"A:Code,Mark\n" + b"1234,12\n" * 100
+
+
+def test_octets_sous_le_seuil_en_memoire():
+    fichier = FichierDepose(CONTENU, nom='notes.csv')
+    assert not fichier.sur_disque
+    assert fichier.taille_memoire == len(CONTENU)
+    assert fichier.flux().read() == CONTENU
+
+
+def test_octets_au_dela_du_seuil_sur_disque():
+    fichier = FichierDepose(CONTENU, nom='notes.csv', seuil=100)
+    assert fichier.sur_disque and fichier.chemin.endswith('.csv')
+    assert fichier.taille_memoire == 0
+    assert fichier.flux().read() == CONTENU
+    chemin = fichier.chemin
+    fichier.fermer()
+    assert not os.path.exists(chemin)
+
+
+def test_flux_conserve_par_l_appelant_jamais_deverse():
+    source = io.BytesIO(CONTENU)
+    fichier = FichierDepose(source, seuil=100)
+    assert fichier.emprunte and not fichier.sur_disque
+    assert fichier.taille_memoire == 0
+    assert fichier.vue().obj is source.getvalue()  # vue sur le tampon de l'appelant, sans copie
+
+
+def test_empreinte_et_echantillon():
+    fichier = FichierDepose(CONTENU)
+    assert fichier.empreinte() == hashlib.blake2b(CONTENU, digest_size=16).hexdigest()
+    assert fichier.empreinte() == FichierDepose(CONTENU, seuil=100).empreinte()
+    echantillon = fichier.echantillon(30)
+    assert echantillon == b"A:Code,Mark\n1234,12\n1234,12\n"  # tronqué à la dernière ligne complète
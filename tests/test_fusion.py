@@ -0,0 +1,60 @@
+"""
+Fusion pondérée de plusieurs exports AMC : absences, poids et barèmes,
+rattrapage, codes textuels et export fusionné.
+"""
+import pytest
+
+from bareme import bareme_questions
+from donnees import csv_amc
+from fusion import PartieExamen, fusionner_en_fichier, fusionner_exports
+from statistiques import colonnes_questions, lire_notes_amc
+
+PARTIE_1 = "A:Code,Mark,Q1,Q2\n1,10,1,0\n2,12,1,1\n3,8,0,1\n"
+PARTIE_2 = "A:Code,Mark\n1,15\n2,5\n2,7.5\n"
+
+
+def parties(poids_2: float = 1.0, bareme_2: float = 20.0) -> list:
+    return [
+        PartieExamen(csv_amc(PARTIE_1, 'p1.csv')),
+        PartieExamen(csv_amc(PARTIE_2, 'p2.csv'), poids=poids_2, bareme=bareme_2),
+    ]
+
+
+@pytest.mark.parametrize('absence, attendues', [
+    ('zero', {1: 12.5, 2: 9.75, 3: 4.0}),
+    ('ignorer', {1: 12.5, 2: 9.75, 3: 8.0}),
+    ('exclure', {1: 12.5, 2: 9.75}),
+])
+def test_fusion_absences(absence, attendues):
+    table, nb_anomalies = fusionner_exports(parties(), absence)
+    assert dict(zip(table['A:Code'], table['Note'])) == attendues  # 2 : dernière note de p2 (7.5)
+    assert nb_anomalies == 0
+
+
+def test_fusion_poids_et_bareme():
+    table, _ = fusionner_exports(parties(poids_2=3.0, bareme_2=10.0))
+    assert dict(zip(table['A:Code'], table['Note'])) == {1: 25.0, 2: 14.25, 3: 2.0}  # (10 + 3 × 30) / 4
+
+
+@pytest.mark.parametrize('politique, attendues', [
+    ('remplacer', {1: 11.0, 2: 9.75, 3: 6.0}),
+    ('meilleure', {1: 12.5, 2: 9.75, 3: 6.0}),
+])
+def test_fusion_rattrapage(politique, attendues):
+    rattrapage = PartieExamen(csv_amc("A:Code,Mark\n1,11\n3,6\n", 'r.csv'), role='rattrapage')
+    table, _ = fusionner_exports(parties() + [rattrapage], 'zero', politique)
+    assert dict(zip(table['A:Code'], table['Note'])) == attendues
+
+
+def test_fusion_codes_textuels():
+    textuelle = PartieExamen(csv_amc("A:Code,Mark\n1,20\nX9,10\n", 'p3.csv'))
+    table, _ = fusionner_exports([parties()[0], textuelle])
+    assert dict(zip(table['A:Code'], table['Note'])) == {'1': 15.0, '2': 6.0, '3': 4.0, 'X9': 5.0}
+
+
+def test_export_fusionne_sans_questions():
+    _, fichier = fusionner_en_fichier(parties())
+    df_notes, _ = lire_notes_amc(fichier)
+    assert colonnes_questions(df_notes) == []
+    with pytest.raises(ValueError, match="fusionné"):
+        bareme_questions(df_notes)
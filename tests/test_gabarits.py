@@ -0,0 +1,54 @@
+"""
+Registre des gabarits : reconnaissance d'un modèle de classeur déjà rencontré
+et lecture ciblée de la liste administrative.
+"""
+import io
+import sqlite3
+
+import gabarits
+from donnees import octets_classeur
+from gabarits import resoudre_entete
+from liste import lire_fichier_admin
+
+FEUILLES = ['Feuille1']
+LIGNES = {0: ['Université'], 2: ['Code', 'Nom', 'Prénom']}
+
+
+def lire_ligne(ligne):
+    return LIGNES.get(ligne, [])
+
+
+def detecter():
+    return 2, {'code': 1}
+
+
+def jamais():
+    raise AssertionError("recherche complète inattendue pour un modèle connu")
+
+
+def test_modele_memorise():
+    assert resoudre_entete('liste', FEUILLES, lire_ligne, detecter) == (2, {'code': 1})
+    assert resoudre_entete('liste', FEUILLES, lire_ligne, jamais) == (2, {'code': 1})
+
+
+def test_entete_modifiee_redetectee():
+    resoudre_entete('liste', FEUILLES, lire_ligne, detecter)
+    autre = {0: ['Université'], 3: ['Code', 'Nom', 'Prénom', 'Groupe']}
+    assert resoudre_entete('liste', FEUILLES, lambda ligne: autre.get(ligne, []), lambda: (3, {})) == (3, {})
+
+
+def test_liste_d_un_modele_connu():
+    contenu = octets_classeur([1001, 1002], autres={0: ['G1']}, entete=("Code", "Nom", "Prénom", "Note", "Groupe"))
+    premiere = lire_fichier_admin(io.BytesIO(contenu))
+    seconde = lire_fichier_admin(io.BytesIO(contenu))
+    assert seconde.equals(premiere)
+    assert list(seconde.columns) == ['Code', 'Nom', 'Prénom', 'Note', 'Groupe']
+    assert seconde['Code'].tolist() == ['1001', '1002']
+    with sqlite3.connect(gabarits.CHEMIN_GABARITS) as connexion:
+        assert connexion.execute("SELECT ligne, utilisations FROM gabarits").fetchall() == [(2, 2)]
+
+
+def test_registre_inaccessible(monkeypatch):
+    monkeypatch.setattr(gabarits, 'CHEMIN_GABARITS', '/proc/nope/gabarits.sqlite3')
+    assert resoudre_entete('liste', FEUILLES, lire_ligne, detecter) == (2, {'code': 1})
+    assert lire_fichier_admin(io.BytesIO(octets_classeur([1001])))['Code'].tolist() == ['1001']
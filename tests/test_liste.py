@@ -0,0 +1,31 @@
+"""
+Listes AMC : comparaison d'une liste mise à jour avec la précédente.
+"""
+import pandas as pd
+
+from codes import canoniser_codes
+from liste import comparer_listes
+
+
+def liste(codes: list, noms: list) -> pd.DataFrame:
+    return pd.DataFrame({'Code': canoniser_codes(codes), 'Name': noms})
+
+
+def test_comparaison_des_listes():
+    ancienne = liste([1001, 1002, 1003], ['A', 'B', 'C'])
+    nouvelle = liste([1001, 1003, 1004, 1004], ['A', 'C bis', 'D', 'D doublon'])
+    changements = comparer_listes(ancienne, nouvelle).set_index('Code')
+    assert changements['Changement'].to_dict() == {1002: 'Retiré', 1003: 'Renommé', 1004: 'Ajouté'}
+    assert changements.loc[1003, 'Nouveau nom'] == 'C bis'
+    assert changements.loc[1004, 'Nouveau nom'] == 'D'  # première occurrence d'un code en double
+
+
+def test_comparaison_codes_textuels_et_entiers():
+    ancienne = liste([123, 456], ['A', 'B'])
+    nouvelle = liste(['0123', '456', 'X7'], ['A', 'B', 'C'])
+    changements = comparer_listes(ancienne, nouvelle)
+    assert changements[['Code', 'Changement']].values.tolist() == [['X7', 'Ajouté']]
+
+
+def test_listes_identiques():
+    assert comparer_listes(liste([1, 2], ['A', 'B']), liste([2, 1], ['B', 'A'])).empty
@@ -0,0 +1,59 @@
+"""
+Budget mémoire des caches partagés : mesure des entrées et éviction.
+"""
+import pandas as pd
+import pytest
+
+import memoire
+from fichiers import FichierDepose
+
+
+@pytest.fixture(autouse=True)
+def caches_vides(monkeypatch):
+    monkeypatch.setattr(memoire, '_caches', {})
+    monkeypatch.setattr(memoire, '_evictions', 0)
+
+
+def test_taille_objet():
+    table = pd.DataFrame({'Note': [1.0, 2.0]})
+    assert memoire.taille_objet(b'abcd') == 4
+    assert memoire.taille_objet((b'ab', table)) == 2 + table.memory_usage(deep=True).sum()
+    assert memoire.taille_objet(FichierDepose(b'x' * 10)) == 10
+    assert memoire.taille_objet(object()) == 0
+
+
+def test_cache_partage_unique_par_nom():
+    assert memoire.cache_partage('a', 4) is memoire.cache_partage('a', 8)
+    assert memoire.cache_partage('a', 4).taille_max == 4
+
+
+def test_etat_global():
+    memoire.cache_partage('a', 4)['x'] = b'1' * 100
+    memoire.cache_partage('b', 4)['y'] = b'2' * 50
+    etat = memoire.etat_global()
+    assert etat['caches'] == {'a': 100, 'b': 50}
+    assert etat['total'] == 150
+    assert memoire.inventaire()['Entrées'].tolist() == [1, 1]
+
+
+def test_budget_respecte(monkeypatch):
+    monkeypatch.setattr(memoire, 'BUDGET_GLOBAL', 250)
+    petit, gros = memoire.cache_partage('petit', 8), memoire.cache_partage('gros', 8)
+    petit['p'] = b'p' * 100
+    for cle in 'abc':
+        gros[cle] = b'g' * 100
+    gros.get('a')  # 'b' devient la moins récemment utilisée
+
+    assert memoire.appliquer_budgets() == 200
+    assert 'b' not in gros and 'c' not in gros and 'a' in gros
+    assert 'p' in petit  # le cache le plus volumineux est réduit d'abord
+    assert memoire.etat_global() == {'caches': {'petit': 100, 'gros': 100}, 'total': 200, 'evictions': 2}
+
+
+def test_entrees_vides_conservees(monkeypatch):
+    monkeypatch.setattr(memoire, 'BUDGET_GLOBAL', 0)
+    cache = memoire.cache_partage('a', 8)
+    cache['vide'] = object()
+    cache['plein'] = b'x' * 10
+    assert memoire.appliquer_budgets() == 10
+    assert 'vide' in cache and 'plein' not in cache
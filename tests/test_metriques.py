@@ -0,0 +1,46 @@
+"""
+Métriques d'exploitation : format texte Prometheus et comptage des dépôts.
+"""
+import pytest
+
+import metriques
+from fichiers import FichierDepose
+from service import lire_formulaire
+
+
+@pytest.fixture(autouse=True)
+def metriques_vides(monkeypatch):
+    monkeypatch.setattr(metriques, '_valeurs', {})
+    monkeypatch.setattr(metriques, '_durees', {})
+
+
+def valeur(nom: str, **etiquettes):
+    return metriques._valeurs.get(metriques._cle(nom, etiquettes), 0)
+
+
+def test_format_prometheus():
+    metriques.incrementer('amc_transferts_total', etat='termine')
+    metriques.observer('amc_duree_lecture_secondes', 0.5, fichier='csv')
+    texte = metriques.exposer()
+    assert '# TYPE amc_transferts_total counter' in texte
+    assert 'amc_transferts_total{etat="termine"} 1\n' in texte
+    assert 'amc_duree_lecture_secondes_count{fichier="csv"} 1\n' in texte
+    assert 'amc_duree_lecture_secondes_sum{fichier="csv"} 0.500000\n' in texte
+
+
+def test_fichiers_produits_non_comptes():
+    FichierDepose(b'A:Code,Mark\n1,10\n')
+    assert valeur('amc_fichiers_deposes_total') == 0
+    assert valeur('amc_octets_deposes_total') == 0
+
+
+def test_depots_du_service_comptes():
+    corps = (
+        b'--f\r\nContent-Disposition: form-data; name="csv"; filename="notes.csv"\r\n\r\n'
+        b'A:Code,Mark\n1,10\n\r\n'
+        b'--f\r\nContent-Disposition: form-data; name="bonus"\r\n\r\n1\r\n--f--\r\n'
+    )
+    champs = lire_formulaire('multipart/form-data; boundary=f', corps)
+    assert champs['bonus'] == '1'
+    assert valeur('amc_fichiers_deposes_total') == 1
+    assert valeur('amc_octets_deposes_total') == champs['csv'].taille == 17
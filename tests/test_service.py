@@ -0,0 +1,90 @@
+"""
+Service HTTP local : routes, codes d'erreur et mémorisation des réponses.
+"""
+import http.client
+import io
+import json
+import threading
+
+import pytest
+from openpyxl import load_workbook
+
+import memoire
+from donnees import octets_classeur
+from service import ServiceAMC
+
+CSV = b"A:Code,Mark\n1001,12\n1002,8\nNONE,5\n9999,15\n"
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(memoire, '_caches', {})
+    serveur = ServiceAMC(('127.0.0.1', 0), workers=2)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    yield serveur
+    serveur.shutdown()
+    serveur.server_close()
+
+
+def envoyer(serveur, chemin: str, fichiers: dict = None, champs: dict = None, methode: str = 'POST'):
+    parties = []
+    for nom, (nom_fichier, contenu) in (fichiers or {}).items():
+        parties.append(
+            f'--f\r\nContent-Disposition: form-data; name="{nom}"; filename="{nom_fichier}"\r\n\r\n'.encode()
+            + contenu + b'\r\n'
+        )
+    for nom, valeur in (champs or {}).items():
+        parties.append(f'--f\r\nContent-Disposition: form-data; name="{nom}"\r\n\r\n{valeur}\r\n'.encode())
+    corps = b''.join(parties) + b'--f--\r\n'
+    connexion = http.client.HTTPConnection('127.0.0.1', serveur.server_port, timeout=30)
+    connexion.request(methode, chemin, body=corps if methode == 'POST' else None,
+                      headers={'Content-Type': 'multipart/form-data; boundary=f'})
+    reponse = connexion.getresponse()
+    resultat = reponse.status, dict(reponse.getheaders()), reponse.read()
+    connexion.close()
+    return resultat
+
+
+def test_sante_et_route_inconnue(service):
+    assert envoyer(service, '/sante', methode='GET')[0] == 200
+    assert envoyer(service, '/inconnue')[0] == 404
+
+
+def test_statistiques(service):
+    statut, _, corps = envoyer(service, '/statistiques', {'csv': ('notes.csv', CSV)}, {'bonus': '1'})
+    resume = json.loads(corps)
+    assert statut == 200
+    assert (resume['presents'], resume['anomalies'], resume['bonus']) == (3, 1, 1.0)
+
+
+def test_transfert(service):
+    fichiers = {'excel': ('admin.xlsx', octets_classeur([1001, 1002, 1003])), 'csv': ('notes.csv', CSV)}
+    statut, entetes, corps = envoyer(service, '/transfert', fichiers)
+    assert statut == 200
+    assert entetes['X-AMC-Transferees'] == '2' and entetes['X-AMC-Absents-Classeur'] == '1'
+    ws = load_workbook(io.BytesIO(corps)).active
+    assert [ws.cell(row=ligne, column=4).value for ligne in (4, 5, 6)] == [12, 8, None]
+
+    statut, _, corps = envoyer(service, '/transfert', fichiers, {'sortie': 'json'})
+    assert json.loads(corps)['sans_note'] == 1
+
+
+def test_reponses_memorisees_dans_le_budget(service):
+    envoyer(service, '/statistiques', {'csv': ('notes.csv', CSV)})
+    envoyer(service, '/statistiques', {'csv': ('autre_nom.csv', CSV)})  # même contenu : même clé
+    assert len(service.reponses) == 1
+    assert memoire.etat_global()['caches']['service'] > 0
+
+
+def test_erreurs(service):
+    assert envoyer(service, '/statistiques')[0] == 400
+    assert envoyer(service, '/statistiques', {'csv': ('notes.csv', CSV)}, {'bonus': 'x'})[0] == 400
+    statut, _, corps = envoyer(service, '/transfert', {'csv': ('notes.csv', CSV)})
+    assert statut == 400 and 'excel' in json.loads(corps)['erreur']
+
+
+def test_classeur_refuse(service):
+    fichiers = {'excel': ('admin.xlsx', b'pas un classeur'), 'csv': ('notes.csv', CSV)}
+    statut, _, corps = envoyer(service, '/transfert', fichiers)
+    assert statut == 413 and '.xlsx' in json.loads(corps)['erreur']
+    assert envoyer(service, '/liste', {'excel': ('admin.xlsx', b'pas un classeur')})[0] == 413
@@ -0,0 +1,50 @@
+"""
+Repérage des copies aux réponses anormalement similaires.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from donnees import csv_amc
+from similarite import paires_similaires
+from statistiques import lire_notes_amc
+
+NB_COPIES, NB_QUESTIONS = 40, 30
+
+
+def export_avec_copie() -> pd.DataFrame:
+    """Réponses aléatoires ; la copie 1040 reproduit la copie 1007."""
+    scores = np.random.default_rng(1).integers(0, 3, size=(NB_COPIES, NB_QUESTIONS))
+    scores[-1] = scores[7]
+    entete = "A:Code,Mark," + ",".join(f"Q{q}" for q in range(1, NB_QUESTIONS + 1))
+    lignes = [f"{1001 + i},{ligne.sum() / 3:.2f}," + ",".join(map(str, ligne)) for i, ligne in enumerate(scores)]
+    df_notes, _ = lire_notes_amc(csv_amc("\n".join([entete, *lignes]) + "\n"))
+    return df_notes
+
+
+def test_copie_reperee():
+    paires, comparees = paires_similaires(export_avec_copie(), seuil=4.0)
+    assert comparees == NB_COPIES * (NB_COPIES - 1) // 2
+    assert paires[['Code 1', 'Code 2']].values.tolist() == [[1008, 1040]]
+    assert paires.loc[0, 'Questions identiques'] == f"{NB_QUESTIONS} / {NB_QUESTIONS}"
+
+
+def test_blocs_sans_effet_sur_le_resultat():
+    df_notes = export_avec_copie()
+    paires, _ = paires_similaires(df_notes, seuil=2.0)
+    par_blocs, _ = paires_similaires(df_notes, seuil=2.0, taille_bloc=7)
+    pd.testing.assert_frame_equal(par_blocs, paires)
+
+
+def test_comparaison_par_groupe():
+    df_notes = export_avec_copie()
+    groupes = pd.Series(['A'] * 20 + ['B'] * 20, index=df_notes.index)  # 1008 et 1040 séparées
+    paires, comparees = paires_similaires(df_notes, groupes, seuil=4.0)
+    assert comparees == 2 * (20 * 19 // 2)
+    assert paires.empty
+
+
+def test_export_sans_questions_refuse():
+    df_notes, _ = lire_notes_amc(csv_amc("A:Code,Mark\n1,10\n2,12\n"))
+    with pytest.raises(ValueError):
+        paires_similaires(df_notes)
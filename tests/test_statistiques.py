@@ -0,0 +1,35 @@
+"""
+Statistiques des notes : intervalles de confiance bootstrap.
+"""
+import numpy as np
+
+from statistiques import intervalles_bootstrap
+
+NOTES = [12.0, 8.5, 15.0, 9.75, 10.0, 'ABS', 18.0, 6.0, 11.0, 13.5]
+
+
+def test_intervalles_encadrent_les_valeurs_observees():
+    intervalles = intervalles_bootstrap(NOTES, tirages=500)
+    valeurs = np.array([v for v in NOTES if v != 'ABS'])
+    observees = {'Taux de réussite': (valeurs >= 10).mean() * 100, 'Moyenne': valeurs.mean(),
+                 'Médiane': np.median(valeurs)}
+    for indicateur, valeur in observees.items():
+        assert intervalles.loc[indicateur, 'Bas'] <= valeur <= intervalles.loc[indicateur, 'Haut']
+
+
+def test_medianes_des_reechantillonnages():
+    # Médiane par effectifs cumulés identique à celle des rééchantillons triés, pour les mêmes tirages
+    valeurs = np.array([v for v in NOTES if v != 'ABS'])
+    classes, effectifs = np.unique(valeurs, return_counts=True)
+    tirages = np.random.default_rng(0).multinomial(len(valeurs), effectifs / len(valeurs), size=300)
+    medianes = [np.median(np.repeat(classes, tirage)) for tirage in tirages]
+    attendues = np.quantile(medianes, [0.025, 0.975])
+    np.testing.assert_allclose(intervalles_bootstrap(NOTES, tirages=300).loc['Médiane'], attendues)
+
+
+def test_reproductible_et_cas_limites():
+    assert intervalles_bootstrap(NOTES, graine=3).equals(intervalles_bootstrap(NOTES, graine=3))
+    constantes = intervalles_bootstrap([12.0] * 5)
+    assert constantes.loc['Moyenne'].tolist() == [12.0, 12.0]
+    assert constantes.loc['Taux de réussite'].tolist() == [100.0, 100.0]
+    assert intervalles_bootstrap(['ABS']).empty
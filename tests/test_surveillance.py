@@ -0,0 +1,53 @@
+"""
+Surveillance d'un dossier d'exports : stabilité des fichiers, transfert
+automatique et état conservé entre deux lancements.
+"""
+import json
+
+from openpyxl import load_workbook
+
+from donnees import octets_classeur
+from fichiers import FichierDepose
+from surveillance import FICHIER_ETAT, Surveillance
+
+CSV = b"A:Code,Mark\n1001,12\n1002,8\n"
+
+
+def preparer(tmp_path):
+    dossier, sortie = tmp_path / 'exports', tmp_path / 'sortie'
+    dossier.mkdir()
+    (dossier / 'admin.xlsx').write_bytes(octets_classeur([1001, 1002]))
+    (dossier / 'notes.csv').write_bytes(CSV)
+    return dossier, sortie
+
+
+def test_transfert_une_fois_stable(tmp_path):
+    dossier, sortie = preparer(tmp_path)
+    surveillance = Surveillance(str(dossier), str(sortie), delai=2)
+    assert surveillance.parcourir(maintenant=0) == []    # classeur tout juste vu
+    assert surveillance.parcourir(maintenant=2) == []    # classeur stable, export tout juste vu
+    assert surveillance.parcourir(maintenant=4) == ['notes.csv']
+    ws = load_workbook(sortie / 'notes.xlsx').active
+    assert [ws.cell(row=ligne, column=4).value for ligne in (4, 5)] == [12, 8]
+    assert (sortie / 'notes_rapport.csv').exists()
+
+
+def test_export_inchange_non_retraite(tmp_path):
+    dossier, sortie = preparer(tmp_path)
+    assert Surveillance(str(dossier), str(sortie), delai=0).parcourir() == ['notes.csv']
+
+    # État relu au redémarrage : le même export n'est pas retransféré
+    surveillance = Surveillance(str(dossier), str(sortie), delai=0)
+    assert surveillance.parcourir() == []
+    assert surveillance.etat['notes.csv']['cle']['csv'] == FichierDepose(CSV).empreinte()
+
+    (dossier / 'notes.csv').write_bytes(CSV + b"1001,14\n")
+    assert surveillance.parcourir() == ['notes.csv']
+
+
+def test_export_invalide_memorise(tmp_path):
+    dossier, sortie = preparer(tmp_path)
+    (dossier / 'notes.csv').write_bytes(b"sans,colonnes\n1,2\n")
+    assert Surveillance(str(dossier), str(sortie), delai=0).parcourir() == []
+    etat = json.loads((sortie / FICHIER_ETAT).read_text(encoding='utf-8'))
+    assert 'erreur' in etat['notes.csv']
@@ -0,0 +1,539 @@
+"""
+Transfert des notes AMC vers le fichier Excel administratif.
+
+Ce module ne dépend pas de Streamlit : les erreurs sont signalées par des
+exceptions (ValueError pour un fichier invalide, TransfertAnnule pour une
+annulation) afin que le transfert puisse tourner dans un thread d'arrière-plan.
+"""
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+import metriques
+from admission import creneau, echeance, inspecter_classeur, parcourir
+from codes import aligner_codes, canoniser_codes
+from commun import detect_delimiter
+from fichiers import FichierDepose
+from gabarits import resoudre_entete
+
+# Nombre de lignes Excel parcourues entre deux notifications de progression
+PAS_PROGRESSION = 200
+
+# Indicateurs de classement pouvant être écrits à côté des notes, avec leur intitulé par défaut
+CLASSEMENTS = {'rang': 'Rang', 'centile': 'Centile', 'mention': 'Mention'}
+
+# Mentions : bornes inférieures (notes sur 20) et libellés, du plus bas au plus haut
+BORNES_MENTIONS = [10, 12, 14, 16]
+MENTIONS = ['Ajourné', 'Passable', 'Assez bien', 'Bien', 'Très bien']
+
+# Format Excel de chaque indicateur
+FORMATS_CLASSEMENT = {'rang': '0', 'centile': '0.0', 'mention': '@'}
+
+
+class TransfertAnnule(Exception):
+    """Levée lorsque l'utilisateur annule un transfert en cours."""
+
+
+# =============================================================================
+# LECTURE DES NOTES
+# =============================================================================
+
+def lire_notes_csv(csv_fichier: FichierDepose, add_notes: float = 0.0) -> tuple:
+    """
+    Construit la table des notes (Code canonique, Note, Ligne CSV) à partir du
+    CSV AMC. Les notes non numériques (ABS, …) sont conservées telles quelles,
+    les notes vides ignorées ; les codes en double sont conservés pour être
+    signalés par rapprocher().
+    Retourne (notes, nb_anomalies). Lève ValueError si le CSV est inexploitable.
+    """
+    with metriques.chronometre('amc_duree_lecture_secondes', fichier='csv'):
+        delimiter = detect_delimiter(csv_fichier.echantillon())
+        # A:Code lu en texte : les zéros initiaux restent soumis à la politique de canoniser_codes
+        csv_data = pd.read_csv(csv_fichier.flux(), delimiter=delimiter, encoding='utf-8', dtype={'A:Code': str})
+
+    if 'Mark' in csv_data.columns:
+        csv_data = csv_data.rename(columns={'Mark': 'Note'})
+
+    if 'A:Code' not in csv_data.columns or 'Note' not in csv_data.columns:
+        raise ValueError("Le fichier CSV ne contient pas les colonnes 'A:Code' ou 'Note'.")
+
+    anomalies_count = int((csv_data['A:Code'] == 'NONE').sum())
+    csv_clean = csv_data[csv_data['A:Code'] != 'NONE']
+
+    # Conversion vectorisée des notes en float (virgule décimale acceptée)
+    brutes = csv_clean['Note']
+    numeriques = pd.to_numeric(
+        brutes.astype(str).str.replace(',', '.', regex=False).str.strip(), errors='coerce'
+    )
+
+    # Ajout du bonus (plafonné à 20)
+    if add_notes > 0:
+        numeriques = (numeriques + add_notes).clip(upper=20.0)
+
+    # Garder le texte si la note n'est pas numérique ; sinon les notes restent
+    # un tableau float64 contigu (pas de float32 : valeurs écrites inchangées)
+    textes = numeriques.isna() & brutes.notna()
+    valeurs = numeriques.astype(object).where(numeriques.notna(), brutes) if textes.any() else numeriques
+
+    # Table des notes : codes canoniques, sans codes ni notes manquants (doublons conservés)
+    codes = canoniser_codes(csv_clean['A:Code'])
+    presents = (codes.notna() & valeurs.notna()).to_numpy()
+    codes = codes[presents]
+    if codes.dtype == 'Int64':
+        codes = codes.astype('int64')
+    notes = pd.DataFrame({
+        'Code': codes.to_numpy(),
+        'Note': valeurs.to_numpy()[presents],
+        'Ligne CSV': (csv_clean.index.to_numpy()[presents] + 2).astype('int32'),  # ligne 1 : en-tête
+    })
+
+    if notes.empty:
+        raise ValueError("Aucune note valide dans le fichier CSV.")
+
+    return notes, anomalies_count
+
+
+# =============================================================================
+# RAPPROCHEMENT
+# =============================================================================
+
+class Rapprochement:
+    """
+    Résultat de l'appariement des notes AMC avec la colonne Code du classeur :
+    notes reportées, codes du CSV absents du classeur, étudiants du classeur
+    sans note et codes en double (CSV ou classeur).
+    """
+
+    def __init__(self, reportees, absents_classeur, sans_note, doublons_csv, doublons_classeur):
+        self.reportees = reportees
+        self.absents_classeur = absents_classeur
+        self.sans_note = sans_note
+        self.doublons_csv = doublons_csv
+        self.doublons_classeur = doublons_classeur
+
+    def rapport(self) -> pd.DataFrame:
+        """Toutes les catégories réunies dans une seule table, avec une colonne Statut."""
+        parties = [
+            (self.reportees, "Note reportée"),
+            (self.absents_classeur, "Code absent du classeur"),
+            (self.sans_note, "Étudiant sans note"),
+            (self.doublons_csv, "Code en double dans le CSV"),
+            (self.doublons_classeur, "Code en double dans le classeur"),
+        ]
+        rapport = pd.concat(
+            [df.assign(Statut=statut) for df, statut in parties], ignore_index=True
+        )
+        rapport = rapport.astype({'Ligne Excel': 'Int64', 'Ligne CSV': 'Int64'})
+        return rapport[['Statut', 'Code', 'Ligne Excel', 'Ligne CSV', 'Note']]
+
+    def rapport_csv(self) -> bytes:
+        return self.rapport().to_csv(index=False).encode('utf-8')
+
+    @property
+    def taille_memoire(self) -> int:
+        """Octets occupés par les tables du rapprochement."""
+        tables = (self.reportees, self.absents_classeur, self.sans_note, self.doublons_csv, self.doublons_classeur)
+        return int(sum(table.memory_usage(deep=True).sum() for table in tables))
+
+
+def rapprocher(codes_excel: pd.Series, notes: pd.DataFrame, premiere_ligne: int = 1) -> Rapprochement:
+    """
+    Apparie en un seul passage (jointure par hachage sur le code canonique)
+    la colonne Code du classeur et la table des notes. En cas de code en
+    double dans le CSV, la dernière note l'emporte. `premiere_ligne` est le
+    numéro de ligne Excel du premier code.
+    """
+    codes_excel, codes_csv = aligner_codes(codes_excel.reset_index(drop=True), notes['Code'])
+    lignes_excel = pd.RangeIndex(premiere_ligne, premiere_ligne + len(codes_excel))
+    presents = codes_excel.notna().to_numpy()
+
+    derniere = ~codes_csv.duplicated(keep='last').to_numpy()
+    index_notes = pd.Index(codes_csv[derniere])
+    notes_uniques = notes[derniere]
+    positions = index_notes.get_indexer(codes_excel)
+    trouves = positions >= 0
+
+    reportees = pd.DataFrame({
+        'Code': codes_excel[trouves].to_numpy(),
+        'Ligne Excel': lignes_excel[trouves],
+        'Ligne CSV': notes_uniques['Ligne CSV'].to_numpy()[positions[trouves]],
+        'Note': notes_uniques['Note'].to_numpy()[positions[trouves]],
+    })
+    absents = ~index_notes.isin(codes_excel[presents])
+    absents_classeur = notes_uniques[absents][['Code', 'Ligne CSV', 'Note']]
+    sans_note = pd.DataFrame({
+        'Code': codes_excel[presents & ~trouves].to_numpy(),
+        'Ligne Excel': lignes_excel[presents & ~trouves],
+    })
+    doublons_csv = notes[codes_csv.duplicated(keep=False).to_numpy()][['Code', 'Ligne CSV', 'Note']]
+    doublons = presents & codes_excel.duplicated(keep=False).to_numpy()
+    doublons_classeur = pd.DataFrame({
+        'Code': codes_excel[doublons].to_numpy(),
+        'Ligne Excel': lignes_excel[doublons],
+    })
+
+    return Rapprochement(reportees, absents_classeur, sans_note, doublons_csv, doublons_classeur)
+
+
+# =============================================================================
+# CLASSEMENT
+# =============================================================================
+
+def classer_notes(notes: pd.Series, codes: pd.Series = None) -> pd.DataFrame:
+    """
+    Indicateurs de classement de chaque note, calculés sur le tableau des
+    notes numériques trié une fois : rang (1 pour la meilleure note, même rang
+    pour les ex aequo), centile (part des notes inférieures ou égales, en %)
+    par recherche dichotomique, et mention par intervalles de notes
+    (BORNES_MENTIONS). Les notes non numériques (ABS…) n'ont pas d'indicateurs.
+    Si `codes` est fourni, un étudiant présent sur plusieurs lignes du
+    classeur ne compte qu'une fois : le classement porte sur les paires
+    (code, note) distinctes, puis chaque ligne reçoit les indicateurs de sa paire.
+    Colonnes : celles de CLASSEMENTS.
+    """
+    if codes is not None:
+        paires = pd.DataFrame({'code': pd.Series(codes).to_numpy(), 'note': pd.Series(notes).to_numpy()})
+        groupes = paires.groupby(['code', 'note'], sort=False, dropna=False).ngroup().to_numpy()
+        indicateurs = classer_notes(paires.drop_duplicates()['note'])
+        return indicateurs.iloc[groupes].reset_index(drop=True)
+
+    valeurs = pd.to_numeric(pd.Series(notes), errors='coerce').to_numpy(dtype=float)
+    numeriques = ~np.isnan(valeurs)
+    triees = np.sort(valeurs[numeriques])
+    inferieures_ou_egales = np.searchsorted(triees, valeurs, side='right')
+    mentions = np.asarray(MENTIONS, dtype=object)[np.digitize(np.nan_to_num(valeurs), BORNES_MENTIONS)]
+    return pd.DataFrame({
+        'rang': pd.array(np.where(numeriques, len(triees) - inferieures_ou_egales + 1, 0), dtype='Int64'),
+        'centile': np.round(inferieures_ou_egales / max(len(triees), 1) * 100, 1),
+        'mention': mentions,
+    }).where(pd.Series(numeriques), axis=0)
+
+
+# =============================================================================
+# ÉCRITURE DANS LE CLASSEUR
+# =============================================================================
+
+def placer_colonnes(ws, ligne_entete: int, intitules: list, reservees=()) -> list:
+    """
+    Colonne de chaque intitulé dans la ligne d'en-tête : la colonne qui le
+    porte déjà, sinon une nouvelle colonne après la dernière colonne
+    renseignée, dont l'en-tête est écrit. Les colonnes `reservees` (Code,
+    Note) ne peuvent pas être désignées.
+    """
+    entete = next(ws.iter_rows(min_row=ligne_entete, max_row=ligne_entete, values_only=True), ())
+    existantes = {str(v).strip(): i + 1 for i, v in enumerate(entete) if v is not None and str(v).strip()}
+    derniere = max(existantes.values(), default=0)
+    colonnes = []
+    for intitule in intitules:
+        if intitule not in existantes:
+            derniere += 1
+            ws.cell(row=ligne_entete, column=derniere, value=intitule)
+            existantes[intitule] = derniere
+        if existantes[intitule] in reservees:
+            raise ValueError(
+                f"La colonne « {intitule} » contient les codes ou les notes : choisissez un autre intitulé."
+            )
+        colonnes.append(existantes[intitule])
+    return colonnes
+
+
+def trouver_colonnes(ws) -> tuple:
+    """
+    Recherche les colonnes Code et Note dans les 15 premières lignes de la feuille.
+    Retourne (code_col_idx, note_col_idx, header_row_idx), indices à partir de 1.
+    """
+    code_col_idx = note_col_idx = header_row_idx = None
+
+    for row_idx, row in enumerate(ws.iter_rows(min_row=1, max_row=15), start=1):
+        for cell in row:
+            if cell.value:
+                val = str(cell.value).strip().lower()
+                if val == 'code' and code_col_idx is None:
+                    code_col_idx = cell.column
+                    header_row_idx = row_idx
+                elif val == 'note' and note_col_idx is None:
+                    note_col_idx = cell.column
+                    header_row_idx = row_idx
+        if code_col_idx and note_col_idx:
+            break
+
+    if not code_col_idx or not note_col_idx:
+        raise ValueError("Colonnes 'Code' et/ou 'Note' introuvables dans le fichier Excel.")
+
+    return code_col_idx, note_col_idx, header_row_idx
+
+
+def localiser_colonnes(wb, ws) -> tuple:
+    """
+    Comme trouver_colonnes, en passant par le registre des gabarits : pour un
+    modèle de classeur déjà rencontré, seule la ligne d'en-tête mémorisée est relue.
+    """
+    def lire_ligne(ligne):
+        return next(ws.iter_rows(min_row=ligne, max_row=ligne, values_only=True), ())
+
+    def detecter():
+        code_col_idx, note_col_idx, header_row_idx = trouver_colonnes(ws)
+        return header_row_idx, {'code': code_col_idx, 'note': note_col_idx}
+
+    header_row_idx, colonnes = resoudre_entete('transfert', wb.sheetnames + [ws.title], lire_ligne, detecter)
+    return colonnes['code'], colonnes['note'], header_row_idx
+
+
+def transferer_notes(xls_fichier: FichierDepose, csv_fichier: FichierDepose, add_notes: float = 0.0,
+                     progression=None, annulation=None, attente=None, classement: dict = None) -> tuple:
+    """
+    Reporte les notes du CSV AMC dans le classeur Excel administratif.
+
+    `classement` associe des indicateurs de CLASSEMENTS (rang, centile,
+    mention) à l'intitulé de la colonne où les écrire (placer_colonnes) ; ils
+    sont calculés sur les notes reportées et écrits dans le même parcours que
+    les notes, sans second chargement du classeur.
+
+    `progression(lignes_parcourues, lignes_total, notes_appariees)` est appelée
+    toutes les PAS_PROGRESSION lignes ; si l'événement `annulation` est levé,
+    le transfert s'interrompt par TransfertAnnule. Le classeur passe d'abord
+    le contrôle d'admission (ClasseurRefuse) ; s'il est lourd, le transfert
+    attend un créneau et `attente(en_file)` signale l'entrée et la sortie de
+    la file. Au-delà de la durée maximale de traitement, ValueError est levée.
+
+    Retourne (BytesIO, nb_anomalies, nb_transferts, nb_notes_dispo, Rapprochement).
+    """
+    delai = None
+
+    def verifier_annulation():
+        if annulation is not None and annulation.is_set():
+            raise TransfertAnnule()
+        if delai is not None:
+            delai()
+
+    inconnus = set(classement or ()) - set(CLASSEMENTS)
+    if inconnus:
+        raise ValueError(f"Indicateurs de classement inconnus : {', '.join(sorted(inconnus))}.")
+
+    # Classeur inspecté avant toute analyse : refusé s'il dépasse les limites
+    inspection = inspecter_classeur(xls_fichier.flux())
+    notes, anomalies_count = lire_notes_csv(csv_fichier, add_notes)
+    verifier_annulation()
+
+    with creneau(inspection, verifier_annulation, attente):
+        # Durée maximale décomptée une fois le créneau obtenu : l'attente n'en fait pas partie
+        delai = echeance()
+        with metriques.chronometre('amc_duree_lecture_secondes', fichier='excel'):
+            wb = load_workbook(xls_fichier.flux())
+        try:
+            ws = wb.active
+            code_col_idx, note_col_idx, header_row_idx = localiser_colonnes(wb, ws)
+
+            # Lecture de la colonne Code en un seul parcours, puis appariement vectorisé
+            codes_excel = canoniser_codes([
+                valeur for (valeur,) in parcourir(ws.iter_rows(
+                    min_row=header_row_idx + 1, min_col=code_col_idx, max_col=code_col_idx, values_only=True
+                ), verifier_annulation)
+            ])
+            rapprochement = rapprocher(codes_excel, notes, premiere_ligne=header_row_idx + 1)
+            total = len(codes_excel)
+            verifier_annulation()
+
+            matched_count = 0
+            reportees = rapprochement.reportees
+            a_ecrire = []  # (colonne, valeurs, format) de chaque indicateur de classement
+            if classement:
+                indicateurs = classer_notes(reportees['Note'], reportees['Code'])
+                colonnes = placer_colonnes(
+                    ws, header_row_idx, list(classement.values()), reservees=(code_col_idx, note_col_idx)
+                )
+                a_ecrire = [
+                    (colonne, indicateurs[cle].tolist(), FORMATS_CLASSEMENT[cle])
+                    for cle, colonne in zip(classement, colonnes)
+                ]
+            for ligne, final_note in zip(reportees['Ligne Excel'], reportees['Note']):
+                if matched_count % PAS_PROGRESSION == 0:
+                    verifier_annulation()
+                    if progression is not None:
+                        progression(ligne - header_row_idx, total, matched_count)
+
+                note_cell = ws.cell(row=int(ligne), column=note_col_idx)
+                if isinstance(final_note, float) and final_note == int(final_note):
+                    note_cell.value = int(final_note)
+                    note_cell.number_format = '0'
+                else:
+                    note_cell.value = final_note
+                    note_cell.number_format = '0.00'
+                for colonne, valeurs, format_cellule in a_ecrire:
+                    valeur = valeurs[matched_count]
+                    if not pd.isna(valeur):
+                        cellule = ws.cell(row=int(ligne), column=colonne)
+                        cellule.value = valeur
+                        cellule.number_format = format_cellule
+                matched_count += 1
+
+            verifier_annulation()
+            if progression is not None:
+                progression(total, total, matched_count)
+
+            output = io.BytesIO()
+            with metriques.chronometre('amc_duree_enregistrement_secondes'):
+                wb.save(output)
+        finally:
+            wb.close()
+    output.seek(0)
+
+    return output, anomalies_count, matched_count, notes['Code'].nunique(), rapprochement
+
+
+# =============================================================================
+# APERÇU DES MODIFICATIONS
+# =============================================================================
+
+def _est_vide(valeurs: pd.Series) -> pd.Series:
+    return valeurs.isna() | (valeurs.astype(str).str.strip() == '')
+
+
+def apercu_modifications(xls_fichier: FichierDepose, csv_fichier: FichierDepose,
+                         add_notes: float = 0.0) -> pd.DataFrame:
+    """
+    Calcule, sans rien écrire ni sauvegarder, les cellules Note que le
+    transfert modifierait : ancienne valeur, nouvelle valeur et indicateur
+    d'écrasement d'une note déjà saisie. Le classeur est lu en mode lecture
+    seule et la comparaison est vectorisée. Comme pour le transfert, un
+    classeur lourd attend un créneau et la durée de traitement est bornée.
+    """
+    inspection = inspecter_classeur(xls_fichier.flux())
+    notes, _ = lire_notes_csv(csv_fichier, add_notes)
+
+    with creneau(inspection):
+        delai = echeance()
+        wb = load_workbook(xls_fichier.flux(), read_only=True, data_only=True)
+        try:
+            ws = wb.active
+            code_col_idx, note_col_idx, header_row_idx = localiser_colonnes(wb, ws)
+            premiere_col = min(code_col_idx, note_col_idx)
+            contenu = pd.DataFrame(
+                parcourir(ws.iter_rows(
+                    min_row=header_row_idx + 1, min_col=premiere_col,
+                    max_col=max(code_col_idx, note_col_idx), values_only=True
+                ), delai),
+                dtype=object
+            )
+        finally:
+            wb.close()
+        delai()
+
+    if contenu.empty:
+        return pd.DataFrame(columns=['Ligne Excel', 'Code', 'Ancienne note', 'Nouvelle note', 'Écrasée'])
+
+    codes_excel = canoniser_codes(contenu[code_col_idx - premiere_col])
+    anciennes_col = contenu[note_col_idx - premiere_col]
+    reportees = rapprocher(codes_excel, notes, premiere_ligne=header_row_idx + 1).reportees
+
+    anciennes = anciennes_col.to_numpy()[reportees['Ligne Excel'] - header_row_idx - 1]
+    apercu = pd.DataFrame({
+        'Ligne Excel': reportees['Ligne Excel'].to_numpy(),
+        'Code': reportees['Code'].to_numpy(),
+        'Ancienne note': pd.Series(anciennes, dtype=object),
+        'Nouvelle note': reportees['Note'].to_numpy(),
+    })
+
+    # Comparaison numérique quand les deux valeurs sont des nombres, textuelle sinon
+    anc_num = pd.to_numeric(apercu['Ancienne note'], errors='coerce')
+    nouv_num = pd.to_numeric(apercu['Nouvelle note'], errors='coerce')
+    identiques = (anc_num == nouv_num) | (
+        anc_num.isna() & nouv_num.isna()
+        & (apercu['Ancienne note'].astype(str) == apercu['Nouvelle note'].astype(str))
+    )
+    apercu = apercu[~identiques.to_numpy()].reset_index(drop=True)
+    apercu['Écrasée'] = ~_est_vide(apercu['Ancienne note'])
+
+    # Colonnes mixtes (nombres et textes comme ABS) présentées en texte pour l'affichage
+    for col in ('Ancienne note', 'Nouvelle note'):
+        apercu[col] = apercu[col].where(apercu[col].notna(), '').astype(str)
+    return apercu
+
+
+# =============================================================================
+# TRANSFERT EN ARRIÈRE-PLAN
+# =============================================================================
+
+class JobTransfert:
+    """
+    Exécute transferer_notes dans un thread et expose son avancement.
+
+    L'objet est conservé dans st.session_state : le résultat reste disponible
+    après la fin du transfert, sans relancer le traitement à chaque rerun.
+    """
+
+    def __init__(self, xls_fichier: FichierDepose, csv_fichier: FichierDepose, add_notes: float = 0.0,
+                 classement: dict = None):
+        self.add_notes = add_notes
+        self.classement = classement
+        self.etat = 'en_attente'  # en_attente, en_cours, termine, annule, erreur
+        self.etape = ''
+        self.lignes_parcourues = 0
+        self.lignes_total = 0
+        self.notes_appariees = 0
+        self.resultat = None
+        self.erreur = None
+        self._annulation = threading.Event()
+        self._thread = threading.Thread(
+            target=self._executer, args=(xls_fichier, csv_fichier), daemon=True
+        )
+
+    @property
+    def en_cours(self) -> bool:
+        return self.etat in ('en_attente', 'en_cours')
+
+    @property
+    def taille_memoire(self) -> int:
+        """Octets du classeur rempli et du rapprochement conservés dans le résultat."""
+        return len(self.resultat[0]) + self.resultat[-1].taille_memoire if self.resultat else 0
+
+    @property
+    def fraction(self) -> float:
+        """Avancement entre 0 et 1, pour st.progress."""
+        if self.lignes_total <= 0:
+            return 0.0
+        return min(self.lignes_parcourues / self.lignes_total, 1.0)
+
+    def demarrer(self) -> 'JobTransfert':
+        self.etat = 'en_cours'
+        self.etape = "Lecture des fichiers"
+        self._thread.start()
+        return self
+
+    def annuler(self):
+        self._annulation.set()
+
+    def _progression(self, parcourues: int, total: int, appariees: int):
+        self.etape = "Report des notes"
+        self.lignes_parcourues = parcourues
+        self.lignes_total = total
+        self.notes_appariees = appariees
+        if parcourues >= total:
+            self.etape = "Sauvegarde du classeur"
+
+    def _attente(self, en_file: bool):
+        self.etat = 'en_attente' if en_file else 'en_cours'
+        self.etape = "En file d'attente (classeur lourd)" if en_file else "Lecture des fichiers"
+
+    def _executer(self, xls_fichier: FichierDepose, csv_fichier: FichierDepose):
+        metriques.incrementer('amc_transferts_en_cours')
+        try:
+            output, *compteurs = transferer_notes(
+                xls_fichier, csv_fichier, self.add_notes,
+                progression=self._progression, annulation=self._annulation, attente=self._attente,
+                classement=self.classement
+            )
+            # Octets conservés tels quels : servis au bouton de téléchargement sans nouvelle copie
+            self.resultat = (output.getvalue(), *compteurs)
+            self.etat = 'termine'
+        except TransfertAnnule:
+            self.etat = 'annule'
+        except Exception as e:
+            self.erreur = str(e)
+            self.etat = 'erreur'
+        finally:
+            metriques.incrementer('amc_transferts_en_cours', -1)
+            metriques.incrementer('amc_transferts_total', etat=self.etat)
@@ -1,10 +1,71 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
-from openpyxl import load_workbook
 from openpyxl.styles import numbers as xl_numbers
 import plotly.express as px
-import io
-import csv
+import plotly.graph_objects as go
+import contextlib
+import hashlib
+import os
+
+import memoire
+import metriques
+from bareme import (
+    NEUTRALISATIONS, bareme_questions, ecart_reproduction, exporter_notes_recalculees, recalculer_notes
+)
+from commun import IndexPrefixes
+from cours import charger_liste, enregistrer_liste, lister_cours
+from fichiers import FichierDepose
+from fusion import ABSENCES, RATTRAPAGES, PartieExamen, fusionner_en_fichier
+from historique import enregistrer_examen, histogrammes_long, lister_examens, resumer_notes, supprimer_examens
+from interface import fichier_depose
+from liste import (
+    colonnes_groupe, comparer_listes, construire_liste, detecter_colonne_groupe, exporter_listes_groupes,
+    lire_fichier_admin
+)
+from similarite import SEUIL_ECARTS_TYPES, groupes_des_copies, paires_similaires
+from statistiques import (
+    NIVEAU_CONFIANCE, colonnes_parties, colonnes_questions, intervalles_bootstrap, lire_notes_amc,
+    statistiques_par_groupe
+)
+from transfert import CLASSEMENTS, JobTransfert, apercu_modifications
+
+# Nombre de résultats de transfert conservés en mémoire pour l'ensemble des sessions
+TRANSFERTS_MEMORISES_MAX = 16
+
+# Nombre d'entrées des autres caches partagés entre sessions
+FUSIONS_MEMORISEES_MAX = 8
+BAREMES_MEMORISES_MAX = 8
+LISTES_MEMORISEES_MAX = 8
+INDEX_MEMORISES_MAX = 16
+APERCUS_MEMORISES_MAX = 16
+STATISTIQUES_MEMORISEES_MAX = 16
+SIMILITUDES_MEMORISEES_MAX = 8
+INTERVALLES_MEMORISES_MAX = 64
+
+# Nombre de lignes affichées par page dans les tableaux paginés
+TAILLE_PAGE = 50
+
+NOUVEAU_COURS = "➕ Nouveau cours…"
+
+LIBELLES_ABSENCE = {
+    'zero': "La partie manquante compte pour 0",
+    'ignorer': "Moyenne sur les parties présentes",
+    'exclure': "Pas de note finale",
+}
+LIBELLES_CLASSEMENT = {
+    'rang': "Rang (1 = meilleure note)",
+    'centile': "Centile (part des notes inférieures ou égales)",
+    'mention': "Mention (Passable, Assez bien, Bien, Très bien)",
+}
+LIBELLES_NEUTRALISATION = {
+    'retirer': "Retirée du barème",
+    'accorder': "Points accordés à tous",
+}
+LIBELLES_RATTRAPAGE = {
+    'remplacer': "La note de rattrapage remplace la note combinée",
+    'meilleure': "La meilleure des deux notes est retenue",
+}
 
 # =============================================================================
 # CONFIGURATION DE LA PAGE
@@ -15,125 +76,348 @@ st.set_page_config(
     layout="wide"
 )
 
+
+@st.cache_resource
+def publier_metriques():
+    """Publie les métriques, une fois par processus, si AMC_PORT_METRIQUES est défini."""
+    port = os.environ.get('AMC_PORT_METRIQUES')
+    if not port:
+        return None
+    try:
+        return metriques.servir(int(port))
+    except OSError:
+        return None  # port déjà occupé, par exemple par un autre processus de l'application
+
+
+publier_metriques()
+contexte = get_script_run_ctx()
+if contexte is not None:
+    metriques.session_active(contexte.session_id)
+
 # =============================================================================
 # FONCTIONS UTILITAIRES
 # =============================================================================
 
-def detect_delimiter(file_content: bytes) -> str:
-    """Détecte automatiquement le séparateur du fichier CSV."""
-    sample = file_content.decode('utf-8', errors='ignore')
-    try:
-        dialect = csv.Sniffer().sniff(sample)
-        return dialect.delimiter
-    except csv.Error:
-        return ','
+def memorise(nom: str, taille_max: int, cle, calcul, message: str = None):
+    """
+    Résultat de `calcul()` mémorisé sous `cle` dans le cache partagé `nom` :
+    calculé une fois pour toutes les sessions, compté dans le budget mémoire
+    global et recalculé ici s'il a été évincé.
+    """
+    cache = memoire.cache_partage(nom, taille_max)
+    resultat = cache.get(cle)
+    if resultat is None:
+        with st.spinner(message) if message else contextlib.nullcontext():
+            resultat = calcul()
+        cache[cle] = resultat
+    return resultat
+
+
+def index_prefixes(empreinte: str, colonnes: tuple, table: pd.DataFrame) -> IndexPrefixes:
+    """Index de recherche d'une table, construit une seule fois par contenu de fichier."""
+    return memorise(
+        'index_recherche', INDEX_MEMORISES_MAX, (empreinte, colonnes), lambda: IndexPrefixes(table, colonnes)
+    )
+
 
+def _revenir_page_1(cle: str):
+    st.session_state[f"page_{cle}"] = 1
 
-def normalize_code(val) -> str:
+
+def afficher_table_paginee(table: pd.DataFrame, cle: str, index: IndexPrefixes = None):
     """
-    Normalise un code étudiant en chaîne de caractères propre.
-    Gère les cas : entier, flottant (123.0 → '123'), texte.
+    Affiche une page de `table` : seule la tranche demandée est envoyée au
+    navigateur. Avec un `index`, un champ de recherche filtre les lignes par
+    préfixe de code, de nom ou de prénom.
     """
-    if val is None:
-        return ''
-    s = str(val).strip()
-    # Supprimer le suffixe '.0' introduit par pandas/Excel pour les entiers lus comme float
-    if s.endswith('.0'):
-        s = s[:-2]
-    return s
+    if index is not None:
+        recherche = st.text_input(
+            "🔍 Rechercher (début du code, du nom ou du prénom)",
+            key=f"recherche_{cle}", on_change=_revenir_page_1, args=(cle,)
+        )
+        if recherche.strip():
+            table = table.iloc[index.rechercher(recherche)]
+
+    nb_pages = max(1, -(-len(table) // TAILLE_PAGE))
+    # Page initialisée par la session et non par `value=` : elle est aussi modifiée par le code
+    if st.session_state.setdefault(f"page_{cle}", 1) > nb_pages:
+        st.session_state[f"page_{cle}"] = nb_pages
+    page = st.number_input(
+        f"Page (sur {nb_pages})", min_value=1, max_value=nb_pages, step=1, key=f"page_{cle}"
+    )
+    debut = (page - 1) * TAILLE_PAGE
+    st.dataframe(table.iloc[debut:debut + TAILLE_PAGE], use_container_width=True, hide_index=True)
+    st.caption(f"Lignes {min(debut + 1, len(table))} à {min(debut + TAILLE_PAGE, len(table))} sur {len(table)}")
+
+
+@st.fragment
+def parcourir_table(table: pd.DataFrame, cle: str, index: IndexPrefixes = None):
+    """afficher_table_paginee exécutée comme fragment : paginer ou rechercher ne relance que ce tableau."""
+    afficher_table_paginee(table, cle, index)
 
 
 # =============================================================================
-# RUBRIQUE 1 — LISTE ÉTUDIANTS
+# FUSION DE PLUSIEURS EXPORTS AMC
 # =============================================================================
 
-def process_excel(file) -> tuple:
+def fusion_memorisee(cle: tuple, absence: str, rattrapage: str, parties: list) -> tuple:
     """
-    Lit le fichier Excel administratif et produit la liste des étudiants
-    au format attendu par Auto Multiple Choice.
-    Retourne (dataframe_brut, dataframe_liste) ou (None, None) en cas d'erreur.
+    Fusion mémorisée par empreinte des exports, paramètres et politiques : la
+    table combinée n'est calculée qu'une fois, et le CSV fusionné conserve la
+    même empreinte pour les caches de l'aperçu et du transfert.
+    """
+    return memorise(
+        'fusion', FUSIONS_MEMORISEES_MAX, (cle, absence, rattrapage),
+        lambda: fusionner_en_fichier(parties, absence, rattrapage), "Fusion des exports AMC…"
+    )
+
+
+def choisir_exports(uploaded_files: list, cle: str):
     """
+    Retourne le CSV à analyser : le fichier lui-même s'il est seul, sinon le
+    CSV fusionné selon les poids, barèmes et rôles saisis. None en cas d'erreur.
+    """
+    fichiers = [fichier_depose(u, f"{cle}_{i}") for i, u in enumerate(uploaded_files)]
+    if len(fichiers) == 1:
+        return fichiers[0]
+
+    st.markdown(f"**Fusion de {len(fichiers)} exports AMC** — poids, barème (note maximale) et rôle de chaque fichier :")
+    parametres = st.data_editor(
+        pd.DataFrame({
+            'Fichier': [f.nom for f in fichiers],
+            'Rôle': 'partie',
+            'Poids': 1.0,
+            'Barème': 20.0,
+        }),
+        column_config={
+            'Fichier': st.column_config.TextColumn(disabled=True),
+            'Rôle': st.column_config.SelectboxColumn(options=['partie', 'rattrapage'], required=True),
+            'Poids': st.column_config.NumberColumn(min_value=0.0, step=0.5, required=True),
+            'Barème': st.column_config.NumberColumn(min_value=0.5, step=0.5, required=True),
+        },
+        hide_index=True, use_container_width=True,
+        key=f"parametres_{cle}_{'_'.join(u.file_id for u in uploaded_files)}"
+    )
+    col_absence, col_rattrapage = st.columns(2)
+    with col_absence:
+        absence = st.selectbox(
+            "Partie manquante", ABSENCES, format_func=LIBELLES_ABSENCE.get, key=f"absence_{cle}"
+        )
+    with col_rattrapage:
+        rattrapage = st.selectbox(
+            "Rattrapage", RATTRAPAGES, format_func=LIBELLES_RATTRAPAGE.get, key=f"rattrapage_{cle}",
+            disabled=not (parametres['Rôle'] == 'rattrapage').any()
+        )
+
+    lignes = list(parametres.itertuples(index=False, name=None))
     try:
-        xls = pd.read_excel(file, header=None, dtype=str)  # dtype=str : évite les conversions automatiques
+        parties = [
+            PartieExamen(fichier, poids=poids, bareme=bareme, role=role)
+            for fichier, (_, role, poids, bareme) in zip(fichiers, lignes)
+        ]
+        cle_fusion = tuple(
+            (f.empreinte(), p.poids, p.bareme, p.role) for f, p in zip(fichiers, parties)
+        )
+        table, fusion = fusion_memorisee(cle_fusion, absence, rattrapage, parties)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return None
+    except Exception as e:
+        st.error(f"❌ Erreur lors de la fusion des exports : {e}")
+        return None
 
-        # Localiser la ligne d'en-tête contenant Code, Nom, Prénom
-        header_index = next(
-            (idx for idx, row in xls.iterrows()
-             if all(col in row.values for col in ['Code', 'Nom', 'Prénom'])),
-            None
+    with st.expander(f"🧮 Notes fusionnées — {len(table)} étudiant(s)"):
+        afficher_table_paginee(table, f"fusion_{cle}")
+    return fusion
+
+
+# =============================================================================
+# NEUTRALISATION ET REPONDÉRATION DES QUESTIONS
+# =============================================================================
+
+def bareme_memorise(cle: tuple, neutralisation: str, df_notes: pd.DataFrame, anomalies: pd.DataFrame,
+                    bareme: pd.DataFrame, nom: str) -> FichierDepose:
+    """
+    Export re-noté mémorisé par empreinte du CSV, barème et neutralisation :
+    il conserve la même empreinte pour les caches de l'aperçu et du transfert.
+    """
+    def calcul():
+        notes = recalculer_notes(df_notes, bareme, neutralisation)
+        return exporter_notes_recalculees(df_notes, anomalies, notes, nom)
+    return memorise('bareme', BAREMES_MEMORISES_MAX, (cle, neutralisation, nom), calcul, "Recalcul des notes…")
+
+
+def ajuster_bareme(fichier_csv: FichierDepose, cle: str) -> FichierDepose:
+    """
+    Neutralisation ou repondération facultative des questions. Retourne le
+    CSV à utiliser : l'original, ou l'export dont les notes sont recalculées
+    selon le barème saisi. Le barème est partagé entre les pages pour un même CSV.
+    """
+    if not st.checkbox("⚖️ Neutraliser ou repondérer des questions", key=f"bareme_{cle}"):
+        return fichier_csv
+    try:
+        df_notes, anomalies = lire_notes_amc(fichier_csv)
+        bareme_initial = bareme_questions(df_notes)
+    except ValueError as e:
+        st.warning(f"⚠️ Barème non modifiable : {e}")
+        return fichier_csv
+
+    baremes = st.session_state.setdefault('baremes', {})
+    bareme, neutralisation = baremes.get(fichier_csv.empreinte(), (bareme_initial, NEUTRALISATIONS[0]))
+    bareme = st.data_editor(
+        bareme,
+        column_config={
+            'Question': st.column_config.TextColumn(disabled=True),
+            'Points max': st.column_config.NumberColumn(min_value=0.0, step=0.25, required=True),
+            'Coefficient': st.column_config.NumberColumn(min_value=0.0, step=0.5, required=True),
+            'Neutralisée': st.column_config.CheckboxColumn(),
+        },
+        hide_index=True, use_container_width=True, key=f"editeur_bareme_{cle}_{fichier_csv.empreinte()}"
+    )
+    neutralisation = st.selectbox(
+        "Question neutralisée", NEUTRALISATIONS, index=NEUTRALISATIONS.index(neutralisation),
+        format_func=LIBELLES_NEUTRALISATION.get, key=f"neutralisation_{cle}"
+    )
+    baremes[fichier_csv.empreinte()] = (bareme, neutralisation)
+
+    try:
+        ecart = ecart_reproduction(df_notes, bareme)
+        cle_bareme = (fichier_csv.empreinte(), tuple(bareme.itertuples(index=False, name=None)))
+        recalcule = bareme_memorise(
+            cle_bareme, neutralisation, df_notes, anomalies, bareme, os.path.splitext(fichier_csv.nom)[0]
+        )
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return None
+
+    if ecart > 0.05:
+        st.warning(
+            f"⚠️ Sans modification, le recalcul s'écarte jusqu'à {ecart:.2f} point(s) de la note AMC : "
+            "vérifiez les points maximum des questions."
         )
-        if header_index is None:
-            st.error("❌ Les colonnes 'Code', 'Nom', 'Prénom' sont introuvables dans le fichier.")
-            return None, None
+    else:
+        st.caption("Sans modification, le recalcul reproduit la note AMC.")
+    nb_neutralisees = int(bareme['Neutralisée'].sum())
+    st.info(
+        f"ℹ️ Notes recalculées pour toutes les copies ({nb_neutralisees} question(s) neutralisée(s)) : "
+        "elles remplacent les notes AMC dans la suite de la page."
+    )
+    return recalcule
 
-        xls.columns = xls.iloc[header_index]
-        xls = xls.iloc[header_index + 1:].reset_index(drop=True)
 
-        if xls.empty:
-            st.error("❌ Aucune donnée valide après traitement.")
-            return None, None
+# =============================================================================
+# RUBRIQUE 1 — LISTE ÉTUDIANTS
+# =============================================================================
 
-        missing = [c for c in ['Code', 'Nom', 'Prénom'] if c not in xls.columns]
-        if missing:
-            st.error(f"❌ Colonnes manquantes : {', '.join(missing)}")
-            return None, None
+def lire_liste_memorisee(empreinte: str, file: FichierDepose) -> tuple:
+    """Fichier administratif analysé une seule fois par contenu, partagé entre reruns."""
+    def calcul():
+        xls = lire_fichier_admin(file.flux())
+        return xls, construire_liste(xls)
+    return memorise('liste', LISTES_MEMORISEES_MAX, empreinte, calcul)
 
-        liste = xls.dropna(subset=['Nom', 'Prénom', 'Code']).copy()
-        liste['Code'] = liste['Code'].apply(normalize_code)
-        liste['Name'] = liste['Code'] + ' ' + liste['Nom'] + ' ' + liste['Prénom']
-        liste = liste[['Code', 'Name']].drop_duplicates()
 
-        return xls, liste
+def process_excel(file: FichierDepose) -> tuple:
+    """
+    Lit le fichier Excel administratif et produit la liste des étudiants
+    au format attendu par Auto Multiple Choice.
+    Retourne (dataframe_brut, dataframe_liste) ou (None, None) en cas d'erreur.
+    """
+    try:
+        return lire_liste_memorisee(file.empreinte(), file)
 
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return None, None
     except Exception as e:
         st.error(f"❌ Erreur lors de la lecture du fichier Excel : {e}")
         return None, None
 
 
+@st.fragment
+def comparer_avec_reference(fichier_excel: FichierDepose, liste: pd.DataFrame):
+    """
+    Compare la liste générée à la liste de référence du cours (étudiants
+    ajoutés, retirés, renommés) et permet de l'enregistrer comme nouvelle
+    référence. Seules les copies des étudiants ajoutés sont à imprimer.
+    """
+    st.subheader("Mise à jour de la liste d'un cours")
+    connus = lister_cours()['cours'].tolist()
+    choix = st.selectbox("Cours", connus + [NOUVEAU_COURS], key="cours_liste")
+    cours = st.text_input("Nom du nouveau cours", key="cours_nouveau") if choix == NOUVEAU_COURS else choix
+    cours = (cours or '').strip()
+    if not cours:
+        return
+
+    liste_amc = liste[['Code', 'Name']]
+    reference, empreinte, enregistre_le = charger_liste(cours)
+    if reference is None:
+        st.info("ℹ️ Aucune liste de référence pour ce cours : enregistrez celle-ci pour suivre ses évolutions.")
+    elif empreinte == fichier_excel.empreinte():
+        st.success(f"✅ Ce fichier est déjà la liste de référence du cours (enregistrée le {enregistre_le}).")
+        return
+    else:
+        changements = comparer_listes(reference, liste_amc)
+        ajoutes = changements[changements['Changement'] == 'Ajouté']
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Ajoutés", len(ajoutes))
+        col2.metric("Retirés", int((changements['Changement'] == 'Retiré').sum()))
+        col3.metric("Renommés", int((changements['Changement'] == 'Renommé').sum()))
+        st.caption(f"Par rapport à la liste de référence enregistrée le {enregistre_le}.")
+        if changements.empty:
+            st.success("✅ Aucun changement d'étudiant depuis la liste de référence.")
+        else:
+            st.dataframe(changements, use_container_width=True, hide_index=True)
+        if not ajoutes.empty:
+            st.download_button(
+                label="📥 Télécharger la liste des étudiants ajoutés (copies à imprimer)",
+                data=ajoutes[['Code', 'Nouveau nom']].rename(columns={'Nouveau nom': 'Name'})
+                .to_csv(index=False).encode('utf-8'),
+                file_name="liste_ajouts_amc.csv",
+                mime="text/csv"
+            )
+
+    if st.button(f"💾 Enregistrer comme liste de référence de « {cours} »"):
+        enregistrer_liste(cours, liste_amc, fichier_excel.empreinte())
+        st.success(f"✅ Liste de référence de « {cours} » enregistrée ({len(liste_amc)} étudiants).")
+
+
 # =============================================================================
 # RUBRIQUE 2 — STATISTIQUES
 # =============================================================================
 
-def process_csv(csv_file) -> tuple:
+def process_csv(csv_file: FichierDepose) -> tuple:
     """
     Lit le fichier CSV d'AMC et retourne un DataFrame propre des notes
     ainsi que les lignes anomalies (Code = NONE).
     """
     try:
-        csv_content = csv_file.read()
-        delimiter = detect_delimiter(csv_content)
-        df = pd.read_csv(io.StringIO(csv_content.decode('utf-8')), delimiter=delimiter)
-
-        if 'Mark' in df.columns:
-            df = df.rename(columns={'Mark': 'Note'})
-
-        if 'A:Code' not in df.columns or 'Note' not in df.columns:
-            st.error("❌ Colonnes requises 'A:Code' et/ou 'Note' absentes du fichier CSV.")
-            return None, None
-
-        anomalies = df[df['A:Code'] == 'NONE'].copy()
-        df_clean = df[df['A:Code'] != 'NONE'].copy()
-
-        df_clean['A:Code'] = pd.to_numeric(df_clean['A:Code'], errors='coerce')
-        df_clean['Note'] = (
-            df_clean['Note'].astype(str)
-            .str.replace(',', '.', regex=False)
-            .astype(float)
-        )
-
-        if df_clean.empty:
-            st.error("❌ Aucune donnée valide après nettoyage.")
-            return None, None
-
-        return df_clean, anomalies
+        return lire_notes_amc(csv_file)
 
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return None, None
     except Exception as e:
         st.error(f"❌ Erreur lors de la lecture du fichier CSV : {e}")
         return None, None
 
 
+def calculer_intervalles(notes: pd.Series) -> pd.DataFrame:
+    """Intervalles de confiance bootstrap, mémorisés par contenu de la série de notes."""
+    cle = hashlib.blake2b(notes.to_numpy(dtype=float).tobytes(), digest_size=16).hexdigest()
+    return memorise('intervalles', INTERVALLES_MEMORISES_MAX, cle, lambda: intervalles_bootstrap(notes))
+
+
 def afficher_statistiques(df_notes, anomalies, label=""):
-    """Affiche les métriques et le diagramme en bâtons des notes."""
+    """Affiche les métriques, leurs intervalles de confiance et le diagramme en bâtons des notes."""
+    intervalles = calculer_intervalles(df_notes['Note'])
+    libelle_ic = f"IC {NIVEAU_CONFIANCE * 100:.0f} %"
+
+    def intervalle(indicateur, unite=''):
+        if indicateur in intervalles.index:
+            bas, haut = intervalles.loc[indicateur]
+            st.caption(f"{libelle_ic} : {bas:.2f} – {haut:.2f}{unite}")
+
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("Présents", len(df_notes))
@@ -143,9 +427,22 @@ def afficher_statistiques(df_notes, anomalies, label=""):
     with col3:
         taux = round((valides / len(df_notes)) * 100, 2) if len(df_notes) > 0 else 0
         st.metric("Taux de réussite", f"{taux} %")
+        intervalle('Taux de réussite', ' %')
     with col4:
         st.metric("Mal identifiés", len(anomalies) if anomalies is not None else 0)
 
+    col5, col6, _, _ = st.columns(4)
+    with col5:
+        st.metric("Moyenne", f"{df_notes['Note'].mean():.2f}" if len(df_notes) > 0 else "—")
+        intervalle('Moyenne')
+    with col6:
+        st.metric("Médiane", f"{df_notes['Note'].median():.2f}" if len(df_notes) > 0 else "—")
+        intervalle('Médiane')
+    st.caption(
+        f"Intervalles de confiance à {NIVEAU_CONFIANCE * 100:.0f} % obtenus par rééchantillonnage (bootstrap) : "
+        "plus le groupe est petit, plus ils sont larges."
+    )
+
     effectifs = df_notes['Note'].value_counts().reset_index()
     effectifs.columns = ['Note', 'Effectif']
 
@@ -171,121 +468,373 @@ def afficher_statistiques(df_notes, anomalies, label=""):
     st.plotly_chart(fig, use_container_width=True)
 
 
+def calculer_stats_groupes(xls_empreinte: str, csv_empreinte: str, col_groupe: str,
+                           xls: pd.DataFrame, df_notes: pd.DataFrame) -> tuple:
+    """Indicateurs et histogrammes par groupe, mémorisés par empreinte des fichiers et colonne."""
+    return memorise(
+        'statistiques_groupes', STATISTIQUES_MEMORISEES_MAX, (xls_empreinte, csv_empreinte, col_groupe),
+        lambda: statistiques_par_groupe(df_notes, construire_liste(xls, col_groupe), col_groupe),
+        "Calcul des statistiques par groupe…"
+    )
+
+
+def afficher_statistiques_groupes(resume: pd.DataFrame, histogrammes: pd.DataFrame, col_groupe: str):
+    """Tableau des indicateurs par groupe et petits multiples des distributions."""
+    st.dataframe(resume, use_container_width=True)
+
+    nb_colonnes = min(4, len(resume))
+    nb_rangees = -(-len(resume) // nb_colonnes)
+    fig = px.bar(
+        histogrammes, x='Note', y='Effectif',
+        facet_col=col_groupe, facet_col_wrap=nb_colonnes,
+        category_orders={col_groupe: list(resume.index)},
+        labels={'Note': 'Notes', 'Effectif': 'Effectifs'},
+        height=max(300, 220 * nb_rangees)
+    )
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split('=')[-1]))
+    fig.update_xaxes(range=[-0.5, 20.5], tickvals=list(range(0, 21, 5)))
+    st.plotly_chart(fig, use_container_width=True)
+
+
+@st.fragment
+def statistiques_groupes(df_notes: pd.DataFrame, fichier_csv: FichierDepose):
+    """
+    Statistiques par groupe à partir de la colonne de groupe du fichier
+    administratif. Exécutée comme fragment : changer de colonne ne relance
+    pas la lecture du CSV.
+    """
+    st.subheader("Statistiques par groupe")
+    uploaded_liste = st.file_uploader(
+        "📄 Fichier Excel de l'administration (.xlsx), pour la colonne de groupe",
+        type="xlsx",
+        key="excel_groupes"
+    )
+    if not uploaded_liste:
+        return
+
+    fichier_liste = fichier_depose(uploaded_liste, 'excel_groupes')
+    xls, _ = process_excel(fichier_liste)
+    if xls is None:
+        return
+    candidates = colonnes_groupe(xls)
+    if not candidates:
+        st.warning("⚠️ Aucune colonne de groupe dans ce fichier.")
+        return
+
+    col_groupe = st.selectbox("Colonne définissant les groupes", candidates, key="groupe_stats")
+    try:
+        resume, histogrammes = calculer_stats_groupes(
+            fichier_liste.empreinte(), fichier_csv.empreinte(), col_groupe, xls, df_notes
+        )
+    except Exception as e:
+        st.error(f"❌ Erreur lors du calcul par groupe : {e}")
+        return
+    afficher_statistiques_groupes(resume, histogrammes, col_groupe)
+
+
+def calculer_similitudes(csv_empreinte: str, xls_empreinte: str, col_groupe: str, seuil: float,
+                         df_notes: pd.DataFrame, xls: pd.DataFrame) -> tuple:
+    """Paires de copies similaires, mémorisées par empreinte des fichiers, groupe et seuil."""
+    def calcul():
+        groupes = None
+        if col_groupe is not None:
+            groupes = groupes_des_copies(df_notes, construire_liste(xls, col_groupe), col_groupe)
+        return paires_similaires(df_notes, groupes, seuil)
+    return memorise(
+        'similitudes', SIMILITUDES_MEMORISEES_MAX, (csv_empreinte, xls_empreinte, col_groupe, seuil), calcul,
+        "Comparaison des réponses de toutes les copies…"
+    )
+
+
+@st.fragment
+def detecter_similitudes(df_notes: pd.DataFrame, fichier_csv: FichierDepose):
+    """
+    Repérage des paires de copies aux réponses anormalement similaires, à
+    partir des scores par question de l'export AMC. Les groupes (salles)
+    sont ceux choisis dans « Statistiques par groupe ».
+    """
+    st.subheader("Copies aux réponses anormalement similaires")
+    if colonnes_parties(df_notes):
+        st.info("ℹ️ Export fusionné : pas de scores par question, seulement des notes par partie — "
+                "détection impossible.")
+        return
+    if len(colonnes_questions(df_notes)) < 2:
+        st.info("ℹ️ Cet export ne contient pas de scores par question : détection impossible.")
+        return
+    if not st.checkbox("🔍 Comparer les réponses de toutes les paires de copies", key="similitudes"):
+        return
+
+    _, fichier_liste = st.session_state.get("fichier:excel_groupes", (None, None))
+    col_groupe = st.session_state.get("groupe_stats")
+    par_groupe = st.checkbox(
+        "Ne comparer que les copies d'un même groupe (salle)",
+        disabled=fichier_liste is None or col_groupe is None,
+        help="Utilise le fichier administratif et la colonne choisis dans « Statistiques par groupe »."
+    )
+    seuil = st.slider(
+        "Seuil de signalement (écarts-types au-dessus de la similarité moyenne des paires)",
+        min_value=3.0, max_value=10.0, value=SEUIL_ECARTS_TYPES, step=0.5
+    )
+
+    xls = None
+    if par_groupe:
+        xls, _ = process_excel(fichier_liste)
+        if xls is None:
+            return
+    try:
+        paires, nb_comparees = calculer_similitudes(
+            fichier_csv.empreinte(), fichier_liste.empreinte() if par_groupe else None,
+            col_groupe if par_groupe else None, seuil, df_notes, xls
+        )
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        return
+    except Exception as e:
+        st.error(f"❌ Erreur lors de la comparaison des copies : {e}")
+        return
+
+    st.caption(
+        f"{nb_comparees} paires comparées. Les concordances sur des scores rares (erreurs partagées) "
+        "pèsent plus que les bonnes réponses communes. Une paire signalée est un indice à vérifier "
+        "sur les copies, pas une preuve."
+    )
+    if paires.empty:
+        st.success("✅ Aucune paire de copies au-delà du seuil.")
+    else:
+        st.warning(f"⚠️ **{len(paires)} paire(s)** de copies au-delà du seuil.")
+        st.dataframe(paires, use_container_width=True, hide_index=True)
+
+
+@st.fragment
+def simuler_ajout(df_notes, anomalies, fichier_csv: FichierDepose):
+    """
+    Simulation d'un ajout de points et enregistrement dans l'historique.
+    Exécutée comme fragment : déplacer le curseur ne relance que ce bloc,
+    pas la lecture du CSV ni les graphiques bruts.
+    """
+    st.subheader("Simulation — Ajout de points")
+    ajout = st.slider(
+        "Points à ajouter à chaque étudiant (plafond : 20/20)",
+        min_value=0.0, max_value=5.0, value=0.0, step=0.5
+    )
+
+    df_sim = df_notes
+    if ajout > 0:
+        df_sim = df_notes.assign(Note=(df_notes['Note'] + ajout).clip(upper=20))
+        st.subheader(f"Distribution simulée après +{ajout} point(s)")
+        afficher_statistiques(df_sim, anomalies, label=f"+{ajout} pt(s)")
+
+    st.divider()
+    st.subheader("Historique des examens")
+    nom_examen = st.text_input("Nom de l'examen", value=os.path.splitext(fichier_csv.nom)[0], key="nom_examen")
+    libelle_bonus = f" avec +{ajout} pt(s)" if ajout > 0 else ""
+    if st.button(f"💾 Enregistrer le résumé{libelle_bonus} dans l'historique", disabled=not nom_examen.strip()):
+        resume = resumer_notes(df_sim['Note'], len(anomalies) if anomalies is not None else 0, ajout)
+        enregistrer_examen(nom_examen.strip(), fichier_csv.empreinte(), resume)
+        st.success(f"✅ « {nom_examen.strip()} » enregistré — il apparaît dans la page de comparaison.")
+
+
 # =============================================================================
 # RUBRIQUE 3 — TRANSFERT DES NOTES
 # =============================================================================
 
-def process_csv2excel(xls_file, csv_file, add_notes: float = 0.0) -> tuple:
+@st.fragment
+def telecharger_resultat(result: bytes, rapport: bytes):
+    """
+    Nom du fichier de sortie et boutons de téléchargement, exécutés comme
+    fragment : modifier le nom ne relance que ce bloc.
     """
-    Fusionne les notes du CSV AMC vers le fichier Excel administratif.
+    nom_fichier = st.text_input(
+        "💾 Nom du fichier de sortie (sans extension)",
+        value="notes_finales"
+    )
+    col_xlsx, col_rapport = st.columns(2)
+    with col_xlsx:
+        st.download_button(
+            label="📥 Télécharger le fichier Excel avec les notes",
+            data=result,
+            file_name=f"{nom_fichier}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    with col_rapport:
+        st.download_button(
+            label="📋 Télécharger le rapport de rapprochement (.csv)",
+            data=rapport,
+            file_name=f"{nom_fichier}_rapport.csv",
+            mime="text/csv"
+        )
 
-    Correction clé : les codes sont normalisés en texte (normalize_code)
-    des deux côtés avant comparaison, ce qui résout le problème de type
-    texte vs numérique introduit par la nouvelle version du fichier Excel.
 
-    Retourne (BytesIO, nb_anomalies, nb_transferts, nb_notes_dispo)
-    ou (None, 0, 0, 0) en cas d'erreur.
+def afficher_rapprochement(rapprochement):
+    """Affiche les écarts entre le CSV AMC et le classeur."""
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Absents du classeur", len(rapprochement.absents_classeur))
+    with col2:
+        st.metric("Étudiants sans note", len(rapprochement.sans_note))
+    with col3:
+        st.metric("Doublons CSV", len(rapprochement.doublons_csv))
+    with col4:
+        st.metric("Doublons classeur", len(rapprochement.doublons_classeur))
+
+    ecarts = [
+        ("Codes du CSV absents du classeur", rapprochement.absents_classeur),
+        ("Étudiants du classeur sans note", rapprochement.sans_note),
+        ("Codes en double dans le CSV (la dernière note est retenue)", rapprochement.doublons_csv),
+        ("Codes en double dans le classeur", rapprochement.doublons_classeur),
+    ]
+    for titre, table in ecarts:
+        if len(table):
+            with st.expander(f"🔎 {titre} ({len(table)})"):
+                st.dataframe(table, use_container_width=True, hide_index=True)
+
+
+def calculer_apercu(xls_file: FichierDepose, csv_file: FichierDepose, add_notes: float) -> pd.DataFrame:
+    """Aperçu des modifications, mémorisé par empreinte des fichiers et bonus."""
+    return memorise(
+        'apercu', APERCUS_MEMORISES_MAX, (xls_file.empreinte(), csv_file.empreinte(), add_notes),
+        lambda: apercu_modifications(xls_file, csv_file, add_notes), "Calcul de l'aperçu des modifications…"
+    )
+
+
+@st.fragment
+def afficher_apercu(xls_file: FichierDepose, csv_file: FichierDepose, add_notes: float):
+    """
+    Aperçu (sans écriture) des cellules Note que le transfert modifierait.
+    Exécuté comme fragment : changer de page ne relance que ce bloc.
     """
     try:
-        # --- Lecture et nettoyage du CSV ---
-        csv_content = csv_file.read()
-        delimiter = detect_delimiter(csv_content)
-        csv_data = pd.read_csv(io.StringIO(csv_content.decode('utf-8')), delimiter=delimiter)
-
-        if 'Mark' in csv_data.columns:
-            csv_data = csv_data.rename(columns={'Mark': 'Note'})
-
-        if 'A:Code' not in csv_data.columns or 'Note' not in csv_data.columns:
-            st.error("❌ Le fichier CSV ne contient pas les colonnes 'A:Code' ou 'Note'.")
-            return None, 0, 0, 0
-
-        anomalies_count = (csv_data['A:Code'] == 'NONE').sum()
-        csv_clean = csv_data[csv_data['A:Code'] != 'NONE'].copy()
-
-        # Construction du dictionnaire {code_normalisé → note_float}
-        notes_dict = {}
-        for _, row in csv_clean.iterrows():
-            code_key = normalize_code(row['A:Code'])
-            raw_note = row['Note']
-
-            # Conversion de la note en float
-            if isinstance(raw_note, str):
-                try:
-                    note_val = float(raw_note.replace(',', '.').strip())
-                except ValueError:
-                    note_val = raw_note  # garder le texte si non numérique
-            else:
-                note_val = float(raw_note) if raw_note is not None else raw_note
-
-            # Ajout du bonus (plafonné à 20)
-            if add_notes > 0 and isinstance(note_val, float):
-                note_val = min(note_val + add_notes, 20.0)
-
-            notes_dict[code_key] = note_val
-
-        if not notes_dict:
-            st.warning("⚠️ Aucune note valide dans le fichier CSV.")
-            return None, 0, 0, 0
-
-        # --- Ouverture du fichier Excel ---
-        wb = load_workbook(xls_file)
-        ws = wb.active
-
-        # Recherche dynamique des colonnes Code et Note (15 premières lignes)
-        code_col_idx = note_col_idx = header_row_idx = None
-
-        for row_idx, row in enumerate(ws.iter_rows(min_row=1, max_row=15), start=1):
-            for cell in row:
-                if cell.value:
-                    val = str(cell.value).strip().lower()
-                    if val == 'code' and code_col_idx is None:
-                        code_col_idx = cell.column
-                        header_row_idx = row_idx
-                    elif val == 'note' and note_col_idx is None:
-                        note_col_idx = cell.column
-                        header_row_idx = row_idx
-            if code_col_idx and note_col_idx:
-                break
-
-        if not code_col_idx or not note_col_idx:
-            st.error("❌ Colonnes 'Code' et/ou 'Note' introuvables dans le fichier Excel.")
-            return None, 0, 0, 0
-
-        # --- Transfert des notes ---
-        matched_count = 0
-        max_col = max(code_col_idx, note_col_idx)
-
-        for row in ws.iter_rows(min_row=header_row_idx + 1, max_col=max_col):
-            code_cell = row[code_col_idx - 1]
-            note_cell = row[note_col_idx - 1]
-
-            if code_cell.value is None:
-                continue
-
-            # Normalisation du code Excel en texte — correction du problème texte/numérique
-            excel_code = normalize_code(code_cell.value)
-
-            if excel_code in notes_dict:
-                final_note = notes_dict[excel_code]
-                if isinstance(final_note, float) and final_note == int(final_note):
-                    note_cell.value = int(final_note)
-                    note_cell.number_format = '0'
-                else:
-                    note_cell.value = final_note
-                    note_cell.number_format = '0.00'
-                matched_count += 1
-
-        # --- Sauvegarde ---
-        output = io.BytesIO()
-        wb.save(output)
-        wb.close()
-        output.seek(0)
-
-        return output, int(anomalies_count), matched_count, len(notes_dict)
-
+        apercu = calculer_apercu(xls_file, csv_file, add_notes)
+    except ValueError as e:
+        st.warning(f"⚠️ Aperçu indisponible : {e}")
+        return
     except Exception as e:
-        st.error(f"❌ Erreur technique : {e}")
-        return None, 0, 0, 0
+        st.warning(f"⚠️ Aperçu indisponible — erreur technique : {e}")
+        return
+
+    nb_ecrasees = int(apercu['Écrasée'].sum())
+    if nb_ecrasees:
+        st.warning(f"⚠️ Le transfert remplacera **{nb_ecrasees} note(s) déjà saisie(s)** dans le classeur.")
+
+    with st.expander(f"👁️ Aperçu des modifications — {len(apercu)} cellule(s) à modifier"):
+        if st.checkbox("Afficher uniquement les notes écrasées", key="apercu_ecrasees"):
+            apercu = apercu[apercu['Écrasée']]
+        afficher_table_paginee(apercu, "apercu")
+
+
+def transferts_memorises():
+    """Transferts terminés partagés entre sessions, indexés par (classeur, CSV, bonus, classement)."""
+    return memoire.cache_partage('transferts', TRANSFERTS_MEMORISES_MAX)
+
+
+def lancer_transfert(xls_file: FichierDepose, csv_file: FichierDepose, add_notes: float,
+                     classement: dict = None) -> JobTransfert:
+    """
+    Démarre un JobTransfert, ou réutilise celui déjà terminé sur le même
+    classeur, le même CSV, le même bonus et les mêmes colonnes de classement :
+    le résultat n'est alors pas recalculé. Un transfert encore en cours n'est
+    jamais partagé, pour que l'annulation d'une session n'interrompe pas celui
+    d'une autre : il reste dans la session jusqu'à son terme.
+    """
+    cle = (xls_file.empreinte(), csv_file.empreinte(), add_notes, tuple((classement or {}).items()))
+    job = transferts_memorises().get(cle)
+    if job is not None:
+        st.session_state.pop('job_transfert', None)
+        st.session_state['transfert_termine'] = cle
+        return job
+    job = JobTransfert(xls_file, csv_file, add_notes, classement).demarrer()
+    st.session_state['job_transfert'] = (cle, job)
+    st.session_state.pop('transfert_termine', None)
+    return job
+
+
+def transfert_de_session() -> JobTransfert:
+    """
+    Transfert de la session : celui en cours (ou interrompu), conservé dans la
+    session, sinon le dernier transfert terminé. Un transfert
+    terminé passe dans le cache partagé, seul à conserver son résultat : la
+    session n'en garde que la clé, et l'évincer du cache libère réellement le
+    classeur produit. Retourne None si aucun transfert n'a été lancé ou si le
+    résultat a été évincé.
+    """
+    cle, job = st.session_state.get('job_transfert', (None, None))
+    if job is not None and job.etat == 'termine':
+        transferts_memorises()[cle] = job
+        del st.session_state['job_transfert']
+        st.session_state['transfert_termine'] = cle
+    elif job is not None:
+        return job
+    cle = st.session_state.get('transfert_termine')
+    return None if cle is None else transferts_memorises().get(cle)
+
+
+@st.fragment(run_every="0.5s")
+def suivre_transfert():
+    """Affiche l'avancement du transfert en cours et permet de l'annuler."""
+    _, job = st.session_state.get('job_transfert', (None, None))
+    if job is None:
+        st.rerun()
+
+    if job.lignes_total:
+        texte = (
+            f"{job.etape} — {job.lignes_parcourues}/{job.lignes_total} lignes parcourues, "
+            f"{job.notes_appariees} notes appariées"
+        )
+    else:
+        texte = f"{job.etape}…"
+    st.progress(job.fraction, text=texte)
+
+    if st.button("⏹️ Annuler le transfert"):
+        job.annuler()
+
+    if not job.en_cours:
+        st.rerun()
+
+
+# =============================================================================
+# RUBRIQUE 4 — COMPARAISON DES EXAMENS
+# =============================================================================
+
+def afficher_comparaison(examens: pd.DataFrame):
+    """Compare plusieurs examens à partir de leurs résumés enregistrés."""
+    quantiles = pd.DataFrame(examens['quantiles'].tolist(), index=examens.index)
+    tableau = pd.DataFrame({
+        'Examen': examens['libelle'],
+        'Enregistré le': examens['enregistre_le'],
+        'Présents': examens['presents'],
+        'Mal identifiés': examens['anomalies'],
+        'Validés': examens['valides'],
+        'Taux de réussite (%)': examens['taux_reussite'],
+        'Moyenne': examens['moyenne'].round(2),
+        'Q1': quantiles['0.25'],
+        'Médiane': quantiles['0.5'],
+        'Q3': quantiles['0.75'],
+    })
+    st.dataframe(tableau, use_container_width=True, hide_index=True)
+
+    col_taux, col_boites = st.columns(2)
+    with col_taux:
+        fig = px.bar(
+            tableau, x='Examen', y='Taux de réussite (%)', text_auto=True,
+            title="Taux de réussite"
+        )
+        fig.update_layout(yaxis_range=[0, 100], showlegend=False)
+        st.plotly_chart(fig, use_container_width=True)
+    with col_boites:
+        # Boîtes tracées directement à partir des quantiles enregistrés (P10, Q1, médiane, Q3, P90)
+        fig = go.Figure(go.Box(
+            x=examens['libelle'], q1=quantiles['0.25'], median=quantiles['0.5'], q3=quantiles['0.75'],
+            lowerfence=quantiles['0.1'], upperfence=quantiles['0.9'], mean=examens['moyenne'],
+        ))
+        fig.update_layout(title="Dispersion des notes (P10 – P90)", yaxis_range=[0, 20])
+        st.plotly_chart(fig, use_container_width=True)
+
+    fig = px.bar(
+        histogrammes_long(examens), x='Note', y='Effectif', color='Examen', barmode='group',
+        title="Distribution des notes (classes d'un demi-point)"
+    )
+    fig.update_xaxes(tickmode='array', tickvals=list(range(21)), ticktext=[str(i) for i in range(21)])
+    st.plotly_chart(fig, use_container_width=True)
 
 
 # =============================================================================
@@ -296,7 +845,8 @@ st.title("🎓 Outils AMC — Gestion des notes")
 
 section = st.sidebar.radio(
     "Navigation",
-    ["👨‍🎓 Liste étudiants", "📊 Statistiques des notes", "✍️ Transfert des notes"],
+    ["👨‍🎓 Liste étudiants", "📊 Statistiques des notes", "✍️ Transfert des notes",
+     "📈 Comparaison des examens"],
     index=0
 )
 
@@ -309,7 +859,10 @@ if section == "👨‍🎓 Liste étudiants":
     st.info(
         "**Objectif :** Convertir le fichier Excel de l'administration en liste CSV "
         "exploitable par Auto Multiple Choice (AMC).\n\n"
-        "**Format produit :** deux colonnes — `Code` et `Name` (Code + Nom + Prénom)."
+        "**Format produit :** deux colonnes — `Code` et `Name` (Code + Nom + Prénom). "
+        "Si le fichier comporte une colonne de groupe, une liste par groupe peut aussi être générée. "
+        "Pour une liste mise à jour, la comparaison avec la liste de référence du cours donne les "
+        "étudiants ajoutés, retirés ou renommés."
     )
 
     uploaded_excel = st.file_uploader(
@@ -319,17 +872,24 @@ if section == "👨‍🎓 Liste étudiants":
     )
 
     if uploaded_excel:
+        fichier_excel = fichier_depose(uploaded_excel, 'excel_etudiants')
         with st.spinner("Lecture du fichier en cours…"):
-            xls, liste = process_excel(uploaded_excel)
+            xls, liste = process_excel(fichier_excel)
 
         if xls is not None and liste is not None:
             st.success(f"✅ Fichier lu avec succès — **{len(liste)} étudiants** trouvés.")
 
-            with st.expander("🔎 Aperçu du fichier Excel brut (10 premières lignes)"):
-                st.dataframe(xls.head(10), use_container_width=True)
+            with st.expander("🔎 Aperçu du fichier Excel brut"):
+                parcourir_table(
+                    xls, "xls_brut",
+                    index_prefixes(fichier_excel.empreinte(), ('Code', 'Nom', 'Prénom'), xls)
+                )
 
             st.subheader("Liste générée pour AMC")
-            st.dataframe(liste.head(10), use_container_width=True)
+            parcourir_table(
+                liste, "liste_amc",
+                index_prefixes(fichier_excel.empreinte(), ('Code', 'Name'), liste)
+            )
 
             csv_bytes = liste.to_csv(index=False).encode('utf-8')
             st.download_button(
@@ -339,6 +899,28 @@ if section == "👨‍🎓 Liste étudiants":
                 mime="text/csv"
             )
 
+            comparer_avec_reference(fichier_excel, liste)
+
+            st.subheader("Listes par groupe")
+            candidates = colonnes_groupe(xls)
+            col_groupe = st.selectbox(
+                "Colonne définissant les groupes",
+                ["(aucune)"] + candidates,
+                index=1 if detecter_colonne_groupe(xls) else 0
+            )
+            if col_groupe != "(aucune)":
+                liste_groupes = construire_liste(xls, col_groupe)
+                st.caption(
+                    f"{liste_groupes[col_groupe].nunique()} groupe(s) : une liste AMC par groupe "
+                    "et la liste complète, réunies dans une archive zip."
+                )
+                st.download_button(
+                    label="📥 Télécharger les listes par groupe (.zip)",
+                    data=exporter_listes_groupes(liste_groupes, col_groupe),
+                    file_name="listes_etudiants_amc.zip",
+                    mime="application/zip"
+                )
+
 # ---------------------------------------------------------------------------
 # RUBRIQUE 2 — STATISTIQUES
 # ---------------------------------------------------------------------------
@@ -348,37 +930,48 @@ elif section == "📊 Statistiques des notes":
     st.info(
         "**Objectif :** Analyser la distribution des notes issues d'AMC et simuler "
         "l'impact d'un ajout de points.\n\n"
-        "**Fichier attendu :** export CSV standard d'AMC (colonnes `A:Code` et `Note` ou `Mark`)."
+        "**Fichier attendu :** export CSV standard d'AMC (colonnes `A:Code` et `Note` ou `Mark`). "
+        "Plusieurs exports (parties, rattrapage) peuvent être chargés ensemble pour être fusionnés. "
+        "Le fichier Excel de l'administration, facultatif, permet une analyse par groupe. "
+        "Une question défectueuse peut être neutralisée ou repondérée à partir des scores par question."
     )
 
     uploaded_csv = st.file_uploader(
-        "📄 Charger le fichier CSV des notes AMC",
+        "📄 Charger le ou les fichiers CSV des notes AMC",
         type="csv",
+        accept_multiple_files=True,
         key="csv_stats"
     )
 
-    if uploaded_csv:
+    fichier_csv = choisir_exports(uploaded_csv, 'csv_stats') if uploaded_csv else None
+    if fichier_csv is not None and len(uploaded_csv) == 1:  # un export fusionné n'a pas de scores par question
+        fichier_csv = ajuster_bareme(fichier_csv, 'csv_stats')
+    if fichier_csv is not None:
         with st.spinner("Analyse en cours…"):
-            df_notes, anomalies = process_csv(uploaded_csv)
+            df_notes, anomalies = process_csv(fichier_csv)
 
         if df_notes is not None:
             st.success(f"✅ Fichier lu avec succès — **{len(df_notes)} étudiants présents**.")
 
+            with st.expander("🔎 Notes par étudiant"):
+                colonnes = [c for c in ('A:Code', 'Name', 'Note') if c in df_notes.columns]
+                table_notes = df_notes[colonnes].reset_index(drop=True)
+                parcourir_table(
+                    table_notes, "notes",
+                    index_prefixes(fichier_csv.empreinte(), tuple(colonnes[:-1]), table_notes)
+                )
+
             st.subheader("Distribution des notes (résultats bruts)")
             afficher_statistiques(df_notes, anomalies)
 
             st.divider()
-            st.subheader("Simulation — Ajout de points")
-            ajout = st.slider(
-                "Points à ajouter à chaque étudiant (plafond : 20/20)",
-                min_value=0.0, max_value=5.0, value=0.0, step=0.5
-            )
+            statistiques_groupes(df_notes, fichier_csv)
+
+            st.divider()
+            detecter_similitudes(df_notes, fichier_csv)
 
-            if ajout > 0:
-                df_sim = df_notes.copy()
-                df_sim['Note'] = df_sim['Note'].apply(lambda x: min(x + ajout, 20))
-                st.subheader(f"Distribution simulée après +{ajout} point(s)")
-                afficher_statistiques(df_sim, anomalies, label=f"+{ajout} pt(s)")
+            st.divider()
+            simuler_ajout(df_notes, anomalies, fichier_csv)
 
 # ---------------------------------------------------------------------------
 # RUBRIQUE 3 — TRANSFERT DES NOTES
@@ -391,7 +984,8 @@ elif section == "✍️ Transfert des notes":
         "Excel fourni par l'administration.\n\n"
         "**Fichiers attendus :**\n"
         "- Excel administration : doit contenir les colonnes `Code` et `Note`.\n"
-        "- CSV AMC : export standard avec colonnes `A:Code` et `Note` (ou `Mark`).\n\n"
+        "- CSV AMC : export standard avec colonnes `A:Code` et `Note` (ou `Mark`) ; plusieurs "
+        "exports (parties, rattrapage) sont fusionnés en une note finale.\n\n"
         "⚠️ Si certains étudiants sont signalés *mal identifiés*, leurs notes devront être "
         "saisies manuellement."
     )
@@ -404,47 +998,111 @@ elif section == "✍️ Transfert des notes":
             key="xls_notes"
         )
     with col_right:
-        csv_file = st.file_uploader(
-            "📄 Fichier CSV des notes AMC (.csv)",
+        csv_files = st.file_uploader(
+            "📄 Fichier(s) CSV des notes AMC (.csv)",
             type="csv",
+            accept_multiple_files=True,
             key="csv_notes"
         )
 
+    csv_fusion = choisir_exports(csv_files, 'csv_notes') if csv_files else None
+    if csv_fusion is not None and len(csv_files) == 1:  # un export fusionné n'a pas de scores par question
+        csv_fusion = ajuster_bareme(csv_fusion, 'csv_notes')
+
     add_notes = st.number_input(
         "➕ Points bonus à ajouter (0 = aucun, maximum 5)",
         min_value=0.0, max_value=5.0, value=0.0, step=0.5
     )
 
-    btn_disabled = not (xls_file and csv_file)
-    if st.button("🚀 Lancer le transfert", type="primary", disabled=btn_disabled):
-        xls_file.seek(0)
-        csv_file.seek(0)
+    indicateurs = st.multiselect(
+        "🏅 Colonnes de classement à remplir (facultatif)",
+        list(CLASSEMENTS), format_func=LIBELLES_CLASSEMENT.get,
+        help="Écrites pendant le transfert dans la colonne portant l'intitulé choisi, "
+             "créée à droite du tableau si elle n'existe pas."
+    )
+    classement = {}
+    for colonne, cle in zip(st.columns(len(indicateurs)) if indicateurs else [], indicateurs):
+        intitule = colonne.text_input(
+            f"Intitulé — {CLASSEMENTS[cle]}", value=CLASSEMENTS[cle], key=f"intitule_{cle}"
+        )
+        classement[cle] = intitule.strip() or CLASSEMENTS[cle]
 
-        with st.spinner("Transfert en cours…"):
-            result, nb_anomalies, nb_transferts, nb_dispo = process_csv2excel(
-                xls_file, csv_file, add_notes
-            )
+    if xls_file and csv_fusion is not None:
+        afficher_apercu(fichier_depose(xls_file, 'xls_notes'), csv_fusion, add_notes)
 
-        if result:
-            st.success(
-                f"✅ Transfert réussi — **{nb_transferts} notes** insérées "
-                f"sur {nb_dispo} disponibles dans le CSV."
+    job = transfert_de_session()
+    btn_disabled = not xls_file or csv_fusion is None or (job is not None and job.en_cours)
+    if st.button("🚀 Lancer le transfert", type="primary", disabled=btn_disabled):
+        job = lancer_transfert(fichier_depose(xls_file, 'xls_notes'), csv_fusion, add_notes, classement)
+
+    if job is None and 'transfert_termine' in st.session_state:
+        st.info("ℹ️ Le résultat du dernier transfert a été libéré de la mémoire du serveur : relancez le transfert.")
+    elif job is not None and job.en_cours:
+        suivre_transfert()
+    elif job is not None and job.etat == 'termine':
+        result, nb_anomalies, nb_transferts, nb_dispo, rapprochement = job.resultat
+        st.success(
+            f"✅ Transfert réussi — **{nb_transferts} notes** insérées "
+            f"sur {nb_dispo} disponibles dans le CSV."
+        )
+        if nb_anomalies > 0:
+            st.warning(
+                f"⚠️ **{nb_anomalies} étudiant(s) mal identifié(s)** (code = NONE). "
+                "Vérifiez leurs copies et saisissez leurs notes manuellement."
             )
-            if nb_anomalies > 0:
-                st.warning(
-                    f"⚠️ **{nb_anomalies} étudiant(s) mal identifié(s)** (code = NONE). "
-                    "Vérifiez leurs copies et saisissez leurs notes manuellement."
-                )
 
-            nom_fichier = st.text_input(
-                "💾 Nom du fichier de sortie (sans extension)",
-                value="notes_finales"
-            )
-            st.download_button(
-                label="📥 Télécharger le fichier Excel avec les notes",
-                data=result,
-                file_name=f"{nom_fichier}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
-        else:
-            st.error("❌ Le transfert a échoué. Vérifiez les fichiers chargés.")
+        afficher_rapprochement(rapprochement)
+        telecharger_resultat(result, rapprochement.rapport_csv())
+    elif job is not None and job.etat == 'annule':
+        st.info("⏹️ Transfert annulé.")
+    elif job is not None and job.etat == 'erreur':
+        st.error(f"❌ Le transfert a échoué : {job.erreur}")
+
+# ---------------------------------------------------------------------------
+# RUBRIQUE 4 — COMPARAISON DES EXAMENS
+# ---------------------------------------------------------------------------
+elif section == "📈 Comparaison des examens":
+    st.header("📈 Comparaison des examens")
+
+    st.info(
+        "**Objectif :** Comparer plusieurs examens à partir de leurs résumés enregistrés "
+        "depuis la page *Statistiques des notes*, sans recharger les fichiers CSV."
+    )
+
+    examens = lister_examens()
+    if examens.empty:
+        st.warning("⚠️ Aucun examen enregistré pour l'instant.")
+    else:
+        choix = st.multiselect(
+            "Examens à comparer",
+            examens['id'].tolist(),
+            default=examens['id'].head(5).tolist(),
+            format_func=dict(zip(examens['id'], examens['libelle'])).get
+        )
+        selection = examens[examens['id'].isin(choix)]
+        if not selection.empty:
+            afficher_comparaison(selection)
+
+            if st.button("🗑️ Supprimer les examens sélectionnés de l'historique"):
+                supprimer_examens(selection['id'])
+                st.rerun()
+
+# =============================================================================
+# BUDGET MÉMOIRE ET DIAGNOSTIC
+# =============================================================================
+memoire.appliquer_budgets()
+
+with st.sidebar.expander("🩺 Diagnostic mémoire"):
+    serveur = memoire.etat_global()
+    st.progress(
+        min(serveur['total'] / memoire.BUDGET_GLOBAL, 1.0),
+        text=f"Caches partagés : {serveur['total'] / memoire.MO:.1f} / {memoire.BUDGET_GLOBAL / memoire.MO:.0f} Mo"
+    )
+    st.caption(
+        f"{serveur['evictions']} entrée(s) évincée(s) depuis le démarrage du serveur. Seuls les caches "
+        "partagés entre sessions sont budgétés : les fichiers déposés restent conservés par l'uploader "
+        "de Streamlit, et un transfert en cours ou un barème saisi ne peut être évincé sans être perdu."
+    )
+    inventaire = memoire.inventaire()
+    if not inventaire.empty:
+        st.dataframe(inventaire, use_container_width=True, hide_index=True)
@@ -2,6 +2,7 @@
 import streamlit as st
 import pandas as pd
 from openpyxl import load_workbook
+from interface import fichier_depose, transfert_memorise
 import plotly.express as px
 import io
 import csv
@@ -68,12 +69,10 @@ def detect_delimiter(file_content):
 # Fonction de traitement pour le fichier CSV
 def process_csv2excel(xls_file, csv_file, add_notes=0):
     try:
-        # Lire le contenu du fichier CSV en mémoire
-        csv_content = csv_file.read()
-        # Détecter le délimiteur
-        delimiter = detect_delimiter(csv_content)
-        # Charger le fichier CSV avec le bon délimiteur
-        csv_data = pd.read_csv(io.StringIO(csv_content.decode('utf-8')), delimiter=delimiter, encoding='utf-8')
+        # Détecter le délimiteur sur un échantillon du fichier
+        delimiter = detect_delimiter(csv_file.echantillon())
+        # Charger le fichier CSV avec le bon délimiteur, sans copie en mémoire
+        csv_data = pd.read_csv(csv_file.flux(), delimiter=delimiter, encoding='utf-8')
         
         # Renommer la colonne 'Mark' en 'Note' si elle existe
         if 'Mark' in csv_data.columns:
@@ -163,12 +162,10 @@ def process_csv2excel(xls_file, csv_file, add_notes=0):
 # Fonction de traitement pour le fichier CSV
 def process_csv(csv_file):
     try:
-        # Lire le contenu du fichier CSV en mémoire
-        csv_content = csv_file.read()
-        # Détecter le délimiteur
-        delimiter = detect_delimiter(csv_content)
-        # Charger le fichier CSV avec le bon délimiteur
-        csv_data = pd.read_csv(io.StringIO(csv_content.decode('utf-8')), delimiter=delimiter, encoding='utf-8')
+        # Détecter le délimiteur sur un échantillon du fichier
+        delimiter = detect_delimiter(csv_file.echantillon())
+        # Charger le fichier CSV avec le bon délimiteur, sans copie en mémoire
+        csv_data = pd.read_csv(csv_file.flux(), delimiter=delimiter, encoding='utf-8')
         
         # Renommer la colonne 'Mark' en 'Note' si elle existe
         if 'Mark' in csv_data.columns:
@@ -256,7 +253,7 @@ elif section == "STATISTIQUES":
 
     if uploaded_csv_file is not None:
         with st.spinner("Intégration des notes aux étudiants..."):
-            csv_clean, csv_nones = process_csv(uploaded_csv_file)
+            csv_clean, csv_nones = process_csv(fichier_depose(uploaded_csv_file, "csv_uploader"))
 
 
             # Calcul des effectifs
@@ -396,29 +393,15 @@ elif section == "NOTES":
     )
     if xls_file is not None and csv_file is not None:
         with st.spinner("Traitement automatique du fichier Excel en cours..."):
-            # Lire le contenu du fichier CSV en mémoire
-            csv_content = io.BytesIO(csv_file.getvalue())
+            # Vues sans copie sur les fichiers déposés, conservées d'un rerun à l'autre
+            csv_content = fichier_depose(csv_file, "csv_uploader")
+            xls_content = fichier_depose(xls_file, "excel_uploader2")
 
-            # Lire le contenu du fichier Excel en mémoire
-            xls_content = io.BytesIO(xls_file.getvalue())
-
-            # Traitez les fichiers avec process_csv2excel
+            # Traitez les fichiers avec process_csv2excel (résultat mémorisé par empreinte des fichiers et bonus)
             add_notes = st.number_input("Combien voulez-vous ajouter de points à l'ensemble des étudiants?", step=0.5)
-            processed_xls, nb_none = process_csv2excel(xls_content, csv_content, add_notes)
-
-        if processed_xls is not None:
-            # Lire le fichier Excel traité
-            wb = load_workbook(processed_xls)
-            output = io.BytesIO()
-            wb.save(output)  # Sauvegardez le fichier dans un flux binaire
-            wb.close()
-
-            # Réinitialisez le curseur du flux binaire
-            output.seek(0)
-
-            # Encodez le contenu en base64 pour le téléchargement
-            file_data = output.getvalue()
+            file_data, nb_none = transfert_memorise(process_csv2excel, xls_content, csv_content, add_notes)
 
+        if file_data is not None:
             # Ajoutez un bouton de téléchargement
             st.success("✅ Félicitations ! Les notes ont été saisies avec succès.")
             file_name = st.text_input(
@@ -429,5 +412,5 @@ elif section == "NOTES":
                 file_name=file_name + ".xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
-        if nb_none > 0:
+        if nb_none:
             st.warning(f"Attention! {nb_none} étudiants ont été mal identifiés. Vérifiez leurs copies et saisissez leurs notes manuellement.")
\ No newline at end of file